@@ -1,3 +1,42 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserProfile, Address, Card
+
+
+class AddressInline(admin.TabularInline):
+    model = Address
+    extra = 0
+
+
+class CardInline(admin.TabularInline):
+    model = Card
+    extra = 0
+    # Card numbers are never shown in full
+    exclude = ("card_number",)
+    readonly_fields = ("masked_number",)
+
+    def has_add_permission(self, request, obj=None):
+        # A card cannot be saved without its number, which is never shown here
+        return False
+
+    @admin.display(description="Card number")
+    def masked_number(self, card):
+        return f"**** {card.card_number[-4:]}" if card.card_number else ""
+
+
+@admin.register(UserProfile)
+class UserProfileAdmin(admin.ModelAdmin):
+    """
+    Profiles of the default shard (the admin does not route to the other shards,
+    the search endpoint covers all of them).
+    Responsible for:
+    - Prefix search ("^"), served by the indexes of migration 0005
+    - Skipping the unfiltered COUNT(*) of the whole table on every search
+    """
+    list_display = ("person_id", "email", "first_name", "last_name", "primary_phone", "created_at")
+    search_fields = ("^email", "^first_name", "^last_name", "^primary_phone", "^alternate_phone")
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ("person_id",)
+    readonly_fields = ("person_id", "card_count", "created_at", "updated_at")
+    inlines = [AddressInline, CardInline]
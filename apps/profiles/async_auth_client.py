@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+from django.conf import settings
+
+from .auth_client import (
+    TIMEOUT_MESSAGE,
+    UNAVAILABLE_MESSAGE,
+    AuthClient,
+    AuthClientError,
+    AuthServiceUnavailable,
+    InvalidTokenError,
+    LookupAttempts,
+)
+from .token_cache import INVALID
+from .ttl_cache import AsyncSingleFlight
+
+
+class AsyncAuthClient(AuthClient):
+    """
+    Non-blocking flavour of AuthClient for the ASGI request path.
+    Shares the token cache, circuit breaker and deadline policy of AuthClient,
+    but talks to AUTH_MS over a pooled keep-alive httpx.AsyncClient.
+    """
+
+    def __init__(self, base_url=None, cache=None, breaker=None):
+        super().__init__(base_url=base_url, cache=cache, breaker=breaker)
+
+        self.async_single_flight = AsyncSingleFlight()
+        self.limits = httpx.Limits(
+            max_connections=settings.AUTH_MS_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AUTH_MS_MAX_CONNECTIONS,
+            keepalive_expiry=30,
+        )
+
+        self._client = None
+        self._client_loop = None
+
+    @property
+    def coalesced(self) -> int:
+        return self.single_flight.coalesced + self.async_single_flight.coalesced
+
+    async def aget_user(self, token: str) -> dict:
+        """
+        Async version of AuthClient.get_user.
+
+        Args:
+            token (str): JWT access token
+
+        Returns:
+            dict: Authenticated user data
+
+        Raises:
+            InvalidTokenError: For invalid or expired tokens
+            AuthServiceUnavailable: When AUTH_MS is down, slow or the circuit is open
+            AuthClientError: For any other unexpected AUTH_MS answer
+        """
+        if not token:
+            raise AuthClientError("Authorization token is missing.")
+
+        if self.cache is None:
+            return await self._afetch_user(token)
+
+        cached = await self.cache.aget(token)
+        if cached == INVALID:
+            raise InvalidTokenError("Invalid or expired token.")
+        if cached is not None:
+            return cached
+
+        return await self.async_single_flight.do(
+            self.cache.key(token), lambda: self._afetch_and_cache(token)
+        )
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # The pool is bound to the event loop it was created on. An ASGI server
+        # keeps one loop per worker; wsgi.py refuses ASYNC_VIEWS, where every
+        # request would run on a new loop and strand the previous pool
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(limits=self.limits)
+            self._client_loop = loop
+        return self._client
+
+    async def _afetch_and_cache(self, token: str) -> dict:
+        try:
+            data = await self._afetch_user(token)
+        except InvalidTokenError:
+            await self.cache.aset_invalid(token)
+            raise
+
+        await self.cache.aset(token, data)
+        return data
+
+    async def _afetch_user(self, token: str) -> dict:
+        client = self._get_client()
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"{self.base_url}/me/"
+        attempts = LookupAttempts(self)
+
+        while True:
+            timeout = attempts.start()
+
+            try:
+                response = await client.get(url, headers=headers, timeout=timeout)
+            except httpx.TimeoutException:
+                error = AuthServiceUnavailable(TIMEOUT_MESSAGE)
+            except httpx.HTTPError as e:
+                error = AuthServiceUnavailable(f"Error connecting to AUTH_MS: {e}")
+            else:
+                if response.status_code < 500:
+                    return attempts.succeeded(response)
+                error = AuthServiceUnavailable(UNAVAILABLE_MESSAGE)
+
+            await asyncio.sleep(attempts.failed(error))
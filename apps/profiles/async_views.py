@@ -0,0 +1,593 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    MethodNotAllowed,
+    NotAuthenticated,
+    ParseError,
+    ValidationError,
+)
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .auth_client import AuthClientError, AuthServiceUnavailable
+from .bulk import AddressBulkOperation, CardBulkOperation, payload_list
+from .conditional import (
+    acollection_validators,
+    aprofile_validators,
+    combine_validators,
+    evaluate_preconditions,
+    object_validators,
+    with_validators,
+)
+from .exceptions import ServiceUnavailable, custom_exception_handler
+from .fast_serializers import address_values, card_values
+from .identity import STALE_PROFILE_ERRORS, profile_ids
+from .internal import (
+    NDJSON_CONTENT_TYPE,
+    authenticate_service,
+    batch_chunks,
+    batch_lines,
+    parse_batch_request,
+)
+from .models import UserProfile, Address, Card, CardLimitExceeded
+from .read_cache import profile_cache
+from .renderers import JSON_CONTENT_TYPE, encode, encode_success
+from .routers import bind_person
+from .serializers import (
+    UserProfileSerializer,
+    AddressSerializer,
+    CardSerializer
+)
+from .timing import timed
+from .token_verifier import TokenVerificationError, VerificationUnavailable
+from .views import (
+    AUTH_UNAVAILABLE_MESSAGE,
+    auth_client,
+    token_verifier,
+    bundle_queryset,
+    default_queryset,
+    parse_bundle_sections,
+    section_queryset,
+    serialize_bundle,
+    set_default,
+)
+
+
+# ------------------------------------------------------------------
+# Response Helpers (same envelope as the sync views)
+# ------------------------------------------------------------------
+def success_response(data, status_code=status.HTTP_200_OK):
+    with timed("render"):
+        body = encode_success(data)
+    return HttpResponse(body, status=status_code, content_type=JSON_CONTENT_TYPE)
+
+
+def exception_response(exc):
+    response = custom_exception_handler(exc, {})
+
+    with timed("render"):
+        body = encode(response.data)
+    json_response = HttpResponse(body, status=response.status_code, content_type=JSON_CONTENT_TYPE)
+    for header, value in response.items():
+        if header.lower() != "content-type":
+            json_response[header] = value
+
+    return json_response
+
+
+def parse_body(request):
+    """
+    request.data of the sync views: the body goes through the same
+    DEFAULT_PARSER_CLASSES (JSON, form, multipart) and raises the same errors.
+    """
+    parsers = [parser() for parser in api_settings.DEFAULT_PARSER_CLASSES]
+    data = Request(request, parsers=parsers).data
+
+    if not isinstance(data, dict):
+        raise ParseError("Expected a JSON object.")
+
+    return data
+
+
+async def asection_validators(person_id, section):
+    """Async version of views.section_validators."""
+    async def compute():
+        if section == "profile":
+            return await aprofile_validators(person_id)
+        return await acollection_validators(section_queryset(person_id, section))
+
+    return await profile_cache.aget_or_set(person_id, f"{section}:validators", compute)
+
+
+# ------------------------------------------------------------------
+# Authentication Helper
+# ------------------------------------------------------------------
+async def aget_authenticated_user(request):
+    user_data = await averify_bearer_token(request)
+    # Replica reads of a person that just wrote go to the primary instead
+    bind_person(user_data.get("person_id") or user_data.get("id"))
+    return user_data
+
+
+async def averify_bearer_token(request):
+    auth_header = request.headers.get("Authorization")
+
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise NotAuthenticated("Authorization token missing.")
+
+    token = auth_header.split(" ")[1]
+
+    with timed("auth"):
+        # Local mode: verify in-process, only ask AUTH_MS when undecidable
+        if token_verifier is not None:
+            try:
+                return await token_verifier.averify(token)
+            except TokenVerificationError:
+                raise NotAuthenticated("Invalid or expired token.")
+            except VerificationUnavailable:
+                pass
+
+        try:
+            return await auth_client.aget_user(token)
+        except AuthServiceUnavailable:
+            raise ServiceUnavailable(
+                AUTH_UNAVAILABLE_MESSAGE, retry_after=auth_client.breaker.retry_after()
+            )
+        except AuthClientError:
+            raise NotAuthenticated("Invalid or expired token.")
+
+
+# ------------------------------------------------------------------
+# Base View
+# ------------------------------------------------------------------
+class AsyncAPIView(View):
+    """
+    Async counterpart of APIView for the ASGI deployment.
+    Keeps the {"success": ...} envelope and the global exception format.
+    """
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await self.initial(request, *args, **kwargs)
+            response = await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            response = await self.handle_exception(exc)
+
+        # Like APIView.finalize_response
+        response["Allow"] = ", ".join(self._allowed_methods())
+        return response
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        # Through the global handler, like the sync views (not Django's empty 405)
+        raise MethodNotAllowed(request.method)
+
+    async def initial(self, request, *args, **kwargs):
+        """Runs before the handler, like APIView.initial."""
+        pass
+
+    async def handle_exception(self, exc):
+        """Response of an exception raised by initial() or the handler, like APIView.handle_exception."""
+        return exception_response(exc)
+
+
+class ProfileScopedAPIView(AsyncAPIView):
+    """
+    Async counterpart of views.ProfileScopedAPIView: attaches request.user_data,
+    request.person_id and request.profile_id once per request, and runs a
+    write that hit a profile deleted by another worker once more.
+    """
+
+    async def initial(self, request, *args, **kwargs):
+        user_data = await aget_authenticated_user(request)
+        person_id = user_data.get("person_id") or user_data.get("id")
+
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        request.user_data = user_data
+        request.person_id = person_id
+        request.profile_id = await profile_ids.aprofile_id(person_id, user_data.get("email"))
+
+    async def handle_exception(self, exc):
+        request = self.request
+        if isinstance(exc, STALE_PROFILE_ERRORS) and hasattr(request, "profile_id"):
+            profile_id = await profile_ids.arefresh(
+                request.person_id, request.profile_id, request.user_data.get("email")
+            )
+            if profile_id is not None:
+                request.profile_id = profile_id
+                handler = getattr(self, request.method.lower())
+                try:
+                    return await handler(request, *self.args, **self.kwargs)
+                except Exception as retry_exc:
+                    exc = retry_exc
+
+        return await super().handle_exception(exc)
+
+
+# ------------------------------------------------------------------
+# AUTH_MS Connectivity Test
+# ------------------------------------------------------------------
+class TestAuthView(AsyncAPIView):
+
+    async def get(self, request):
+        user_data = await aget_authenticated_user(request)
+
+        return success_response({
+            "username": user_data.get("username"),
+            "email": user_data.get("email"),
+            "person_id": user_data.get("person_id"),
+        })
+
+
+# ------------------------------------------------------------------
+# User Profile
+# ------------------------------------------------------------------
+class UserProfileView(AsyncAPIView):
+
+    async def get(self, request):
+        user_data = await aget_authenticated_user(request)
+
+        person_id = user_data.get("person_id") or user_data.get("id")
+        email = user_data.get("email")
+
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        validators = await asection_validators(person_id, "profile")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        async def load():
+            profile, _ = await UserProfile.objects.aresolve(person_id, email)
+            return UserProfileSerializer(profile).data
+
+        payload = await profile_cache.aget_or_set(person_id, "profile", load)
+        if validators is None:
+            # Profile was provisioned by this request
+            validators = await asection_validators(person_id, "profile")
+
+        return with_validators(success_response(payload), validators)
+
+    async def put(self, request):
+        user_data = await aget_authenticated_user(request)
+
+        person_id = user_data.get("person_id") or user_data.get("id")
+        email = user_data.get("email")
+
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        profile, _ = await UserProfile.objects.aresolve(person_id, email)
+        evaluate_preconditions(request, object_validators(profile))
+
+        data = parse_body(request).copy()
+        data.pop("email", None)
+        data.pop("person_id", None)
+
+        serializer = UserProfileSerializer(profile, data=data, partial=True)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await sync_to_async(serializer.save)()
+
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(profile)
+        )
+
+
+# ------------------------------------------------------------------
+# Profile Bundle (profile + addresses + cards in one round trip)
+# ------------------------------------------------------------------
+class ProfileBundleView(AsyncAPIView):
+
+    async def get(self, request):
+        user_data = await aget_authenticated_user(request)
+
+        person_id = user_data.get("person_id") or user_data.get("id")
+        email = user_data.get("email")
+
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        sections = parse_bundle_sections(request.GET.get("sections"))
+
+        validators = combine_validators(
+            *[await asection_validators(person_id, section) for section in sections]
+        )
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        async def load():
+            profile = await bundle_queryset(person_id, sections).afirst()
+            created = False
+
+            if profile is None:
+                profile, created = await UserProfile.objects.aresolve(person_id, email)
+                # Lost a provisioning race: reload with the children prefetched
+                if not created:
+                    profile = await bundle_queryset(person_id, sections).afirst()
+            else:
+                profile = await UserProfile.objects.afollow_email(profile, email)
+
+            return serialize_bundle(profile, sections, created=created)
+
+        return with_validators(
+            success_response(
+                await profile_cache.aget_or_set(person_id, "bundle:" + ",".join(sections), load)
+            ),
+            validators
+        )
+
+
+# ------------------------------------------------------------------
+# Address Management
+# ------------------------------------------------------------------
+class AddressListCreateView(ProfileScopedAPIView):
+
+    async def get(self, request):
+        validators = await asection_validators(request.person_id, "addresses")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        async def load():
+            return await address_values.adata(Address.objects.filter(user_id=request.profile_id))
+
+        return with_validators(
+            success_response(await profile_cache.aget_or_set(request.person_id, "addresses", load)),
+            validators
+        )
+
+    async def post(self, request):
+        serializer = AddressSerializer(data=parse_body(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await sync_to_async(serializer.save)(user_id=request.profile_id)
+
+        return success_response(
+            serializer.data,
+            status_code=status.HTTP_201_CREATED
+        )
+
+
+class AddressDetailView(ProfileScopedAPIView):
+
+    async def get_object(self, request, pk):
+        try:
+            return await Address.objects.aget(pk=pk, user_id=request.profile_id)
+        except Address.DoesNotExist:
+            raise ValidationError("Address not found.")
+
+    async def get(self, request, pk):
+        address = await self.get_object(request, pk)
+
+        validators = object_validators(address)
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        return with_validators(
+            success_response(AddressSerializer(address).data),
+            validators
+        )
+
+    async def put(self, request, pk):
+        address = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
+
+        serializer = AddressSerializer(address, data=parse_body(request), partial=True)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await sync_to_async(serializer.save)()
+
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(address)
+        )
+
+    async def delete(self, request, pk):
+        address = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
+        await address.adelete()
+
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+class AddressDefaultView(ProfileScopedAPIView):
+
+    async def get(self, request):
+        async def load():
+            return await address_values.adata(default_queryset(Address, request.profile_id))
+
+        rows = await profile_cache.aget_or_set(request.person_id, "default_address", load)
+        return success_response(rows[0] if rows else None)
+
+
+class SetDefaultAddressView(ProfileScopedAPIView):
+
+    async def get_object(self, request, pk):
+        try:
+            return await Address.objects.aget(pk=pk, user_id=request.profile_id)
+        except Address.DoesNotExist:
+            raise ValidationError("Address not found.")
+
+    async def put(self, request, pk):
+        address = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
+        await sync_to_async(set_default)(address, request.person_id)
+
+        return with_validators(
+            success_response(AddressSerializer(address).data),
+            object_validators(address)
+        )
+
+
+# ------------------------------------------------------------------
+# Card Management
+# ------------------------------------------------------------------
+class CardListCreateView(ProfileScopedAPIView):
+
+    async def get(self, request):
+        validators = await asection_validators(request.person_id, "cards")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        async def load():
+            return await card_values.adata(Card.objects.filter(user_id=request.profile_id))
+
+        return with_validators(
+            success_response(await profile_cache.aget_or_set(request.person_id, "cards", load)),
+            validators
+        )
+
+    async def post(self, request):
+        serializer = CardSerializer(data=parse_body(request))
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        try:
+            await sync_to_async(serializer.save)(user_id=request.profile_id)
+        except CardLimitExceeded:
+            raise ValidationError("Maximum 4 cards allowed.")
+
+        return success_response(
+            serializer.data,
+            status_code=status.HTTP_201_CREATED
+        )
+
+
+class CardDetailView(ProfileScopedAPIView):
+
+    async def get_object(self, request, pk):
+        try:
+            return await Card.objects.aget(pk=pk, user_id=request.profile_id)
+        except Card.DoesNotExist:
+            raise ValidationError("Card not found.")
+
+    async def get(self, request, pk):
+        card = await self.get_object(request, pk)
+
+        validators = object_validators(card)
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        return with_validators(
+            success_response(CardSerializer(card).data),
+            validators
+        )
+
+    async def put(self, request, pk):
+        card = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
+
+        serializer = CardSerializer(card, data=parse_body(request), partial=True)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        await sync_to_async(serializer.save)()
+
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(card)
+        )
+
+    async def delete(self, request, pk):
+        card = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
+        await card.adelete()
+
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+class CardDefaultView(ProfileScopedAPIView):
+
+    async def get(self, request):
+        async def load():
+            return await card_values.adata(default_queryset(Card, request.profile_id))
+
+        rows = await profile_cache.aget_or_set(request.person_id, "default_card", load)
+        return success_response(rows[0] if rows else None)
+
+
+class SetDefaultCardView(ProfileScopedAPIView):
+
+    async def get_object(self, request, pk):
+        try:
+            return await Card.objects.aget(pk=pk, user_id=request.profile_id)
+        except Card.DoesNotExist:
+            raise ValidationError("Card not found.")
+
+    async def put(self, request, pk):
+        card = await self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
+        await sync_to_async(set_default)(card, request.person_id)
+
+        return with_validators(
+            success_response(CardSerializer(card).data),
+            object_validators(card)
+        )
+
+
+# ------------------------------------------------------------------
+# Bulk Address / Card Operations (one transaction per request)
+# ------------------------------------------------------------------
+class BulkView(ProfileScopedAPIView):
+    operation_class = None
+
+    def get_operation(self, request):
+        return self.operation_class(request.profile_id, request.person_id)
+
+    async def post(self, request):
+        operation = self.get_operation(request)
+        items = payload_list(parse_body(request), "items")
+
+        return success_response(
+            await sync_to_async(operation.create)(items),
+            status_code=status.HTTP_201_CREATED
+        )
+
+    async def put(self, request):
+        operation = self.get_operation(request)
+        items = payload_list(parse_body(request), "items")
+
+        return success_response(
+            await sync_to_async(operation.update)(items)
+        )
+
+    async def delete(self, request):
+        operation = self.get_operation(request)
+        ids = payload_list(parse_body(request), "ids")
+
+        return success_response(
+            await sync_to_async(operation.delete)(ids)
+        )
+
+
+class AddressBulkView(BulkView):
+    operation_class = AddressBulkOperation
+
+
+class CardBulkView(BulkView):
+    operation_class = CardBulkOperation
+
+
+# ------------------------------------------------------------------
+# Internal Service-to-Service API
+# ------------------------------------------------------------------
+class InternalProfileBatchView(AsyncAPIView):
+
+    async def post(self, request):
+        authenticate_service(request)
+        person_ids, include = parse_batch_request(parse_body(request))
+
+        async def stream():
+            for chunk in batch_chunks(person_ids):
+                yield await sync_to_async(batch_lines)(chunk, include)
+
+        return StreamingHttpResponse(stream(), content_type=NDJSON_CONTENT_TYPE)
@@ -1,7 +1,13 @@
+import random
+import time
+
 import requests
 from django.conf import settings
 from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from .circuit_breaker import CircuitBreaker
+from .token_cache import INVALID
+from .ttl_cache import SingleFlight
 
 
 class AuthClientError(Exception):
@@ -9,33 +15,107 @@ class AuthClientError(Exception):
     pass
 
 
+class InvalidTokenError(AuthClientError):
+    """Raised when AUTH_MS rejects the token itself (401)"""
+    pass
+
+
+class AuthServiceUnavailable(AuthClientError):
+    """Raised when AUTH_MS cannot answer in time or the circuit is open"""
+    pass
+
+
+TIMEOUT_MESSAGE = "AUTH_MS timed out (cold start possible)."
+UNAVAILABLE_MESSAGE = "AUTH_MS is temporarily unavailable."
+
+
+class LookupAttempts:
+    """
+    Deadline, retry and circuit breaker policy of one `/me/` lookup, shared by
+    AuthClient and AsyncAuthClient (only their transport and sleep differ).
+    The breaker sees the lookup as one call: it is asked once before the first
+    attempt and told the outcome once, retries included.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.deadline = time.monotonic() + client.deadline
+        self.attempt = 0
+
+    def start(self) -> float:
+        """
+        Returns the timeout of the next attempt.
+
+        Raises:
+            AuthServiceUnavailable: When the circuit is open
+        """
+        if self.attempt == 0 and not self.client.breaker.allow():
+            raise AuthServiceUnavailable("AUTH_MS circuit is open.")
+        return min(self.client.attempt_timeout, self.deadline - time.monotonic())
+
+    def succeeded(self, response) -> dict:
+        """AUTH_MS answered (below 500): returns the user data or raises its error."""
+        self.client.breaker.record_success()
+        return self.client._parse_response(response)
+
+    def failed(self, error) -> float:
+        """
+        Returns the delay before the next attempt, once the previous one failed.
+
+        Raises:
+            AuthServiceUnavailable: `error`, once the retries or the deadline are
+                used up (the lookup then counts as one breaker failure)
+        """
+        self.attempt += 1
+        delay = self.client._backoff(self.attempt)
+        if self.attempt > self.client.max_retries or time.monotonic() + delay >= self.deadline:
+            self.client.breaker.record_failure()
+            raise error
+        return delay
+
+
 class AuthClient:
     """
     Centralized client to communicate with AUTH_MS service.
     Responsible for:
     - Token validation
     - Fetching authenticated user details
+    - Caching lookups per token and coalescing concurrent ones
+    - Bounding every lookup by a deadline and a circuit breaker
     """
 
-    def __init__(self, base_url=None):
+    def __init__(self, base_url=None, cache=None, breaker=None):
         # Base URL of AUTH_MS (remove trailing slash to avoid //)
         self.base_url = (base_url or settings.AUTH_MS_BASE_URL).rstrip("/")
 
-        # Retry strategy for handling temporary failures
-        retry_strategy = Retry(
-            total=10,  # Retry up to 10 times
-            backoff_factor=10,  # Exponential backoff: 10s, 20s, 40s...
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["GET", "POST"],  # Add POST if you call POST endpoints
-            raise_on_status=False,
+        # Optional TokenCache, requests for the same token share one call
+        self.cache = cache
+        self.single_flight = SingleFlight()
+
+        # Total time budget for one lookup, shared by all of its attempts
+        self.deadline = settings.AUTH_MS_DEADLINE
+        self.attempt_timeout = settings.AUTH_MS_TIMEOUT
+        self.max_retries = settings.AUTH_MS_MAX_RETRIES
+        self.backoff_base = settings.AUTH_MS_BACKOFF_BASE
+        self.backoff_max = settings.AUTH_MS_BACKOFF_MAX
+
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=settings.AUTH_MS_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=settings.AUTH_MS_BREAKER_RECOVERY_TIMEOUT,
+            half_open_max_calls=settings.AUTH_MS_BREAKER_HALF_OPEN_CALLS,
         )
 
-        # Attach retry adapter
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Retries are driven by get_user itself so they respect the deadline
+        adapter = HTTPAdapter(max_retries=0)
         self.session = requests.Session()
         self.session.mount("https://", adapter)
         self.session.mount("http://", adapter)
 
+    @property
+    def coalesced(self) -> int:
+        """Lookups that piggy-backed on an identical in-flight call."""
+        return self.single_flight.coalesced
+
     def get_user(self, token: str) -> dict:
         """
         Calls AUTH_MS `/me/` endpoint using Bearer token.
@@ -47,36 +127,75 @@ class AuthClient:
             dict: Authenticated user data
 
         Raises:
-            AuthClientError: For invalid token or connection failure
+            InvalidTokenError: For invalid or expired tokens
+            AuthServiceUnavailable: When AUTH_MS is down, slow or the circuit is open
+            AuthClientError: For any other unexpected AUTH_MS answer
         """
         if not token:
             raise AuthClientError("Authorization token is missing.")
 
-        headers = {"Authorization": f"Bearer {token}"}
-        url = f"{self.base_url}/me/"
+        if self.cache is None:
+            return self._fetch_user(token)
 
-        try:
-            # Increase timeout to 60s for slow-starting services
-            response = self.session.get(url, headers=headers, timeout=60)
+        cached = self.cache.get(token)
+        if cached == INVALID:
+            raise InvalidTokenError("Invalid or expired token.")
+        if cached is not None:
+            return cached
 
-            if response.status_code == 200:
-                data = response.json().get("data")
-                if not data:
-                    raise AuthClientError("No user data returned from AUTH_MS.")
-                return data
+        return self.single_flight.do(
+            self.cache.key(token), lambda: self._fetch_and_cache(token)
+        )
 
-            if response.status_code == 401:
-                raise AuthClientError("Invalid or expired token.")
+    def _fetch_and_cache(self, token: str) -> dict:
+        try:
+            data = self._fetch_user(token)
+        except InvalidTokenError:
+            self.cache.set_invalid(token)
+            raise
 
-            if response.status_code >= 500:
-                raise AuthClientError("AUTH_MS is temporarily unavailable.")
+        self.cache.set(token, data)
+        return data
 
-            raise AuthClientError(
-                f"AUTH_MS returned {response.status_code}: {response.text}"
-            )
+    def _fetch_user(self, token: str) -> dict:
+        headers = {"Authorization": f"Bearer {token}"}
+        url = f"{self.base_url}/me/"
+        attempts = LookupAttempts(self)
+
+        while True:
+            timeout = attempts.start()
+
+            try:
+                response = self.session.get(url, headers=headers, timeout=timeout)
+            except requests.exceptions.Timeout:
+                error = AuthServiceUnavailable(TIMEOUT_MESSAGE)
+            except requests.exceptions.RequestException as e:
+                error = AuthServiceUnavailable(f"Error connecting to AUTH_MS: {e}")
+            else:
+                if response.status_code < 500:
+                    return attempts.succeeded(response)
+                error = AuthServiceUnavailable(UNAVAILABLE_MESSAGE)
+
+            time.sleep(attempts.failed(error))
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": spreads retries of many workers over the whole window
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _parse_response(response) -> dict:
+        if response.status_code == 200:
+            try:
+                data = response.json().get("data")
+            except ValueError:
+                raise AuthClientError("AUTH_MS returned a malformed response.")
+            if not data:
+                raise AuthClientError("No user data returned from AUTH_MS.")
+            return data
 
-        except requests.exceptions.Timeout:
-            raise AuthClientError("AUTH_MS timed out (cold start possible).")
+        if response.status_code == 401:
+            raise InvalidTokenError("Invalid or expired token.")
 
-        except requests.exceptions.RequestException as e:
-            raise AuthClientError(f"Error connecting to AUTH_MS: {e}")
+        raise AuthClientError(
+            f"AUTH_MS returned {response.status_code}: {response.text}"
+        )
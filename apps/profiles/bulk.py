@@ -0,0 +1,287 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .exceptions import BulkValidationError
+from .models import CardLimitExceeded, UserProfile
+from .query_budget import count_items
+from .read_cache import profile_cache
+from .serializers import AddressSerializer, CardSerializer
+
+
+def payload_list(data, key):
+    """The list under `key` of a bulk request body ({"items": [...]} / {"ids": [...]})."""
+    return data.get(key) if isinstance(data, dict) else None
+
+
+def item_errors(errors):
+    """
+    Keeps only the failing items of per-item errors, tagged with their index.
+    Accepts a list aligned with the input or an {index: errors} mapping
+    (what ListSerializer.errors returns, depending on the DRF version).
+    """
+    pairs = errors.items() if isinstance(errors, dict) else enumerate(errors)
+    return [
+        {"index": index, "errors": error}
+        for index, error in sorted(pairs, key=lambda pair: pair[0])
+        if error
+    ]
+
+
+class BulkOperation:
+    """
+    Set-based create / update / delete of the addresses or cards of one profile.
+    Responsible for:
+    - Validating the whole batch before writing and reporting errors per item
+    - Enforcing the per-profile rules on the state the batch would leave behind
+    - Writing with bulk_create / bulk_update / one DELETE inside a single transaction
+    - Invalidating the read cache once (bulk writes do not send model signals)
+    """
+
+    serializer_class = None
+    not_found_message = "Not found."
+
+    def __init__(self, profile_id, person_id):
+        self.profile_id = profile_id
+        self.person_id = person_id
+        # Database of the profile (its shard), the transaction is opened there
+        self.using = router.db_for_write(self.model)
+
+    # -------------------------------
+    # Operations
+    # -------------------------------
+    def create(self, items):
+        items = self.check_batch(items)
+
+        serializer = self.serializer_class(data=items, many=True)
+        if not serializer.is_valid():
+            raise BulkValidationError(item_errors(serializer.errors))
+
+        objs = [
+            self.model(user_id=self.profile_id, **attrs)
+            for attrs in serializer.validated_data
+        ]
+
+        with transaction.atomic(using=self.using):
+            existing = self.lock_and_load()
+            self.check_rules([(None, obj) for obj in existing] + list(enumerate(objs)))
+            self.claim_default([(index, obj) for index, obj in enumerate(objs) if obj.is_default], objs)
+            self.before_create(objs)
+
+            objs = self.model.objects.bulk_create(objs)
+            profile_cache.invalidate(self.person_id, using=self.using)
+
+        return self.results("created", objs)
+
+    def update(self, items):
+        items = self.check_batch(items)
+
+        with transaction.atomic(using=self.using):
+            existing = self.lock_and_load()
+            rows = {obj.pk: obj for obj in existing}
+
+            errors = [{} for _ in items]
+            indexes = {}
+            changes = []
+
+            for index, item in enumerate(items):
+                if not isinstance(item, dict):
+                    errors[index] = {"non_field_errors": ["Expected an object."]}
+                    continue
+
+                pk = self.lookup_id(item.get("id"), rows, indexes)
+                if isinstance(pk, dict):
+                    errors[index] = pk
+                    continue
+                indexes[pk] = index
+
+                data = {key: value for key, value in item.items() if key != "id"}
+                serializer = self.serializer_class(rows[pk], data=data, partial=True)
+                if not serializer.is_valid():
+                    errors[index] = serializer.errors
+                    continue
+
+                changes.append((rows[pk], serializer.validated_data))
+
+            if any(errors):
+                raise BulkValidationError(item_errors(errors))
+
+            # bulk_update skips auto_now, so updated_at is set explicitly
+            now = timezone.now()
+            fields = {"updated_at"}
+            for obj, attrs in changes:
+                for attr, value in attrs.items():
+                    setattr(obj, attr, value)
+                obj.updated_at = now
+                fields.update(attrs)
+
+            self.check_rules([(indexes.get(obj.pk), obj) for obj in existing])
+
+            objs = [obj for obj, _ in changes]
+            self.claim_default(
+                [(indexes[obj.pk], obj) for obj, attrs in changes if attrs.get("is_default")], objs
+            )
+            try:
+                self.model.objects.bulk_update(objs, sorted(fields))
+            except IntegrityError:
+                # e.g. swapping two unique values, the rows are updated one at a time
+                raise BulkValidationError([
+                    {"index": indexes[obj.pk], "errors": {"non_field_errors": [
+                        "Conflicts with another item of this request, send it separately."
+                    ]}}
+                    for obj in objs
+                ])
+            profile_cache.invalidate(self.person_id, using=self.using)
+
+        return self.results("updated", objs)
+
+    def delete(self, ids):
+        ids = self.check_batch(ids)
+
+        with transaction.atomic(using=self.using):
+            rows = {obj.pk for obj in self.lock_and_load()}
+
+            errors = [{} for _ in ids]
+            indexes = {}
+
+            for index, pk in enumerate(ids):
+                pk = self.lookup_id(pk, rows, indexes)
+                if isinstance(pk, dict):
+                    errors[index] = pk
+                else:
+                    indexes[pk] = index
+
+            if any(errors):
+                raise BulkValidationError(item_errors(errors))
+
+            self.queryset().filter(pk__in=ids).delete()
+            profile_cache.invalidate(self.person_id, using=self.using)
+
+        return [
+            {"index": index, "id": pk, "status": "deleted"}
+            for index, pk in enumerate(ids)
+        ]
+
+    # -------------------------------
+    # Rules (override per model)
+    # -------------------------------
+    def check_rules(self, rows):
+        """
+        Validates the final state of the profile's rows.
+
+        Args:
+            rows (list): (index in the request or None, instance) pairs
+        """
+        pass
+
+    def before_create(self, objs):
+        """Runs in the transaction right before bulk_create (which skips Model.save)."""
+        pass
+
+    # -------------------------------
+    # Internals
+    # -------------------------------
+    @property
+    def model(self):
+        return self.serializer_class.Meta.model
+
+    def queryset(self):
+        return self.model.objects.filter(user_id=self.profile_id)
+
+    def check_batch(self, items):
+        if not isinstance(items, list) or not items:
+            raise ValidationError("Expected a non-empty list.")
+
+        if len(items) > settings.PROFILE_BULK_MAX_ITEMS:
+            raise ValidationError(
+                f"At most {settings.PROFILE_BULK_MAX_ITEMS} items per request."
+            )
+
+        count_items(len(items))
+        return items
+
+    def claim_default(self, claims, objs):
+        """
+        Lets one written row become the profile's default. The current default
+        is cleared first: the partial unique index is checked row by row, even
+        within the single UPDATE of bulk_update.
+
+        Args:
+            claims (list): (index in the request, instance) pairs setting is_default
+            objs (list): every instance about to be written
+        """
+        if len(claims) > 1:
+            raise BulkValidationError([
+                {"index": index, "errors": {"is_default": ["Only one item per request can be the default."]}}
+                for index, _ in claims
+            ])
+        if not claims:
+            return
+
+        _, default = claims[0]
+        self.model.objects.clear_default(self.profile_id, keep=default.pk, lock=False)
+        for obj in objs:
+            obj.is_default = obj is default
+
+    def lookup_id(self, pk, rows, seen):
+        """Returns `pk` when it is one of the profile's rows, else the item's error."""
+        if isinstance(pk, bool) or not isinstance(pk, int) or pk not in rows:
+            return {"id": [self.not_found_message]}
+        if pk in seen:
+            return {"id": ["Duplicate id."]}
+        return pk
+
+    def lock_and_load(self):
+        """
+        Serializes bulk writes of the same profile (row lock on the profile)
+        and returns its current rows.
+        """
+        UserProfile.objects.select_for_update().filter(pk=self.profile_id).exists()
+        return list(self.queryset())
+
+    def results(self, status, objs):
+        data = self.serializer_class(objs, many=True).data
+        return [
+            {"index": index, "status": status, "data": item}
+            for index, item in enumerate(data)
+        ]
+
+
+class AddressBulkOperation(BulkOperation):
+    serializer_class = AddressSerializer
+    not_found_message = "Address not found."
+
+    def check_rules(self, rows):
+        # unique (user, address_type), checked on the whole batch at once
+        counts = Counter(obj.address_type for _, obj in rows)
+        duplicates = {address_type for address_type, count in counts.items() if count > 1}
+        if not duplicates:
+            return
+
+        errors = [
+            {"index": index, "errors": {"address_type": ["Address of this type already exists."]}}
+            for index, obj in rows
+            if index is not None and obj.address_type in duplicates
+        ]
+        if errors:
+            raise BulkValidationError(errors)
+        raise ValidationError("Address of this type already exists.")
+
+
+class CardBulkOperation(BulkOperation):
+    serializer_class = CardSerializer
+    not_found_message = "Card not found."
+
+    def before_create(self, objs):
+        # Same single-statement slot reservation as Card.save, for the whole batch
+        try:
+            UserProfile.objects.reserve_card_slots(self.profile_id, len(objs))
+        except CardLimitExceeded as exc:
+            # Flag the new cards that do not fit in the remaining slots
+            raise BulkValidationError([
+                {"index": index, "errors": {"non_field_errors": [str(exc)]}}
+                for index in range(exc.available, len(objs))
+            ])
@@ -0,0 +1,101 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker around a remote dependency.
+    - closed: calls go through, consecutive failures are counted
+    - open: calls are rejected until `recovery_timeout` has passed
+    - half-open: up to `half_open_max_calls` probes decide whether to close again
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def allow(self) -> bool:
+        """Returns True when a call may be attempted right now."""
+        with self._lock:
+            state = self._current_state()
+
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            state = self._current_state()
+
+            if state == self.HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._trip()
+                return
+
+            self._failures += 1
+            if state == self.CLOSED and self._failures >= self.failure_threshold:
+                self._trip()
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+    def _current_state(self):
+        # Open circuits turn half-open lazily once the recovery timeout passed
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.recovery_timeout
+        ):
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def _trip(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._failures = 0
+        self.trips += 1
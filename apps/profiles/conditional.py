@@ -0,0 +1,121 @@
+import hashlib
+from typing import NamedTuple, Optional
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .exceptions import PreconditionFailed
+from .models import UserProfile
+
+
+class Validators(NamedTuple):
+    """HTTP cache validators of a resource."""
+    etag: str
+    last_modified: Optional[int] = None
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+# ------------------------------------------------------------------
+# Validator Builders
+# ------------------------------------------------------------------
+def object_validators(instance) -> Validators:
+    """Validators of an already loaded row (no query)."""
+    return _row_validators(instance.pk, instance.updated_at)
+
+
+def profile_validators(person_id):
+    """Validators of a profile from its id / updated_at only, None if it does not exist."""
+    row = (
+        UserProfile.objects.filter(person_id=person_id)
+        .values_list("pk", "updated_at")
+        .first()
+    )
+    return _row_validators(*row) if row is not None else None
+
+
+def collection_validators(queryset) -> Validators:
+    """
+    Validators of a list from a single aggregate query.
+    Count and id sum catch deletions, max(updated_at) catches inserts and edits.
+    Deleting a row does not move max(updated_at), so lists only get an ETag.
+    """
+    stats = queryset.aggregate(
+        count=Count("pk"), ids=Sum("pk"), last=Max("updated_at")
+    )
+    return _collection_validators(stats)
+
+
+async def aprofile_validators(person_id):
+    row = await (
+        UserProfile.objects.filter(person_id=person_id)
+        .values_list("pk", "updated_at")
+        .afirst()
+    )
+    return _row_validators(*row) if row is not None else None
+
+
+async def acollection_validators(queryset) -> Validators:
+    stats = await queryset.aaggregate(
+        count=Count("pk"), ids=Sum("pk"), last=Max("updated_at")
+    )
+    return _collection_validators(stats)
+
+
+def combine_validators(*validators) -> Validators:
+    """ETag of a composite resource (e.g. the profile bundle)."""
+    return Validators(etag=make_etag(*(v.etag for v in validators if v is not None)))
+
+
+def _row_validators(pk, updated_at) -> Validators:
+    return Validators(
+        etag=make_etag(pk, updated_at.isoformat()),
+        last_modified=int(updated_at.timestamp()),
+    )
+
+
+def _collection_validators(stats) -> Validators:
+    last = stats["last"]
+    return Validators(
+        etag=make_etag(stats["count"], stats["ids"] or 0, last.isoformat() if last else "")
+    )
+
+
+# ------------------------------------------------------------------
+# Request / Response Helpers
+# ------------------------------------------------------------------
+def evaluate_preconditions(request, validators):
+    """
+    Applies If-Match / If-Unmodified-Since / If-None-Match / If-Modified-Since.
+
+    Returns:
+        HttpResponseNotModified | None: 304 response, or None to carry on
+
+    Raises:
+        PreconditionFailed: When an If-Match style precondition fails (412)
+    """
+    if validators is None:
+        return None
+
+    response = get_conditional_response(
+        request, etag=validators.etag, last_modified=validators.last_modified
+    )
+    if response is None:
+        return None
+
+    if response.status_code == 412:
+        raise PreconditionFailed()
+
+    return with_validators(response, validators)
+
+
+def with_validators(response, validators):
+    if validators is not None:
+        response["ETag"] = validators.etag
+        if validators.last_modified is not None:
+            response["Last-Modified"] = http_date(validators.last_modified)
+    return response
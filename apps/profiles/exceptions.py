@@ -1,7 +1,9 @@
+from django.db import OperationalError
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import (
+    APIException,
     AuthenticationFailed,
     NotAuthenticated,
     PermissionDenied,
@@ -9,6 +11,34 @@ from rest_framework.exceptions import (
 )
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
+from .models import EmailInUse
+
+
+class BulkValidationError(ValidationError):
+    """One or more items of a bulk request are invalid, nothing was written"""
+
+    def __init__(self, errors):
+        super().__init__("Invalid input. Please check your data.")
+        self.errors = errors
+
+
+class PreconditionFailed(APIException):
+    """If-Match / If-Unmodified-Since did not match the current resource"""
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = "Resource has changed, fetch it again before updating."
+    default_code = "precondition_failed"
+
+
+class ServiceUnavailable(APIException):
+    """A dependency (AUTH_MS) cannot serve the request right now"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Service temporarily unavailable, try again later."
+    default_code = "service_unavailable"
+
+    def __init__(self, detail=None, retry_after=None):
+        super().__init__(detail)
+        self.retry_after = retry_after
+
 
 def custom_exception_handler(exc, context):
     """
@@ -23,6 +53,14 @@ def custom_exception_handler(exc, context):
         "message": "Something went wrong. Please try again later."
     }
 
+    # -------------------------------
+    # Bulk Validation Errors → 400 (with per-item errors)
+    # -------------------------------
+    if isinstance(exc, BulkValidationError):
+        error_response["message"] = "Invalid input. Please check your data."
+        error_response["errors"] = exc.errors
+        return Response(error_response, status=status.HTTP_400_BAD_REQUEST)
+
     # -------------------------------
     # Validation Errors → 400
     # -------------------------------
@@ -56,6 +94,46 @@ def custom_exception_handler(exc, context):
         error_response["message"] = "Session expired. Please login again."
         return Response(error_response, status=status.HTTP_401_UNAUTHORIZED)
 
+    # -------------------------------
+    # Stale Conditional Write → 412
+    # -------------------------------
+    if isinstance(exc, PreconditionFailed):
+        error_response["message"] = exc.detail
+        return Response(error_response, status=status.HTTP_412_PRECONDITION_FAILED)
+
+    # -------------------------------
+    # Email Held by Another Profile → 409
+    # -------------------------------
+    if isinstance(exc, EmailInUse):
+        error_response["message"] = str(exc)
+        return Response(error_response, status=status.HTTP_409_CONFLICT)
+
+    # -------------------------------
+    # Dependency Unavailable → 503
+    # -------------------------------
+    if isinstance(exc, ServiceUnavailable):
+        error_response["message"] = exc.detail
+        headers = None
+        if exc.retry_after:
+            headers = {"Retry-After": str(int(exc.retry_after) + 1)}
+        return Response(
+            error_response,
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers=headers
+        )
+
+    # -------------------------------
+    # Database Unreachable / Pool Exhausted → 503
+    # -------------------------------
+    if isinstance(exc, OperationalError):
+        error_response["message"] = (
+            "Service is temporarily overloaded. Please try again shortly."
+        )
+        return Response(
+            error_response,
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
     # -------------------------------
     # Unhandled Server Errors → 500
     # -------------------------------
@@ -0,0 +1,139 @@
+import csv
+import io
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import UserProfile
+from .sharding import on_shard, shards
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# Analytics gets the last 4 digits only, never the full card number
+CARD_NUMBER_FIELD = "card_number"
+
+
+def row_dict(instance, exclude=()):
+    """Plain column -> value dict of a model instance (no serializer overhead)."""
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def card_dict(card):
+    data = row_dict(card, exclude=(CARD_NUMBER_FIELD, "user_id"))
+    data["card_last4"] = card.card_number[-4:]
+    return data
+
+
+def export_records(after=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Yields every profile (with nested addresses and cards) ordered by person_id.
+
+    Rows are read through a server-side cursor `chunk_size` profiles at a time,
+    and children are prefetched per chunk, so memory stays flat whatever the
+    table size. `after` resumes from a person_id watermark; `progress` (a dict)
+    is kept up to date with the rows yielded and the last person_id. With
+    several shards, their ordered streams are merged.
+    """
+    queryset = UserProfile.objects.order_by("person_id").prefetch_related("addresses", "cards")
+    if after is not None:
+        queryset = queryset.filter(person_id__gt=after)
+
+    profiles = shards.merge_sorted(
+        lambda alias: on_shard(queryset, alias).iterator(chunk_size=chunk_size),
+        key=lambda profile: profile.person_id,
+    )
+
+    for profile in profiles:
+        record = row_dict(profile)
+        record["addresses"] = [
+            row_dict(address, exclude=("user_id",)) for address in profile.addresses.all()
+        ]
+        record["cards"] = [card_dict(card) for card in profile.cards.all()]
+        yield record
+
+        if progress is not None:
+            progress["rows"] = progress.get("rows", 0) + 1
+            progress["last_person_id"] = profile.person_id
+
+
+# ------------------------------------------------------------------
+# Encoders
+# ------------------------------------------------------------------
+def ndjson_chunks(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def csv_chunks(records):
+    """One row per profile, addresses and cards as JSON columns."""
+    buffer = io.StringIO()
+    writer = None
+
+    for record in records:
+        row = {
+            key: (
+                json.dumps(value, cls=DjangoJSONEncoder) if isinstance(value, list)
+                else value.isoformat() if hasattr(value, "isoformat")
+                else value
+            )
+            for key, value in record.items()
+        }
+
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row))
+            writer.writeheader()
+
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compresses a stream of text chunks on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def export_chunks(fmt="ndjson", after=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                  compress=False, progress=None):
+    """
+    Encoded export stream (str chunks, or bytes when `compress`).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}.")
+
+    encoder = ndjson_chunks if fmt == "ndjson" else csv_chunks
+    chunks = encoder(export_records(after=after, chunk_size=chunk_size, progress=progress))
+
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def aiterate(iterator):
+    """
+    Async view of a sync iterator, one chunk per sync_to_async call. All
+    calls run on the same thread, which keeps the server-side cursor valid.
+    """
+    done = object()
+    while True:
+        chunk = await sync_to_async(next)(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
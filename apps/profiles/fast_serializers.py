@@ -0,0 +1,104 @@
+from operator import methodcaller
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .serializers import AddressSerializer, CardSerializer
+from .timing import timed
+
+# Field types whose to_representation() returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.CharField,
+    serializers.EmailField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+
+
+def field_converter(field):
+    """
+    Converter of one serializer field, picked once: None when the database
+    value is already the output, else the cheapest call matching the field.
+    """
+    field_type = type(field)
+
+    if field_type in PASSTHROUGH_FIELDS:
+        return None
+
+    if field_type is serializers.PrimaryKeyRelatedField and field.pk_field is None:
+        return None
+
+    if field_type is serializers.DateField and getattr(field, "format", api_settings.DATE_FORMAT) == ISO_8601:
+        return methodcaller("isoformat")
+
+    # Anything else (datetimes and their timezone handling included) goes through DRF
+    return field.to_representation
+
+
+class ValuesSerializer:
+    """
+    Read-only twin of a ModelSerializer for list GETs.
+    Responsible for:
+    - Fetching only the serializer's readable columns with .values_list()
+    - Mapping rows to output dicts with per-field converters built once
+    - Producing exactly serializer_class(instances, many=True).data
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._plan = None
+
+    @property
+    def plan(self):
+        # Built on first use, once the app registry and DRF settings are ready
+        if self._plan is None:
+            serializer = self.serializer_class()
+            model = serializer.Meta.model
+
+            names, columns, conversions = [], [], []
+            for field in serializer._readable_fields:
+                if field.source == "*" or "." in field.source:
+                    raise ImproperlyConfigured(
+                        f"{self.serializer_class.__name__}.{field.field_name} is not a plain model column."
+                    )
+
+                names.append(field.field_name)
+                columns.append(model._meta.get_field(field.source).attname)
+
+                convert = field_converter(field)
+                if convert is not None:
+                    conversions.append((field.field_name, convert))
+
+            self._plan = (tuple(names), tuple(columns), tuple(conversions))
+
+        return self._plan
+
+    def to_representation(self, rows) -> list:
+        names, _, conversions = self.plan
+
+        data = []
+        for row in rows:
+            item = dict(zip(names, row))
+            for name, convert in conversions:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+            data.append(item)
+
+        return data
+
+    def data(self, queryset) -> list:
+        rows = list(queryset.values_list(*self.plan[1]))
+        with timed("serialize"):
+            return self.to_representation(rows)
+
+    async def adata(self, queryset) -> list:
+        rows = [row async for row in queryset.values_list(*self.plan[1])]
+        with timed("serialize"):
+            return self.to_representation(rows)
+
+
+address_values = ValuesSerializer(AddressSerializer)
+card_values = ValuesSerializer(CardSerializer)
@@ -0,0 +1,97 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError
+
+from .models import UserProfile
+from .ttl_cache import MISSING, TTLCache
+
+
+# What a write on the pk of a deleted profile raises: the address / card
+# foreign key, or the card slot reservation finding no profile row
+STALE_PROFILE_ERRORS = (IntegrityError, UserProfile.DoesNotExist)
+
+
+class ProfileIdentityMap:
+    """
+    Bounded per-worker map of AUTH_MS person_id -> UserProfile primary key.
+    Responsible for:
+    - Resolving the caller's profile without a query on the hot path
+    - Provisioning the profile on first sight (no DoesNotExist for new callers)
+    - Answering the reverse lookup (profile pk -> person_id) of the signals
+    - Forgetting entries when a profile is deleted, and re-resolving a pk
+      that another worker's delete left stale here
+    """
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=maxsize)
+        self.person_ids = TTLCache(maxsize=maxsize)
+
+    def profile_id(self, person_id, email=None) -> int:
+        """
+        Returns the profile pk of `person_id`, creating the profile if needed.
+        """
+        pk = self.cache.get(person_id)
+        if pk is not MISSING:
+            return pk
+
+        pk = (
+            UserProfile.objects.filter(person_id=person_id)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if pk is None:
+            profile, _ = UserProfile.objects.resolve(person_id, email)
+            pk = profile.pk
+
+        self.cache.set(person_id, pk, self.ttl)
+        self.person_ids.set(pk, person_id, self.ttl)
+        return pk
+
+    async def aprofile_id(self, person_id, email=None) -> int:
+        pk = self.cache.get(person_id)
+        if pk is not MISSING:
+            return pk
+
+        return await sync_to_async(self.profile_id)(person_id, email)
+
+    def refresh(self, person_id, profile_id, email=None):
+        """
+        Re-resolves `person_id` after a write on `profile_id` failed. forget()
+        only runs in the worker that deleted the profile, the others keep its
+        pk until the TTL runs out.
+
+        Returns:
+            int | None: The new pk, None when `profile_id` still exists (the
+            write failed for another reason)
+        """
+        if UserProfile.objects.filter(pk=profile_id).exists():
+            return None
+
+        self.forget(person_id)
+        return self.profile_id(person_id, email)
+
+    async def arefresh(self, person_id, profile_id, email=None):
+        return await sync_to_async(self.refresh)(person_id, profile_id, email)
+
+    def person_id(self, profile_id):
+        """
+        Returns the person_id of a profile resolved by this worker, else None.
+        """
+        person_id = self.person_ids.get(profile_id)
+        return None if person_id is MISSING else person_id
+
+    def forget(self, person_id):
+        pk = self.cache.get(person_id)
+        if pk is not MISSING:
+            self.person_ids.delete(pk)
+        self.cache.delete(person_id)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+profile_ids = ProfileIdentityMap(
+    maxsize=settings.PROFILE_ID_CACHE_MAX_ENTRIES,
+    ttl=settings.PROFILE_ID_CACHE_TTL,
+)
@@ -0,0 +1,284 @@
+import csv
+import gzip
+import io
+import json
+import sys
+
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+from django.db.models import Q
+
+from .models import MAX_CARDS_PER_USER, UserProfile, Address, Card
+from .sharding import shards
+
+IMPORT_FORMATS = ("ndjson", "csv")
+
+# Columns owned by the database, ignored on import. The export layout reads back
+# as-is except for cards: exports carry card_last4 only, the import needs card_number
+SERVER_FIELDS = {"id", "user", "card_count", "created_at", "updated_at"}
+
+MASKED_CARD_MESSAGE = "The export keeps card_last4 only, the full card_number is required."
+
+
+def importable_fields(model):
+    return {
+        field.name: field
+        for field in model._meta.concrete_fields
+        if field.name not in SERVER_FIELDS
+    }
+
+
+PROFILE_FIELDS = importable_fields(UserProfile)
+ADDRESS_FIELDS = importable_fields(Address)
+CARD_FIELDS = importable_fields(Card)
+
+
+class InvalidRecord(ValueError):
+    """A record failing validation, with its nested errors."""
+
+    def __init__(self, errors):
+        super().__init__("Invalid record.")
+        self.errors = errors
+
+
+# ------------------------------------------------------------------
+# Readers
+# ------------------------------------------------------------------
+def open_source(path):
+    """Text stream of `path` ("-" for stdin), gunzipped on the fly for *.gz files."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith(".gz") else path
+    return "csv" if name.endswith(".csv") else "ndjson"
+
+
+def read_records(stream, fmt):
+    """
+    Yields (line number, record or None, error or None) without loading the file.
+    CSV rows carry addresses / cards as JSON columns, like the export.
+    """
+    if fmt == "csv":
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            try:
+                for key in ("addresses", "cards"):
+                    row[key] = json.loads(row[key]) if row.get(key) else []
+            except ValueError:
+                yield line, None, {key: ["Malformed JSON column."]}
+                continue
+            yield line, row, None
+        return
+
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            yield line, None, {"record": ["Malformed JSON."]}
+            continue
+        if not isinstance(record, dict):
+            yield line, None, {"record": ["Expected a JSON object."]}
+            continue
+        yield line, record, None
+
+
+# ------------------------------------------------------------------
+# Validation (same rules as the models)
+# ------------------------------------------------------------------
+def build_instance(model, fields, data):
+    """
+    Model instance from the known fields of `data`, cleaned with the model's
+    own field validation (regex, choices, lengths, types).
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({"record": ["Expected an object."]})
+
+    values = {}
+    for name, field in fields.items():
+        if name not in data:
+            continue
+        value = data[name]
+        # CSV has no null, an empty nullable column means None
+        if value == "" and field.null:
+            value = None
+        values[name] = value
+
+    instance = model(**values)
+    instance.clean_fields(exclude=["user"])
+    return instance
+
+
+def validate_record(record):
+    """
+    Returns (profile, addresses, cards) instances ready for bulk_create.
+
+    Raises:
+        InvalidRecord: With every problem found, per profile / address / card
+    """
+    errors = {}
+
+    try:
+        profile = build_instance(UserProfile, PROFILE_FIELDS, record)
+    except ValidationError as exc:
+        errors["profile"] = exc.message_dict
+        profile = None
+
+    addresses, cards = [], []
+
+    for key, model, fields, target in (
+        ("addresses", Address, ADDRESS_FIELDS, addresses),
+        ("cards", Card, CARD_FIELDS, cards),
+    ):
+        items = record.get(key) or []
+        if not isinstance(items, list):
+            errors[key] = {"record": ["Expected a list."]}
+            continue
+
+        item_errors = {}
+        for index, item in enumerate(items):
+            try:
+                if model is Card and isinstance(item, dict) and "card_last4" in item and not item.get("card_number"):
+                    raise ValidationError({"card_number": [MASKED_CARD_MESSAGE]})
+                instance = build_instance(model, fields, item)
+                if model is Card:
+                    brand_error = Card.brand_error(instance.card_type, instance.card_brand)
+                    if brand_error:
+                        raise ValidationError({"card_brand": [brand_error]})
+                target.append(instance)
+            except ValidationError as exc:
+                item_errors[index] = exc.message_dict
+        if item_errors:
+            errors[key] = item_errors
+
+    if len(cards) > MAX_CARDS_PER_USER:
+        errors["cards"] = {"record": [f"Maximum {MAX_CARDS_PER_USER} cards allowed per user."]}
+
+    address_types = [address.address_type for address in addresses]
+    if len(address_types) != len(set(address_types)):
+        errors["addresses"] = {"record": ["Address of this type already exists."]}
+
+    # One default per profile (partial unique index)
+    for key, items in (("addresses", addresses), ("cards", cards)):
+        if sum(item.is_default for item in items) > 1:
+            errors[key] = {"record": ["Only one default allowed per user."]}
+
+    if errors:
+        raise InvalidRecord(errors)
+
+    profile.card_count = len(cards)
+    return profile, addresses, cards
+
+
+# ------------------------------------------------------------------
+# Loading
+# ------------------------------------------------------------------
+def load_batch(batch):
+    """
+    Validates and inserts one batch in one transaction.
+
+    Args:
+        batch (list): (line number, record or None, read error or None) tuples
+
+    Returns:
+        tuple: (inserted counts dict, rejects list)
+    """
+    rejects = []
+    valid = []
+
+    for line, record, error in batch:
+        if error:
+            rejects.append({"line": line, "errors": error})
+            continue
+        try:
+            valid.append((line, record, *validate_record(record)))
+        except InvalidRecord as exc:
+            rejects.append({"line": line, "record": record, "errors": exc.errors})
+
+    valid = reject_duplicates(valid, rejects)
+
+    # Each profile goes to its shard, one transaction per shard
+    by_shard = {}
+    for row in valid:
+        by_shard.setdefault(shards.shard_for(row[2].person_id), []).append(row)
+
+    counts = {"profiles": 0, "addresses": 0, "cards": 0}
+    try:
+        for using, rows in by_shard.items():
+            try:
+                inserted = insert_rows(rows, using)
+            except IntegrityError:
+                # A row collided with one written meanwhile: isolate it record by record
+                inserted = {"profiles": 0, "addresses": 0, "cards": 0}
+                for row in rows:
+                    try:
+                        for key, value in insert_rows([row], using).items():
+                            inserted[key] += value
+                    except IntegrityError as exc:
+                        rejects.append({"line": row[0], "record": row[1], "errors": {"record": [str(exc)]}})
+
+            for key, value in inserted.items():
+                counts[key] += value
+    finally:
+        # Worker threads hand their connection back after every batch
+        connections.close_all()
+
+    return counts, rejects
+
+
+def reject_duplicates(valid, rejects):
+    """Drops records whose person_id / email exists already or repeats in the batch (one query per shard)."""
+    person_ids = [profile.person_id for _, _, profile, _, _ in valid]
+    emails = [profile.email for _, _, profile, _, _ in valid]
+
+    taken_ids, taken_emails = set(), set()
+    for _, taken in shards.scatter_gather(
+        lambda alias: list(UserProfile.objects.using(alias).filter(
+            Q(person_id__in=person_ids) | Q(email__in=emails)
+        ).values_list("person_id", "email"))
+    ):
+        for person_id, email in taken:
+            taken_ids.add(person_id)
+            taken_emails.add(email)
+
+    kept = []
+    for row in valid:
+        profile = row[2]
+        if profile.person_id in taken_ids or profile.email in taken_emails:
+            rejects.append({"line": row[0], "record": row[1], "errors": {
+                "profile": ["A profile with this person_id or email already exists."]
+            }})
+            continue
+        taken_ids.add(profile.person_id)
+        taken_emails.add(profile.email)
+        kept.append(row)
+
+    return kept
+
+
+def insert_rows(rows, using=DEFAULT_DB_ALIAS):
+    """bulk_create of the profiles, then of their children, in one transaction of shard `using`."""
+    if not rows:
+        return {"profiles": 0, "addresses": 0, "cards": 0}
+
+    with transaction.atomic(using=using):
+        profiles = UserProfile.objects.using(using).bulk_create([row[2] for row in rows])
+
+        addresses, cards = [], []
+        for profile, (_, _, _, profile_addresses, profile_cards) in zip(profiles, rows):
+            for child in profile_addresses:
+                child.user_id = profile.pk
+            for child in profile_cards:
+                child.user_id = profile.pk
+            addresses.extend(profile_addresses)
+            cards.extend(profile_cards)
+
+        Address.objects.using(using).bulk_create(addresses)
+        Card.objects.using(using).bulk_create(cards)
+
+    return {"profiles": len(profiles), "addresses": len(addresses), "cards": len(cards)}
@@ -0,0 +1,158 @@
+import hmac
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied, ValidationError
+
+from .models import UserProfile, Address, Card
+from .serializers import UserProfileSerializer, AddressSerializer, CardSerializer
+from .sharding import on_shard, shards
+
+BATCH_INCLUDES = ("default_address", "default_card")
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+# ------------------------------------------------------------------
+# Service Authentication
+# ------------------------------------------------------------------
+def authenticate_service(request):
+    """
+    Checks the X-Service-Token header against INTERNAL_SERVICE_TOKENS.
+
+    Raises:
+        PermissionDenied: When the internal API is disabled or the token is unknown
+        NotAuthenticated: When no service token was sent
+    """
+    if not settings.INTERNAL_SERVICE_TOKENS:
+        raise PermissionDenied("Internal API is disabled.")
+
+    token = request.headers.get("X-Service-Token")
+    if not token:
+        raise NotAuthenticated("Service token missing.")
+
+    # Compare against every configured token, in constant time
+    matched = False
+    for expected in settings.INTERNAL_SERVICE_TOKENS:
+        matched |= hmac.compare_digest(token.encode(), expected.encode())
+
+    if not matched:
+        raise PermissionDenied("Unknown service token.")
+
+
+# ------------------------------------------------------------------
+# Batch Profile Lookup
+# ------------------------------------------------------------------
+def parse_batch_request(data):
+    """
+    Validates {"person_ids": [...], "include": [...]}.
+
+    Returns:
+        tuple: (unique person_ids in request order, requested includes)
+    """
+    if not isinstance(data, dict):
+        raise ValidationError("Expected a JSON object.")
+
+    person_ids = data.get("person_ids")
+    if not isinstance(person_ids, list) or not person_ids:
+        raise ValidationError("person_ids must be a non-empty list.")
+
+    if any(isinstance(pk, bool) or not isinstance(pk, int) for pk in person_ids):
+        raise ValidationError("person_ids must be integers.")
+
+    person_ids = list(dict.fromkeys(person_ids))
+    if len(person_ids) > settings.INTERNAL_BATCH_MAX_IDS:
+        raise ValidationError(
+            f"At most {settings.INTERNAL_BATCH_MAX_IDS} person_ids per request."
+        )
+
+    include = data.get("include") or []
+    if not isinstance(include, list) or set(include) - set(BATCH_INCLUDES):
+        raise ValidationError(f"include accepts: {', '.join(BATCH_INCLUDES)}.")
+
+    return person_ids, tuple(name for name in BATCH_INCLUDES if name in include)
+
+
+def batch_chunks(person_ids):
+    size = settings.INTERNAL_BATCH_CHUNK_SIZE
+    for start in range(0, len(person_ids), size):
+        yield person_ids[start:start + size]
+
+
+def batch_queryset(person_ids, include):
+    # One IN query for the chunk plus one per include
+    queryset = UserProfile.objects.filter(person_id__in=person_ids)
+
+    if "default_address" in include:
+        queryset = queryset.prefetch_related(Prefetch(
+            "addresses",
+            queryset=Address.objects.filter(is_default=True),
+            to_attr="default_addresses",
+        ))
+
+    if "default_card" in include:
+        queryset = queryset.prefetch_related(Prefetch(
+            "cards",
+            queryset=Card.objects.filter(is_default=True),
+            to_attr="default_cards",
+        ))
+
+    return queryset
+
+
+def batch_profiles(person_ids, include):
+    """
+    Profiles of the chunk, gathered from every shard holding some of them
+    (the queries of batch_queryset per shard, the shards in parallel).
+    """
+    groups = shards.group(person_ids)
+    results = shards.scatter_gather(
+        lambda alias: list(on_shard(batch_queryset(groups[alias], include), alias)), groups
+    )
+
+    profiles = {}
+    for alias, rows in results:
+        for profile in rows:
+            # A user mid-reshard may be on two shards, the ring's copy wins
+            if profile.person_id not in profiles or alias == shards.shard_for(profile.person_id):
+                profiles[profile.person_id] = profile
+
+    return list(profiles.values())
+
+
+def batch_lines(person_ids, include) -> str:
+    """
+    NDJSON lines of one chunk: one line per requested person_id, in request
+    order, with "profile": null for unknown ids.
+    """
+    profiles = batch_profiles(person_ids, include)
+
+    # One many=True pass per kind instead of a serializer per object
+    records = {
+        profile.person_id: {"person_id": profile.person_id, "profile": data}
+        for profile, data in zip(profiles, UserProfileSerializer(profiles, many=True).data)
+    }
+
+    for name, attr, serializer_class in (
+        ("default_address", "default_addresses", AddressSerializer),
+        ("default_card", "default_cards", CardSerializer),
+    ):
+        if name not in include:
+            continue
+
+        owners = [profile for profile in profiles if getattr(profile, attr)]
+        children = serializer_class([getattr(profile, attr)[0] for profile in owners], many=True).data
+
+        for profile in profiles:
+            records[profile.person_id][name] = None
+        for profile, data in zip(owners, children):
+            records[profile.person_id][name] = data
+
+    missing = {"profile": None, **{name: None for name in include}}
+
+    return "".join(
+        json.dumps(records.get(person_id) or {"person_id": person_id, **missing}, cls=DjangoJSONEncoder) + "\n"
+        for person_id in person_ids
+    )
@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.profiles.export import (
+    DEFAULT_CHUNK_SIZE,
+    EXPORT_FORMATS,
+    export_chunks,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every profile with its addresses and cards as NDJSON or CSV, "
+        "optionally gzip-compressed, resuming after a person_id watermark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=list(EXPORT_FORMATS), default="ndjson")
+        parser.add_argument("--output", "-o", help="File to write (default: stdout)")
+        parser.add_argument("--gzip", action="store_true", help="Gzip-compress the output")
+        parser.add_argument("--after", type=int, help="Only export person_ids greater than this")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("--chunk-size must be positive.")
+
+        compress = options["gzip"]
+        progress = {"rows": 0, "last_person_id": options["after"]}
+        chunks = export_chunks(
+            options["format"],
+            after=options["after"],
+            chunk_size=options["chunk_size"],
+            compress=compress,
+            progress=progress,
+        )
+
+        path = options["output"]
+        if path and compress:
+            stream = open(path, "wb")
+        elif path:
+            stream = open(path, "w", encoding="utf-8", newline="")
+        else:
+            stream = sys.stdout.buffer if compress else sys.stdout
+
+        started = time.monotonic()
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+        finally:
+            if path:
+                stream.close()
+            else:
+                stream.flush()
+
+            # Printed on failure too, so an interrupted export can be resumed
+            self.stderr.write(
+                f"Exported {progress['rows']} profiles in {time.monotonic() - started:.1f}s, "
+                f"last person_id: {progress['last_person_id']} "
+                f"(resume with --after {progress['last_person_id']})."
+            )
@@ -0,0 +1,62 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.profiles.sharding import misplaced, move_profile, shards
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Seconds between two progress lines
+PROGRESS_INTERVAL = 5
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves every user stored on a shard other than its ring shard (after "
+        "DB_SHARD_ACTIVE changed), one user per transaction, while serving traffic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                            help="person_ids scanned per query")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the users to move")
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size must be positive.")
+
+        if shards.previous is None and not options["dry_run"]:
+            self.stderr.write(
+                "DB_SHARD_PREVIOUS_ACTIVE is not set: users mid-move are not found by requests "
+                "until moved. Set it to the shard count before the change while resharding."
+            )
+
+        moves = Counter()
+        started = last_report = time.monotonic()
+
+        for source in shards.active:
+            after = None
+            while True:
+                after, batch = misplaced(source, after=after, limit=batch_size)
+                if after is None:
+                    break
+
+                for person_id, target in batch:
+                    if options["dry_run"] or move_profile(person_id, source, target):
+                        moves[source, target] += 1
+
+                if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    self.report(moves, started, options["dry_run"])
+
+        self.report(moves, started, options["dry_run"])
+
+    def report(self, moves, started, dry_run):
+        elapsed = time.monotonic() - started
+        pairs = ", ".join(f"{source} -> {target}: {count}" for (source, target), count in sorted(moves.items()))
+        self.stderr.write(
+            f"{'To move' if dry_run else 'Moved'} {sum(moves.values())} users"
+            f" ({pairs or 'all on their shard'}) in {elapsed:.1f}s."
+        )
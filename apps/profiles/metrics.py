@@ -0,0 +1,230 @@
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .timing import PHASES
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+
+class Histogram:
+    """
+    Prometheus-style histogram (per-bucket counts, cumulated on exposition).
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        # First bucket whose upper bound is >= value, the last slot is +Inf
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return self.counts, self.sum, self.count
+
+    def add(self, counts, total, count):
+        """Adds the counts of another histogram with the same buckets."""
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, counts)]
+        self.sum += total
+        self.count += count
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.add(*self.state())
+        return histogram
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield format_value(bound), cumulative
+        yield "+Inf", self.count
+
+
+class RequestMetrics:
+    """
+    Request metrics, labelled by route pattern and method.
+    Responsible for:
+    - Duration histograms of every phase (auth, db, serialize, render, total)
+    - A DB query count histogram and a request counter per status
+    - Sharing the counts of every worker through `directory` (one file per
+      process, written at most every `flush_interval` seconds and on scrape)
+    - Rendering everything in the Prometheus text format
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.queries = {}
+        self.requests = {}
+        self.flushed_at = time.monotonic()
+
+    def observe(self, route, method, status, timings, total):
+        with self.lock:
+            for phase in PHASES + ("total",):
+                key = (route, method, phase)
+                histogram = self.durations.get(key)
+                if histogram is None:
+                    histogram = self.durations[key] = Histogram(DURATION_BUCKETS)
+                histogram.observe(total if phase == "total" else timings.durations[phase])
+
+            key = (route, method)
+            histogram = self.queries.get(key)
+            if histogram is None:
+                histogram = self.queries[key] = Histogram(QUERY_BUCKETS)
+            histogram.observe(timings.queries)
+
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+        if self.directory and time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def exposition(self) -> str:
+        if self.directory:
+            self.flush()
+            durations, queries, requests = self.merged()
+        else:
+            with self.lock:
+                durations, queries, requests = self.snapshot()
+
+        lines = [
+            "# HELP profile_ms_request_phase_seconds Time spent in each request phase.",
+            "# TYPE profile_ms_request_phase_seconds histogram",
+        ]
+        for (route, method, phase), histogram in sorted(durations.items()):
+            lines.extend(histogram_lines(
+                "profile_ms_request_phase_seconds",
+                {"route": route, "method": method, "phase": phase},
+                histogram,
+            ))
+
+        lines += [
+            "# HELP profile_ms_request_db_queries Database queries per request.",
+            "# TYPE profile_ms_request_db_queries histogram",
+        ]
+        for (route, method), histogram in sorted(queries.items()):
+            lines.extend(histogram_lines(
+                "profile_ms_request_db_queries", {"route": route, "method": method}, histogram
+            ))
+
+        lines += [
+            "# HELP profile_ms_requests_total Requests served.",
+            "# TYPE profile_ms_requests_total counter",
+        ]
+        for (route, method, status), count in sorted(requests.items()):
+            labels = format_labels({"route": route, "method": method, "status": status})
+            lines.append(f"profile_ms_requests_total{labels} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    # -------------------------------
+    # Sharing between workers
+    # -------------------------------
+    def snapshot(self):
+        """Copies of this process' histograms and counters (caller holds the lock)."""
+        return (
+            {key: histogram.copy() for key, histogram in self.durations.items()},
+            {key: histogram.copy() for key, histogram in self.queries.items()},
+            dict(self.requests),
+        )
+
+    def flush(self):
+        """Writes this process' counts to its file of `directory`, atomically."""
+        with self.lock:
+            self.flushed_at = time.monotonic()
+            document = {
+                "durations": [[*key, *histogram.state()] for key, histogram in self.durations.items()],
+                "queries": [[*key, *histogram.state()] for key, histogram in self.queries.items()],
+                "requests": [[*key, count] for key, count in self.requests.items()],
+            }
+
+        # pid read now, not at import: workers are forked from the master
+        path = os.path.join(self.directory, f"worker-{os.getpid()}.json")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(document, file)
+        os.replace(temporary, path)
+
+    def merged(self):
+        """
+        Sums the files of every worker, live or exited: counters of a worker
+        that was restarted stay counted, so totals never go backwards.
+        """
+        durations, queries, requests = {}, {}, {}
+
+        for name in os.listdir(self.directory):
+            if not (name.startswith("worker-") and name.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as file:
+                    document = json.load(file)
+            except (OSError, ValueError):
+                # Removed or replaced meanwhile
+                continue
+
+            for target, rows, size, buckets in (
+                (durations, document["durations"], 3, DURATION_BUCKETS),
+                (queries, document["queries"], 2, QUERY_BUCKETS),
+            ):
+                for row in rows:
+                    key = tuple(row[:size])
+                    histogram = target.get(key)
+                    if histogram is None:
+                        histogram = target[key] = Histogram(buckets)
+                    histogram.add(*row[size:])
+
+            for *key, count in document["requests"]:
+                key = tuple(key)
+                requests[key] = requests.get(key, 0) + count
+
+        return durations, queries, requests
+
+
+def histogram_lines(name, labels, histogram):
+    for bound, count in histogram.samples():
+        yield f"{name}_bucket{format_labels({**labels, 'le': bound})} {count}"
+    yield f"{name}_sum{format_labels(labels)} {format_value(histogram.sum)}"
+    yield f"{name}_count{format_labels(labels)} {histogram.count}"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels) -> str:
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+
+def format_value(value) -> str:
+    # Integer bounds without a trailing ".0"
+    return str(value) if isinstance(value, int) else repr(value)
+
+
+request_metrics = RequestMetrics(
+    directory=settings.METRICS_DIR or None,
+    flush_interval=settings.METRICS_FLUSH_INTERVAL,
+)
+if request_metrics.directory:
+    # The last requests of a worker that stops are counted too
+    atexit.register(request_metrics.flush)
+
@@ -0,0 +1,161 @@
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import request_metrics
+from .query_budget import QueryLog, budget_violation, current_query_log, logger
+from .routers import READ_METHODS, RequestRouting, current_routing
+from .timing import RequestTimings, current_timings
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request phase: auth, db (count and time), serialize, render.
+    Responsible for:
+    - Emitting the phases as a Server-Timing header
+    - Feeding the per-route histograms of the metrics endpoint
+    - Staying out of the stack entirely when REQUEST_TIMING_ENABLED is off
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        # Streamed bodies are produced later, their time is not included
+        total = timings.elapsed()
+
+        match = request.resolver_match
+        route = match.route if match else UNMATCHED_ROUTE
+        request_metrics.observe(route, request.method, response.status_code, timings, total)
+
+        if settings.SERVER_TIMING_HEADER:
+            response["Server-Timing"] = timings.server_timing(total)
+
+        return response
+
+
+class QueryBudgetMiddleware:
+    """
+    Production side of the query budgets (apps.profiles.query_budget).
+    Responsible for:
+    - Tracking the SQL of a QUERY_BUDGET_SAMPLE_RATE share of the requests
+    - Logging a warning, with every statement and its origin, on a violation
+    - Staying out of the stack entirely when the sample rate is 0
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.QUERY_BUDGET_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.sample_rate = settings.QUERY_BUDGET_SAMPLE_RATE
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        log = QueryLog()
+        token = current_query_log.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_log.reset(token)
+
+        self.check(request, log)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        log = QueryLog()
+        token = current_query_log.set(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_log.reset(token)
+
+        self.check(request, log)
+        return response
+
+    def check(self, request, log):
+        # Streamed bodies are produced later, their queries are not seen
+        match = request.resolver_match
+        if match is None:
+            return
+
+        violation = budget_violation(match.url_name, request.method, log)
+        if violation:
+            logger.warning("Query budget exceeded: %s", violation)
+
+
+class DatabaseRoutingMiddleware:
+    """
+    Per-request state of the ShardRouter / ReplicaRouter.
+    Responsible for:
+    - A fresh routing per request (the person_id is bound at authentication)
+    - Allowing replica reads for GET / HEAD requests only
+    - Staying out of the stack entirely without shards and replicas
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_ROUTERS:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Not reset on return: streamed bodies (export) keep reading the same databases
+        # (async: set in the request's task, the returned coroutine runs there)
+        current_routing.set(RequestRouting(replica_reads=request.method in READ_METHODS))
+        return self.get_response(request)
@@ -0,0 +1,34 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_card_count(apps, schema_editor):
+    UserProfile = apps.get_model('profiles', 'UserProfile')
+    Card = apps.get_model('profiles', 'Card')
+
+    # One UPDATE with a correlated COUNT, no row is loaded into Python
+    cards = (
+        Card.objects.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    UserProfile.objects.update(card_count=Coalesce(Subquery(cards), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_alter_address_city_alter_address_country_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='card_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_card_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def keep_latest_default(apps, schema_editor):
+    # Profiles with several defaults keep the most recently updated one,
+    # one UPDATE per table, so the unique indexes can be built
+    for model_name in ('Address', 'Card'):
+        model = apps.get_model('profiles', model_name)
+        latest = (
+            model.objects.filter(user=OuterRef('user'), is_default=True)
+            .order_by('-updated_at', '-id')
+            .values('id')[:1]
+        )
+        model.objects.filter(is_default=True).exclude(id=Subquery(latest)).update(is_default=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0003_userprofile_card_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='address',
+            options={'ordering': ['created_at', 'id']},
+        ),
+        migrations.AlterModelOptions(
+            name='card',
+            options={'ordering': ['created_at', 'id']},
+        ),
+        # The composite indexes exist before the single-column ones are dropped
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', 'created_at'], name='address_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='card',
+            index=models.Index(fields=['user', 'created_at'], name='card_user_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='address',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='addresses', to='profiles.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='card',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cards', to='profiles.userprofile'),
+        ),
+        migrations.RunPython(keep_latest_default, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='address',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user',), name='address_one_default_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='card',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('user',), name='card_one_default_per_user'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class AddSearchIndex(AddIndexConcurrently):
+    # Built without blocking writes on PostgreSQL; trigram / pattern_ops
+    # indexes do not exist elsewhere, the model state is updated everywhere
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def trigram_index(column, name):
+    return django.contrib.postgres.indexes.GinIndex(
+        django.contrib.postgres.indexes.OpClass(
+            django.db.models.functions.text.Upper(column), name='gin_trgm_ops'
+        ),
+        name=name,
+    )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run in a transaction
+    atomic = False
+
+    dependencies = [
+        ('profiles', '0004_default_flags_and_user_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddSearchIndex(
+            model_name='userprofile',
+            index=trigram_index('email', 'profile_email_trgm_idx'),
+        ),
+        AddSearchIndex(
+            model_name='userprofile',
+            index=trigram_index('first_name', 'profile_first_name_trgm_idx'),
+        ),
+        AddSearchIndex(
+            model_name='userprofile',
+            index=trigram_index('last_name', 'profile_last_name_trgm_idx'),
+        ),
+        AddSearchIndex(
+            model_name='userprofile',
+            index=models.Index(
+                fields=['primary_phone'], name='profile_primary_phone_idx', opclasses=['varchar_pattern_ops']
+            ),
+        ),
+        AddSearchIndex(
+            model_name='userprofile',
+            index=models.Index(
+                fields=['alternate_phone'], name='profile_alt_phone_idx', opclasses=['varchar_pattern_ops']
+            ),
+        ),
+    ]
@@ -1,5 +1,180 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Upper
 from django.core.validators import RegexValidator
+from django.utils import timezone
+
+MAX_CARDS_PER_USER = 4
+
+
+class CardLimitExceeded(ValueError):
+    """Raised when a profile has no free card slot left"""
+
+    def __init__(self, available=0):
+        super().__init__(f"Maximum {MAX_CARDS_PER_USER} cards allowed per user.")
+        self.available = available
+
+
+class EmailInUse(ValueError):
+    """Raised when a new person_id's email still belongs to another profile"""
+
+    def __init__(self):
+        super().__init__("This email is already used by another profile.")
+
+
+class UserProfileManager(models.Manager):
+
+    def resolve(self, person_id, email):
+        """
+        Returns the profile of `person_id`, provisioning it on first sight.
+
+        Fast path: one SELECT for a known person. Otherwise a single
+        INSERT ... ON CONFLICT DO NOTHING RETURNING, so concurrent first
+        requests never race into an IntegrityError; the loser of the race
+        reads the winner's row.
+
+        Returns:
+            tuple: (profile, created)
+
+        Raises:
+            EmailInUse: When the email (unique too) is still on another profile.
+                Only checked on the person_id's shard: email uniqueness is
+                per shard with DB_SHARD_HOSTS.
+        """
+        profile = self.filter(person_id=person_id).first()
+        if profile is None:
+            profile = self._insert_if_absent(person_id, email)
+            if profile is not None:
+                return profile, True
+            # After the INSERT this request reads from the primary, not a replica
+            profile = self.filter(person_id=person_id).first()
+            if profile is None:
+                # Nothing inserted and no row for person_id: the email conflicted
+                raise EmailInUse()
+
+        return self.follow_email(profile, email), False
+
+    async def aresolve(self, person_id, email):
+        return await sync_to_async(self.resolve)(person_id, email)
+
+    async def afollow_email(self, profile, email):
+        return await sync_to_async(self.follow_email)(profile, email)
+
+    def follow_email(self, profile, email):
+        """
+        Follows an email change made in AUTH_MS for an existing person_id.
+        The unique index, hence the clash check, covers the profile's shard only.
+        """
+        if not email or profile.email == email:
+            return profile
+
+        old_email = profile.email
+        profile.email = email
+        try:
+            with transaction.atomic(using=router.db_for_write(self.model, instance=profile)):
+                profile.save(update_fields=["email", "updated_at"])
+        except IntegrityError:
+            # The address still belongs to another (stale) profile, keep ours
+            profile.email = old_email
+
+        return profile
+
+    def _insert_if_absent(self, person_id, email):
+        """
+        INSERT ... ON CONFLICT DO NOTHING RETURNING *, None when the person_id
+        or the email is already taken (no conflict target: both are unique).
+        """
+        # A write, so routed like one (raw() alone would go to a read replica)
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        profile = self.model(person_id=person_id, email=email)
+
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        values = [
+            field.get_db_prep_save(field.pre_save(profile, add=True), connection)
+            for field in fields
+        ]
+
+        sql = (
+            f"INSERT INTO {quote(self.model._meta.db_table)} "
+            f"({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            "ON CONFLICT DO NOTHING "
+            f"RETURNING *"
+        )
+        return next(iter(self.db_manager(using).raw(sql, values)), None)
+
+    def reserve_card_slots(self, profile_id, count=1):
+        """
+        Takes `count` card slots of a profile with one conditional UPDATE.
+        The UPDATE locks the profile row, so concurrent creates queue up behind
+        it and the limit holds without a prior COUNT. Must run in the
+        transaction that inserts the cards.
+
+        Raises:
+            CardLimitExceeded: When fewer than `count` slots are free
+            UserProfile.DoesNotExist: When the profile was deleted meanwhile
+        """
+        reserved = self.filter(
+            pk=profile_id,
+            card_count__lte=MAX_CARDS_PER_USER - count
+        ).update(card_count=F("card_count") + count)
+
+        if not reserved:
+            used = self.filter(pk=profile_id).values_list("card_count", flat=True).first()
+            if used is None:
+                raise self.model.DoesNotExist("Profile not found.")
+            raise CardLimitExceeded(available=max(MAX_CARDS_PER_USER - used, 0))
+
+    def release_card_slots(self, profile_id, count=1):
+        self.filter(pk=profile_id, card_count__gte=count).update(
+            card_count=F("card_count") - count
+        )
+
+
+class DefaultFlagManager(models.Manager):
+    """
+    Manager of the addresses / cards of a profile, at most one of which is
+    its default (partial unique index on user WHERE is_default).
+    """
+
+    def clear_default(self, profile_id, keep=None, lock=True):
+        """
+        Unsets the profile's default (except row `keep`) before another row
+        becomes the default, in the same transaction. The partial unique
+        index cannot be deferred, so the old default has to be gone first.
+        `lock` takes the profile row lock that serializes default changes.
+        """
+        if lock:
+            UserProfile.objects.db_manager(self._db).select_for_update().filter(pk=profile_id).exists()
+
+        # update() skips auto_now, so updated_at is set explicitly
+        self.filter(user_id=profile_id, is_default=True).exclude(pk=keep).update(
+            is_default=False, updated_at=timezone.now()
+        )
+
+    def set_default(self, obj):
+        """
+        Makes `obj` the only default of its profile, atomically.
+
+        Raises:
+            DoesNotExist: When the row was deleted meanwhile (nothing is changed)
+        """
+        now = timezone.now()
+        using = self._db or router.db_for_write(self.model, instance=obj)
+
+        with transaction.atomic(using=using):
+            self.clear_default(obj.user_id, keep=obj.pk)
+            if not self.filter(pk=obj.pk, user_id=obj.user_id).update(is_default=True, updated_at=now):
+                raise self.model.DoesNotExist
+
+        obj.is_default = obj._loaded_default = True
+        obj.updated_at = now
+        return obj
+
 
 class UserProfile(models.Model):
     # Auth info from AUTH_MS
@@ -31,17 +206,73 @@ class UserProfile(models.Model):
     GENDER_CHOICES = [("M", "Male"), ("F", "Female"), ("O", "Other")]
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES, blank=True, null=True)
 
+    # Denormalized number of cards, maintained by reserve / release_card_slots
+    card_count = models.PositiveSmallIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = UserProfileManager()
+
+    class Meta:
+        # Staff search (apps.profiles.search), PostgreSQL only: prefix (LIKE) and
+        # trigram similarity on UPPER(column), LIKE prefix on the phone digits
+        indexes = [
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="profile_email_trgm_idx"),
+            GinIndex(OpClass(Upper("first_name"), name="gin_trgm_ops"), name="profile_first_name_trgm_idx"),
+            GinIndex(OpClass(Upper("last_name"), name="gin_trgm_ops"), name="profile_last_name_trgm_idx"),
+            models.Index(
+                fields=["primary_phone"], opclasses=["varchar_pattern_ops"], name="profile_primary_phone_idx"
+            ),
+            models.Index(
+                fields=["alternate_phone"], opclasses=["varchar_pattern_ops"], name="profile_alt_phone_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
 
-class Address(models.Model):
+class DefaultFlagModel(models.Model):
+    """
+    Base of the addresses / cards: rows of one profile, at most one of which
+    is its default. Remembers the flag as loaded, so saving the current
+    default does not clear the others again.
+    """
+
+    objects = DefaultFlagManager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_default = instance.__dict__.get("is_default", False)
+        return instance
+
+    def claims_default(self) -> bool:
+        """True when saving makes this row the default."""
+        return self.is_default and not getattr(self, "_loaded_default", False)
+
+    def save(self, *args, **kwargs):
+        if not self.claims_default():
+            super().save(*args, **kwargs)
+        else:
+            # The previous default goes first, in the same transaction
+            using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+            with transaction.atomic(using=using):
+                type(self).objects.db_manager(using).clear_default(self.user_id, keep=self.pk)
+                super().save(*args, **kwargs)
+
+        self._loaded_default = self.is_default
+
+
+class Address(DefaultFlagModel):
     ADDRESS_TYPE_CHOICES = [("home", "Home"), ("work", "Work"), ("friend", "Friend"), ("other", "Other")]
 
-    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="addresses")
+    # Indexed by (user, created_at), no single-column index
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="addresses", db_index=False)
     address_type = models.CharField(max_length=10, choices=ADDRESS_TYPE_CHOICES)
     line1 = models.CharField(max_length=255)
     line2 = models.CharField(max_length=255, blank=True)
@@ -67,18 +298,36 @@ class Address(models.Model):
 
     class Meta:
         unique_together = ("user", "address_type")
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="address_user_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"], condition=Q(is_default=True), name="address_one_default_per_user"
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.user.email} - {self.address_type}"
+        # No lazy profile load per row (admin listings): email only when already fetched
+        owner = self.user.email if type(self).user.is_cached(self) else f"profile {self.user_id}"
+        return f"{owner} - {self.address_type}"
 
 
-class Card(models.Model):
+class Card(DefaultFlagModel):
     CARD_TYPE_CHOICES = [("credit", "Credit"), ("debit", "Debit")]
 
     CREDIT_CARD_BRANDS = [("visa", "Visa"), ("mastercard", "MasterCard"), ("amex", "American Express"), ("discover", "Discover")]
     DEBIT_CARD_BRANDS = [("visa_debit", "Visa Debit"), ("master_debit", "MasterCard Debit"), ("maestro", "Maestro"), ("rupay", "Rupay")]
 
-    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="cards")
+    # Built once, looked up on every save / validation
+    BRAND_CODES = {
+        "credit": frozenset(code for code, _ in CREDIT_CARD_BRANDS),
+        "debit": frozenset(code for code, _ in DEBIT_CARD_BRANDS),
+    }
+
+    # Indexed by (user, created_at), no single-column index
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name="cards", db_index=False)
     card_type = models.CharField(max_length=10, choices=CARD_TYPE_CHOICES)
     card_brand = models.CharField(max_length=20)
     card_number = models.CharField(max_length=16)
@@ -90,14 +339,38 @@ class Card(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="card_user_created_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user"], condition=Q(is_default=True), name="card_one_default_per_user"
+            ),
+        ]
+
+    @classmethod
+    def brand_error(cls, card_type, card_brand):
+        """Error message when `card_brand` does not belong to `card_type`, else None."""
+        brands = cls.BRAND_CODES.get(card_type)
+        if brands is not None and card_brand not in brands:
+            return f"Invalid {card_type} card brand."
+        return None
+
     def save(self, *args, **kwargs):
-        if not self.pk and self.user.cards.count() >= 4:
-            raise ValueError("Maximum 4 cards allowed per user.")
-        if self.card_type == "credit" and self.card_brand not in dict(self.CREDIT_CARD_BRANDS):
-            raise ValueError("Invalid credit card brand.")
-        if self.card_type == "debit" and self.card_brand not in dict(self.DEBIT_CARD_BRANDS):
-            raise ValueError("Invalid debit card brand.")
-        super().save(*args, **kwargs)
+        error = self.brand_error(self.card_type, self.card_brand)
+        if error:
+            raise ValueError(error)
+
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        # Reserve the slot and insert in one transaction, the reservation is the limit check
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            UserProfile.objects.db_manager(using).reserve_card_slots(self.user_id)
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.card_type.title()} - {self.card_brand.title()} ({self.card_holder_name})"
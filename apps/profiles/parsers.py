@@ -0,0 +1,39 @@
+import codecs
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+
+def decode(body: bytes):
+    """
+    Parses a JSON request body.
+
+    Raises:
+        ParseError: When the body is not valid JSON
+    """
+    try:
+        return orjson.loads(body)
+    except orjson.JSONDecodeError as exc:
+        raise ParseError(f"JSON parse error - {exc}")
+
+
+class ORJSONParser(JSONParser):
+    """
+    Drop-in JSONParser backed by orjson (NaN / Infinity rejected, like strict DRF).
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        body = stream.read()
+        # orjson reads UTF-8 only
+        if codecs.lookup(encoding).name != "utf-8":
+            try:
+                body = body.decode(encoding)
+            except ValueError as exc:
+                raise ParseError(f"JSON parse error - {exc}")
+
+        return decode(body)
@@ -0,0 +1,156 @@
+import logging
+import os
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Maximum SQL queries of one request: `queries`, plus `per_item` for every
+# item of a bulk / batch body (reported by the view with count_items())
+QueryBudget = namedtuple("QueryBudget", ["queries", "per_item"], defaults=[0])
+
+# url name -> method -> budget, with the identity map and read cache cold.
+# List GETs and creates also cover a caller's first request (the profile is
+# provisioned, 2 queries). Measured under TestCase, so atomic blocks count
+# their SAVEPOINT / RELEASE statements. Streamed bodies (internal batch,
+# export) are budgeted for one chunk.
+QUERY_BUDGETS = {
+    # Health & Test
+    "health-check": {"GET": QueryBudget(0)},
+    "health-auth": {"GET": QueryBudget(0)},
+    "health-db": {"GET": QueryBudget(0)},
+    "health-cache": {"GET": QueryBudget(0)},
+    "metrics": {"GET": QueryBudget(0)},
+    "test-auth": {"GET": QueryBudget(0)},
+
+    # UserProfile
+    "user-profile": {"GET": QueryBudget(4), "PUT": QueryBudget(4)},
+    "profile-bundle": {"GET": QueryBudget(6)},
+
+    # Address CRUD
+    "address-list-create": {"GET": QueryBudget(5), "POST": QueryBudget(4)},
+    "address-bulk": {"POST": QueryBudget(9), "PUT": QueryBudget(7), "DELETE": QueryBudget(7)},
+    "address-detail": {"GET": QueryBudget(2), "PUT": QueryBudget(3), "DELETE": QueryBudget(4)},
+    "address-default": {"GET": QueryBudget(4)},
+    "address-set-default": {"PUT": QueryBudget(7)},
+
+    # Card CRUD
+    "card-list-create": {"GET": QueryBudget(5), "POST": QueryBudget(7)},
+    "card-bulk": {
+        "POST": QueryBudget(10),
+        "PUT": QueryBudget(7),
+        # post_delete releases the card slots one row at a time
+        "DELETE": QueryBudget(7, per_item=1),
+    },
+    "card-detail": {"GET": QueryBudget(2), "PUT": QueryBudget(3), "DELETE": QueryBudget(4)},
+    "card-default": {"GET": QueryBudget(4)},
+    "card-set-default": {"PUT": QueryBudget(7)},
+
+    # Internal & Admin
+    "internal-profile-batch": {"POST": QueryBudget(3)},
+    "profile-export": {"GET": QueryBudget(5)},
+    # Session and staff user, then the count and the page of each shard
+    "profile-search": {"GET": QueryBudget(4)},
+}
+
+# Frames reported as the origin of a query: this app's code only
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ORIGIN_DEPTH = 3
+
+
+def budget_for(url_name, method):
+    return QUERY_BUDGETS.get(url_name, {}).get(method)
+
+
+class QueryLog:
+    """
+    SQL run while tracking, each statement with the app frames that issued it.
+    """
+
+    __slots__ = ("queries", "items")
+
+    def __init__(self):
+        self.queries = []
+        self.items = 0
+
+
+# Set by track_queries() / QueryBudgetMiddleware; copied into sync_to_async threads
+current_query_log = ContextVar("current_query_log", default=None)
+
+
+def query_origin() -> str:
+    """Innermost app frames of the current stack, e.g. "views.py:393 in load <- ..."."""
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < ORIGIN_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(APP_DIR) and filename != __file__:
+            frames.append(
+                f"{os.path.relpath(filename, APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+
+    return " <- ".join(frames) or "outside apps/profiles"
+
+
+def track_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper: logs the statement and its origin while tracking.
+    """
+    log = current_query_log.get()
+    if log is not None:
+        log.queries.append((sql, query_origin()))
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+def count_items(count):
+    """Reports the number of items of a bulk request, each adds its per_item budget."""
+    log = current_query_log.get()
+    if log is not None:
+        log.items += count
+
+
+@contextmanager
+def track_queries():
+    """
+    Logs every query of the block (this thread's connections and the
+    sync_to_async threads it awaits), yielding the QueryLog.
+    """
+    for connection in connections.all():
+        install(connection)
+
+    log = QueryLog()
+    token = current_query_log.set(log)
+    try:
+        yield log
+    finally:
+        current_query_log.reset(token)
+
+
+def budget_violation(url_name, method, log):
+    """
+    Returns the report of a request that ran more queries than its budget
+    (every statement with its origin), else None. Unbudgeted routes pass.
+    """
+    budget = budget_for(url_name, method)
+    if budget is None:
+        return None
+
+    allowed = budget.queries + budget.per_item * log.items
+    if len(log.queries) <= allowed:
+        return None
+
+    lines = [f"{method} {url_name}: {len(log.queries)} queries, budget {allowed}"]
+    for number, (sql, origin) in enumerate(log.queries, start=1):
+        lines.append(f"  {number}. {sql}")
+        lines.append(f"     at {origin}")
+    return "\n".join(lines)
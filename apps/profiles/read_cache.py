@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .ttl_cache import AsyncSingleFlight, SingleFlight
+
+# Backends whose entries are only seen by the worker process that wrote them
+WORKER_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_worker_local(alias) -> bool:
+    """True when the cache `alias` is not shared by the workers."""
+    return settings.CACHES[alias]["BACKEND"] in WORKER_LOCAL_BACKENDS
+
+
+class ProfileReadCache:
+    """
+    Read-through cache of serialized profile / address / card payloads.
+    Responsible for:
+    - Keying payloads by person_id and a per-person version
+    - Invalidating by bumping the version once the writing transaction commits
+    - Stampede protection: one computation per key per worker, and a short
+      cross-worker lock so only one worker hits the database on a miss
+    - Hit / miss counters for monitoring
+    """
+
+    KEY_PREFIX = "profiles:"
+
+    # How long other workers wait for the lock holder before computing themselves
+    LOCK_WAIT = 1.0
+    LOCK_POLL = 0.05
+
+    def __init__(self, alias="default", ttl=300):
+        self.alias = alias
+        self.ttl = ttl
+
+        # A version bump in one worker's memory would leave every other worker
+        # serving the old payload (and ETag) until the TTL runs out
+        if self.enabled and is_worker_local(alias):
+            raise ImproperlyConfigured(
+                f"PROFILE_CACHE_TTL > 0 needs a cache shared by all workers, "
+                f"the {alias!r} cache is local memory: set CACHE_REDIS_URL or PROFILE_CACHE_TTL=0."
+            )
+
+        self.single_flight = SingleFlight()
+        self.async_single_flight = AsyncSingleFlight()
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lock_waits = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    # -------------------------------
+    # Sync API
+    # -------------------------------
+    def get_or_set(self, person_id, section, compute):
+        """
+        Returns the cached payload of `section` for `person_id`, computing
+        and storing it with `compute()` on a miss.
+        """
+        if not self.enabled:
+            return compute()
+
+        key = self._payload_key(person_id, section, self._version(person_id))
+
+        payload = self.cache.get(key)
+        if payload is not None:
+            self._count("hits")
+            return payload
+
+        self._count("misses")
+        return self.single_flight.do(key, lambda: self._fill(key, compute))
+
+    def invalidate(self, person_id, using=None):
+        """Drops every cached payload of `person_id` after the current transaction (of `using`) commits."""
+        if self.enabled:
+            transaction.on_commit(lambda: self._bump(person_id), using=using)
+
+    # -------------------------------
+    # Async API
+    # -------------------------------
+    async def aget_or_set(self, person_id, section, compute):
+        """Async version of get_or_set, `compute` is a coroutine function."""
+        if not self.enabled:
+            return await compute()
+
+        key = self._payload_key(person_id, section, await self._aversion(person_id))
+
+        payload = await self.cache.aget(key)
+        if payload is not None:
+            self._count("hits")
+            return payload
+
+        self._count("misses")
+        return await self.async_single_flight.do(key, lambda: self._afill(key, compute))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "alias": self.alias,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "lock_waits": self.lock_waits,
+            "invalidations": self.invalidations,
+        }
+
+    # -------------------------------
+    # Internals
+    # -------------------------------
+    def _fill(self, key, compute):
+        lock_key = key + ":lock"
+
+        locked = self.cache.add(lock_key, 1, timeout=self.LOCK_WAIT)
+        if not locked:
+            # Another worker is computing this key, give it a moment
+            self._count("lock_waits")
+            deadline = time.monotonic() + self.LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(self.LOCK_POLL)
+                payload = self.cache.get(key)
+                if payload is not None:
+                    return payload
+
+        try:
+            payload = compute()
+            self.cache.set(key, payload, timeout=self.ttl)
+            return payload
+        finally:
+            # Only the holder releases the lock, a waiter that gave up must not
+            if locked:
+                self.cache.delete(lock_key)
+
+    async def _afill(self, key, compute):
+        lock_key = key + ":lock"
+
+        locked = await self.cache.aadd(lock_key, 1, timeout=self.LOCK_WAIT)
+        if not locked:
+            self._count("lock_waits")
+            deadline = time.monotonic() + self.LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.LOCK_POLL)
+                payload = await self.cache.aget(key)
+                if payload is not None:
+                    return payload
+
+        try:
+            payload = await compute()
+            await self.cache.aset(key, payload, timeout=self.ttl)
+            return payload
+        finally:
+            if locked:
+                await self.cache.adelete(lock_key)
+
+    def _version(self, person_id):
+        key = self._version_key(person_id)
+        version = self.cache.get(key)
+        if version is None:
+            # Never restart at a value an evicted version could have had
+            version = time.time_ns()
+            if not self.cache.add(key, version, timeout=None):
+                version = self.cache.get(key, version)
+        return version
+
+    async def _aversion(self, person_id):
+        key = self._version_key(person_id)
+        version = await self.cache.aget(key)
+        if version is None:
+            version = time.time_ns()
+            if not await self.cache.aadd(key, version, timeout=None):
+                version = await self.cache.aget(key, version)
+        return version
+
+    def _bump(self, person_id):
+        key = self._version_key(person_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.set(key, time.time_ns(), timeout=None)
+        self._count("invalidations")
+
+    def _version_key(self, person_id):
+        return f"{self.KEY_PREFIX}{person_id}:v"
+
+    def _payload_key(self, person_id, section, version):
+        return f"{self.KEY_PREFIX}{person_id}:{version}:{section}"
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+profile_cache = ProfileReadCache(
+    alias=settings.PROFILE_CACHE_ALIAS,
+    ttl=settings.PROFILE_CACHE_TTL,
+)
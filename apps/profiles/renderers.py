@@ -0,0 +1,91 @@
+import math
+from decimal import Decimal
+
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from .timing import timed
+
+# Same output as DRF's JSONRenderer: "Z" for UTC datetimes, int dict keys as strings
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+# Types orjson does not know (Decimal, lazy strings, querysets, ...) are
+# converted the way DRF's encoder does
+encoder_default = JSONEncoder().default
+
+JSON_CONTENT_TYPE = "application/json"
+
+SUCCESS_PREFIX = b'{"success":true,"data":'
+
+# id() of constant response dicts -> (dict, body), filled by pre_encoded()
+PRE_ENCODED = {}
+
+
+def has_non_finite(data) -> bool:
+    """True when `data` holds a NaN or infinite number, which orjson writes as null."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, Decimal):
+        return not data.is_finite()
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(item) for item in data)
+    return False
+
+
+def encode(data) -> bytes:
+    body = orjson.dumps(data, default=encoder_default, option=ORJSON_OPTIONS)
+
+    # NaN / Infinity came out as null: DRF's renderer decides instead
+    # (ValueError under STRICT_JSON, the default)
+    if b"null" in body and has_non_finite(data):
+        return JSONRenderer().render(data)
+
+    # Keep the output a strict JavaScript subset, like DRF
+    if b"\xe2\x80\xa8" in body or b"\xe2\x80\xa9" in body:
+        body = body.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+    return body
+
+
+def encode_success(data) -> bytes:
+    return SUCCESS_PREFIX + encode(data) + b"}"
+
+
+def pre_encoded(data: dict) -> dict:
+    """
+    Registers a constant response dict (never mutated): ORJSONRenderer
+    writes the body encoded here instead of encoding the dict again.
+    """
+    PRE_ENCODED[id(data)] = (data, encode(data))
+    return data
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Drop-in JSONRenderer backed by orjson.
+    Responsible for:
+    - Rendering compact JSON byte-identical to DRF's JSONRenderer
+    - Reusing the body of pre_encoded() constant responses as is
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timed("render"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if data is None:
+            return b""
+
+        # Indented output (browsable API, "; indent=4") stays on the stdlib path
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # The same object, not an equal dict that may differ later
+        constant = PRE_ENCODED.get(id(data))
+        if constant is not None and constant[0] is data:
+            return constant[1]
+
+        return encode(data)
@@ -0,0 +1,301 @@
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .read_cache import is_worker_local
+from .sharding import shards
+
+READ_METHODS = ("GET", "HEAD")
+
+# App whose tables are spread over the shards
+SHARDED_APP = "profiles"
+
+
+# ------------------------------------------------------------------
+# Replica Health
+# ------------------------------------------------------------------
+class ReplicaSet:
+    """
+    Read replicas of the primary database.
+    Responsible for:
+    - Measuring each replica's replication lag in a background thread
+    - Handing out the healthy replicas in turn (none while all lag or fail)
+    """
+
+    # 0 when every received WAL record is replayed (an idle primary writes none)
+    LAG_SQL = (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
+    def __init__(self, aliases, max_lag=5, check_interval=5):
+        self.aliases = tuple(aliases)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+
+        # alias -> seconds behind the primary, None when unreachable / unknown
+        self.lag = dict.fromkeys(self.aliases)
+        self.healthy = ()
+        self.last_check = None
+
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def choose(self):
+        """A healthy replica alias, or None when reads must stay on the primary."""
+        self._ensure_checker()
+
+        healthy = self.healthy
+        if not healthy:
+            return None
+        return healthy[next(self._turn) % len(healthy)]
+
+    def check(self):
+        healthy = []
+        for alias in self.aliases:
+            lag = self.measure(alias)
+            self.lag[alias] = lag
+            if lag is not None and lag <= self.max_lag:
+                healthy.append(alias)
+
+        self.healthy = tuple(healthy)
+        self.last_check = time.time()
+
+    def measure(self, alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(self.LAG_SQL)
+                lag = cursor.fetchone()[0]
+        except DatabaseError:
+            return None
+        finally:
+            # Back to the pool, the checker holds no connection between checks
+            connection.close()
+
+        return None if lag is None else float(lag)
+
+    def stats(self) -> dict:
+        return {
+            "max_lag": self.max_lag,
+            "last_check": self.last_check,
+            "replicas": {
+                alias: {"lag": self.lag[alias], "healthy": alias in self.healthy}
+                for alias in self.aliases
+            },
+        }
+
+    def _ensure_checker(self):
+        # Started lazily so every gunicorn worker gets its own thread after fork
+        if self._checker is not None and self._checker.is_alive():
+            return
+
+        with self._lock:
+            if self._checker is not None and self._checker.is_alive():
+                return
+            self._checker = threading.Thread(
+                target=self._check_forever, name="replica-lag-checker", daemon=True
+            )
+            self._checker.start()
+
+    def _check_forever(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+
+# ------------------------------------------------------------------
+# Read-Your-Writes Stickiness
+# ------------------------------------------------------------------
+class WriteStickiness:
+    """
+    person_ids that wrote within the last `seconds`, shared by every worker
+    through the cache: their reads stay on the primary.
+    """
+
+    KEY_PREFIX = "profiles:sticky:"
+
+    def __init__(self, alias="default", seconds=10, required=False):
+        self.alias = alias
+        self.seconds = seconds
+        # Required means replicas are configured, without them reads never leave the primary
+        self.enabled = required
+
+        # Markers in one worker's memory would send the person's next read, on
+        # another worker, to a lagging replica: read-your-writes needs a shared cache
+        if required and is_worker_local(alias):
+            raise ImproperlyConfigured(
+                f"DB_REPLICA_HOSTS needs a cache shared by all workers for the write stickiness, "
+                f"the {alias!r} cache (PROFILE_CACHE_ALIAS) is local memory: set CACHE_REDIS_URL."
+            )
+
+    def mark(self, person_id):
+        if not self.enabled:
+            return
+        caches[self.alias].set(f"{self.KEY_PREFIX}{person_id}", 1, timeout=self.seconds)
+
+    def is_sticky(self, person_id) -> bool:
+        return caches[self.alias].get(f"{self.KEY_PREFIX}{person_id}") is not None
+
+
+# ------------------------------------------------------------------
+# Per-Request Routing
+# ------------------------------------------------------------------
+class RequestRouting:
+    """
+    Where the queries of the current request go: the shard of the caller's
+    person_id for the profile tables, one replica for all of its reads (a
+    consistent snapshot), the primary once anything is written.
+    """
+
+    __slots__ = ("replica_reads", "person_id", "replica", "wrote", "shard")
+
+    def __init__(self, replica_reads):
+        self.replica_reads = replica_reads
+        self.person_id = None
+        self.replica = None
+        self.wrote = False
+        self.shard = None
+
+    def shard_alias(self):
+        """Shard of the bound person_id, None before authentication."""
+        if self.shard is None and self.person_id is not None:
+            # Located on the first query, from a sync (ORM) context
+            self.shard = shards.locate(self.person_id)
+        return self.shard
+
+    def read_alias(self):
+        if not self.replica_reads:
+            return DEFAULT_DB_ALIAS
+
+        if self.replica is None:
+            # Decided on the first read, the caller is authenticated by then
+            if self.person_id is not None and stickiness.is_sticky(self.person_id):
+                self.replica_reads = False
+                return DEFAULT_DB_ALIAS
+
+            self.replica = replicas.choose()
+            if self.replica is None:
+                self.replica_reads = False
+                return DEFAULT_DB_ALIAS
+
+        return self.replica
+
+    def write(self):
+        self.replica_reads = False
+        if not self.wrote and self.person_id is not None:
+            stickiness.mark(self.person_id)
+        self.wrote = True
+
+
+# Set by ReplicaRoutingMiddleware; copied into sync_to_async threads with the context
+current_routing = ContextVar("current_routing", default=None)
+
+
+def bind_person(person_id):
+    """Tells the routing whose request this is (shard and stickiness are per person_id)."""
+    routing = current_routing.get()
+    if routing is not None and routing.person_id != person_id:
+        routing.person_id = person_id
+        routing.shard = None
+
+
+class ShardRouter:
+    """
+    Database router of the sharded deployment (DB_SHARD_HOSTS).
+    Responsible for:
+    - Sending the profile / address / card queries of a request to the shard
+      of the caller's person_id (rows already loaded stay on their shard)
+    - Leaving everything on the default shard to the ReplicaRouter / default
+    - Creating only the profile tables on the extra shards
+    """
+
+    def db_for_read(self, model, **hints):
+        return self.shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.write()
+        return self.shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows of the extra shards only relate to rows of the same shard
+        if {obj1._state.db, obj2._state.db} & set(shards.aliases[1:]):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in shards.aliases:
+            return None
+        return app_label == SHARDED_APP
+
+    def shard_for(self, model, hints):
+        if model._meta.app_label != SHARDED_APP:
+            return None
+
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in shards.aliases:
+            shard = instance._state.db
+        else:
+            routing = current_routing.get()
+            shard = routing.shard_alias() if routing is not None else None
+
+        # The default shard may read from its replicas
+        return None if shard == DEFAULT_DB_ALIAS else shard
+
+
+class ReplicaRouter:
+    """
+    Database router of the replica deployment (DB_REPLICA_HOSTS).
+    Responsible for:
+    - Sending the reads of GET / HEAD requests to a healthy replica
+    - Keeping writes, transactions, the rest of a request that wrote and the
+      reads of a person that wrote in the last DB_REPLICA_STICKY_SECONDS on
+      the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None:
+            return DEFAULT_DB_ALIAS
+
+        # Reads inside a transaction see its writes and locks
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return routing.read_alias()
+
+    def db_for_write(self, model, **hints):
+        routing = current_routing.get()
+        if routing is not None:
+            routing.write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+replicas = ReplicaSet(
+    settings.DB_REPLICA_ALIASES,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
+
+# Never shorter than the lag a replica may have while still serving reads
+stickiness = WriteStickiness(
+    alias=settings.PROFILE_CACHE_ALIAS,
+    seconds=max(settings.DB_REPLICA_STICKY_SECONDS, settings.DB_REPLICA_MAX_LAG),
+    required=bool(replicas.aliases),
+)
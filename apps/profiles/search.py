@@ -0,0 +1,160 @@
+import base64
+import binascii
+import json
+import re
+from functools import reduce
+from itertools import islice
+from operator import and_, or_
+
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Upper
+from rest_framework.exceptions import ValidationError
+
+from .models import UserProfile
+from .sharding import on_shard, shards
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# Shorter terms have no trigram, the GIN indexes could not narrow them down
+MIN_QUERY_LENGTH = 3
+
+# Exact counts are taken up to here where no planner estimate is available
+COUNT_CAP = 1000
+
+PHONE_DIGITS = 10
+PHONE_QUERY = re.compile(r"^[\d\s()+-]+$")
+# Longest first, so a short code never cuts into a longer one
+COUNTRY_CODES = sorted((code for code, _ in UserProfile.COUNTRY_CODE_CHOICES), key=len, reverse=True)
+
+
+# ------------------------------------------------------------------
+# Matching
+# ------------------------------------------------------------------
+def search_filter(query, fuzzy=False):
+    """
+    Filter of the profiles matching `query`, each branch served by an index
+    of migration 0005 (PostgreSQL):
+    - digits: primary / alternate phone prefix (pattern_ops btree)
+    - an "@": email prefix
+    - words: every word a first or last name prefix, or the email prefix
+    `fuzzy` adds trigram word similarity on email and names (misspellings);
+    prefix and similarity share the GIN trigram indexes on UPPER(column).
+    """
+    digits = phone_digits(query)
+    if PHONE_QUERY.match(query) and len(digits) >= MIN_QUERY_LENGTH:
+        return Q(primary_phone__startswith=digits) | Q(alternate_phone__startswith=digits)
+
+    prefix = Q(email__istartswith=query)
+    if "@" not in query:
+        prefix |= reduce(and_, [
+            Q(first_name__istartswith=word) | Q(last_name__istartswith=word)
+            for word in query.split()
+        ])
+
+    if not fuzzy:
+        return prefix
+
+    fields = ("email",) if "@" in query else ("email", "first_name", "last_name")
+    return prefix | reduce(or_, [
+        Q(TrigramWordSimilar(Upper(field), query.upper())) for field in fields
+    ])
+
+
+def phone_digits(query) -> str:
+    """"+91 98765 43210" -> "9876543210", the digits stored without country code."""
+    compact = re.sub(r"[\s()-]", "", query)
+    for code in COUNTRY_CODES:
+        if compact.startswith(code):
+            compact = compact[len(code):]
+            break
+
+    return re.sub(r"\D", "", compact)[-PHONE_DIGITS:]
+
+
+def shard_queryset(alias, query):
+    """Matching profiles of one shard, keyset-ordered by person_id."""
+    fuzzy = connections[alias].vendor == "postgresql"
+    return on_shard(UserProfile.objects.filter(search_filter(query, fuzzy)), alias).order_by("person_id")
+
+
+def estimated_count(queryset) -> int:
+    """
+    Planner row estimate of `queryset` (one EXPLAIN, no scan) on PostgreSQL,
+    else an exact count capped at COUNT_CAP.
+    """
+    if connections[queryset.db].vendor == "postgresql":
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    return queryset.order_by()[:COUNT_CAP].count()
+
+
+# ------------------------------------------------------------------
+# Keyset Pagination
+# ------------------------------------------------------------------
+def encode_cursor(person_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": person_id}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """person_id the next page starts after."""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValidationError("Invalid cursor.")
+
+    if isinstance(after, bool) or not isinstance(after, int):
+        raise ValidationError("Invalid cursor.")
+    return after
+
+
+def parse_search_request(params):
+    """
+    Validates ?q=&limit=&cursor=.
+
+    Returns:
+        tuple: (query, page size, person_id to start after or None)
+    """
+    query = " ".join(params.get("q", "").split())
+    if len(query) < MIN_QUERY_LENGTH:
+        raise ValidationError(f"q must have at least {MIN_QUERY_LENGTH} characters.")
+
+    try:
+        limit = int(params.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValidationError("limit must be an integer.")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}.")
+
+    cursor = params.get("cursor")
+    return query, limit, (decode_cursor(cursor) if cursor else None)
+
+
+def search_profiles(query, limit=DEFAULT_PAGE_SIZE, after=None):
+    """
+    One page of matching profiles ordered by person_id, after the `after`
+    person_id (WHERE person_id > after, never OFFSET), from every shard.
+
+    Returns:
+        tuple: (profiles, next cursor or None, estimated total matches)
+    """
+    def page(alias):
+        queryset = shard_queryset(alias, query)
+        count = estimated_count(queryset)
+        if after is not None:
+            queryset = queryset.filter(person_id__gt=after)
+        return list(queryset[:limit + 1]), count
+
+    pages = dict(shards.scatter_gather(page))
+
+    # Every shard's page is ordered by person_id: merged, the first limit + 1 win
+    profiles = list(islice(
+        shards.merge_sorted(lambda alias: pages[alias][0], key=lambda profile: profile.person_id),
+        limit + 1,
+    ))
+    total = sum(count for _, count in pages.values())
+
+    next_cursor = encode_cursor(profiles[limit - 1].person_id) if len(profiles) > limit else None
+    return profiles[:limit], next_cursor, total
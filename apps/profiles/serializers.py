@@ -1,8 +1,32 @@
 from rest_framework import serializers
 from .models import UserProfile, Address, Card
+from .timing import timed
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer counting .data in the request's "serialize" phase
+    """
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer counting .data in the request's "serialize" phase
+    (many=True lists need Meta.list_serializer_class = TimedListSerializer)
+    """
+
+    @property
+    def data(self):
+        with timed("serialize"):
+            return super().data
+
+
+class UserProfileSerializer(TimedModelSerializer):
     """
     Serializer for user profile data
     """
@@ -16,9 +40,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "first_name", "last_name", "date_of_birth", "gender"
         ]
         read_only_fields = ["person_id", "email"]
+        list_serializer_class = TimedListSerializer
 
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(TimedModelSerializer):
     """
     Serializer for address management
     """
@@ -27,9 +52,10 @@ class AddressSerializer(serializers.ModelSerializer):
         model = Address
         fields = "__all__"
         read_only_fields = ["user", "created_at", "updated_at"]
+        list_serializer_class = TimedListSerializer
 
 
-class CardSerializer(serializers.ModelSerializer):
+class CardSerializer(TimedModelSerializer):
     """
     Serializer for card information
     """
@@ -38,17 +64,18 @@ class CardSerializer(serializers.ModelSerializer):
         model = Card
         fields = "__all__"
         read_only_fields = ["user", "created_at", "updated_at"]
+        list_serializer_class = TimedListSerializer
 
-    def validate_card_brand(self, value):
+    def validate(self, attrs):
         """
         Validate card brand based on card type
+        (works for partial updates and for items of a many=True list)
         """
-        card_type = self.initial_data.get("card_type")
-
-        if card_type == "credit" and value not in dict(Card.CREDIT_CARD_BRANDS):
-            raise serializers.ValidationError("Invalid credit card brand.")
+        card_type = attrs.get("card_type", getattr(self.instance, "card_type", None))
+        card_brand = attrs.get("card_brand", getattr(self.instance, "card_brand", None))
 
-        if card_type == "debit" and value not in dict(Card.DEBIT_CARD_BRANDS):
-            raise serializers.ValidationError("Invalid debit card brand.")
+        error = Card.brand_error(card_type, card_brand)
+        if error:
+            raise serializers.ValidationError({"card_brand": error})
 
-        return value
+        return attrs
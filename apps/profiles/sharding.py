@@ -0,0 +1,254 @@
+import bisect
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import UserProfile, Address, Card
+
+# Tables whose ids are kept unique across shards (see reserve_id_range)
+SHARDED_MODELS = (UserProfile, Address, Card)
+
+
+def ring_hash(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring of database aliases: adding / removing a shard only
+    moves the person_ids of the ring segments it takes over / gives back.
+    """
+
+    def __init__(self, nodes, vnodes=128):
+        self.nodes = tuple(nodes)
+
+        points = sorted(
+            (ring_hash(f"{node}#{index}"), node) for node in self.nodes for index in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key):
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+
+        index = bisect.bisect(self._hashes, ring_hash(key)) % len(self._hashes)
+        return self._nodes[index]
+
+
+class ShardMap:
+    """
+    person_id -> database alias of the profile and its addresses / cards.
+    Responsible for:
+    - Placing person_ids on the ring of the active shards
+    - Finding users mid-move while a reshard is in progress (previous ring)
+    - Scatter-gather over the shards for the paths not scoped by person_id
+    """
+
+    def __init__(self, aliases, active=None, previous=None, vnodes=128):
+        # Every configured shard, in order; the position fixes its id range
+        self.aliases = tuple(aliases)
+        self.ring = HashRing(self.aliases[:active or len(self.aliases)], vnodes)
+        # Ring before the change, set until `manage.py reshard` has moved everyone
+        self.previous = HashRing(self.aliases[:previous], vnodes) if previous else None
+
+    @property
+    def sharded(self) -> bool:
+        return len(self.aliases) > 1
+
+    @property
+    def active(self):
+        """Shards that may hold profiles: the ring's, plus the previous ring's mid-reshard."""
+        nodes = set(self.ring.nodes) | set(self.previous.nodes if self.previous else ())
+        return tuple(alias for alias in self.aliases if alias in nodes)
+
+    def shard_for(self, person_id):
+        """Shard the person_id belongs on."""
+        return self.ring.node(person_id)
+
+    def candidates(self, person_id):
+        """Shards that may hold the person_id: (target,) or (source, target) mid-reshard."""
+        target = self.ring.node(person_id)
+        if self.previous is None:
+            return (target,)
+
+        source = self.previous.node(person_id)
+        return (target,) if source == target else (source, target)
+
+    def locate(self, person_id):
+        """
+        Shard of an existing person_id, else the one to provision it on.
+        Only users whose shard changes in a reshard in progress cost queries.
+        """
+        candidates = self.candidates(person_id)
+        if len(candidates) == 1:
+            return candidates[0]
+
+        source, target = candidates
+        for alias in (target, source):
+            if UserProfile.objects.using(alias).filter(person_id=person_id).exists():
+                return alias
+        return target
+
+    def group(self, person_ids):
+        """{alias: person_ids} covering every shard each id may be on, in shard order."""
+        groups = {}
+        for person_id in person_ids:
+            for alias in self.candidates(person_id):
+                groups.setdefault(alias, []).append(person_id)
+
+        return {alias: groups[alias] for alias in self.aliases if alias in groups}
+
+    def scatter_gather(self, query, aliases=None):
+        """
+        Runs `query(alias)` on every shard, concurrently when there are
+        several, and returns [(alias, result)] in shard order.
+        """
+        aliases = tuple(self.active if aliases is None else aliases)
+        if len(aliases) == 1:
+            return [(aliases[0], query(aliases[0]))]
+
+        with ThreadPoolExecutor(max_workers=len(aliases)) as executor:
+            # Each thread keeps the request context (query budgets, timing)
+            futures = [
+                executor.submit(copy_context().run, self._run_on_shard, query, alias)
+                for alias in aliases
+            ]
+            return [(alias, future.result()) for alias, future in zip(aliases, futures)]
+
+    def merge_sorted(self, query, key):
+        """
+        Merges `query(alias)` iterables sorted by `key` into one sorted stream,
+        dropping a key seen on two shards (a user mid-move): the ring's shard wins.
+        """
+        streams = [self._tagged(query(alias), alias, key) for alias in self.active]
+
+        last = object()
+        for value, _, item in heapq.merge(*streams, key=lambda entry: entry[:2]):
+            if value != last:
+                last = value
+                yield item
+
+    def stats(self) -> dict:
+        return {
+            "shards": list(self.ring.nodes),
+            "resharding_from": list(self.previous.nodes) if self.previous else None,
+        }
+
+    def _tagged(self, items, alias, key):
+        # (key, not on its ring shard, item): the ring's copy sorts first
+        for item in items:
+            value = key(item)
+            yield value, alias != self.shard_for(value), item
+
+    @staticmethod
+    def _run_on_shard(query, alias):
+        try:
+            return query(alias)
+        finally:
+            # Worker threads hand their connection back
+            connections[alias].close()
+
+
+def on_shard(queryset, alias):
+    """`queryset` read from shard `alias`; the default shard keeps its replica routing."""
+    return queryset if alias == DEFAULT_DB_ALIAS else queryset.using(alias)
+
+
+# ------------------------------------------------------------------
+# Resharding
+# ------------------------------------------------------------------
+def misplaced(alias, after=None, limit=1000):
+    """
+    Scans the next `limit` person_ids (after `after`) of shard `alias`.
+
+    Returns:
+        tuple: (last person_id scanned or None at the end, [(person_id, ring shard)]
+        of the scanned profiles that belong on another shard)
+    """
+    person_ids = UserProfile.objects.using(alias).order_by("person_id").values_list("person_id", flat=True)
+    if after is not None:
+        person_ids = person_ids.filter(person_id__gt=after)
+
+    batch = list(person_ids[:limit])
+    targets = ((person_id, shards.shard_for(person_id)) for person_id in batch)
+
+    return (batch[-1] if batch else None), [
+        (person_id, target) for person_id, target in targets if target != alias
+    ]
+
+
+def move_profile(person_id, source, target) -> bool:
+    """
+    Moves a user (profile, addresses, cards, same ids) from shard `source`
+    to `target`. The profile row stays locked on the source meanwhile, so
+    the user's writes wait for the move. False when the source does not
+    hold the profile (anymore).
+    """
+    with transaction.atomic(using=source):
+        profile = (
+            UserProfile.objects.using(source).select_for_update()
+            .filter(person_id=person_id).first()
+        )
+        if profile is None:
+            return False
+
+        # Already copied by an interrupted run: only the source copy is left to drop
+        if not UserProfile.objects.using(target).filter(person_id=person_id).exists():
+            addresses = list(Address.objects.using(source).filter(user_id=profile.pk))
+            cards = list(Card.objects.using(source).filter(user_id=profile.pk))
+
+            with transaction.atomic(using=target):
+                UserProfile.objects.using(target).bulk_create([profile])
+                Address.objects.using(target).bulk_create(addresses)
+                Card.objects.using(target).bulk_create(cards)
+
+        # Committed on the target, which ShardMap.locate prefers from now on
+        profile.delete(using=source)
+
+    return True
+
+
+# ------------------------------------------------------------------
+# Globally Unique Ids
+# ------------------------------------------------------------------
+def reserve_id_range(alias):
+    """
+    Starts the id sequences of shard number k at k * DB_SHARD_ID_SPAN, so
+    rows keep their ids when `manage.py reshard` moves them to another shard
+    (and clients their address / card ids). Run after every migrate.
+    """
+    floor = shards.aliases.index(alias) * settings.DB_SHARD_ID_SPAN
+    if not floor:
+        # The first shard (the original database) keeps its ids
+        return
+
+    connection = connections[alias]
+    quote = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        for model in SHARDED_MODELS:
+            table = model._meta.db_table
+
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    f"GREATEST(%s, (SELECT COALESCE(MAX(id), 0) FROM {quote(table)})))",
+                    [table, floor],
+                )
+            elif connection.vendor == "sqlite":
+                cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s", [floor, table])
+                if not cursor.rowcount:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, floor])
+
+
+shards = ShardMap(
+    settings.PROFILE_SHARDS,
+    active=settings.DB_SHARD_ACTIVE,
+    previous=settings.DB_SHARD_PREVIOUS_ACTIVE,
+    vnodes=settings.DB_SHARD_VNODES,
+)
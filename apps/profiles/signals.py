@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .models import UserProfile, Address, Card
+from .identity import profile_ids
+from .read_cache import profile_cache
+from .query_budget import install as install_query_tracking
+from .sharding import reserve_id_range, shards
+from .timing import record_query
+
+
+def person_id_for(instance):
+    """person_id of the profile owning an Address / Card, without a lazy FK load when possible."""
+    if type(instance).user.is_cached(instance):
+        return instance.user.person_id
+
+    # Profiles of this worker's callers are known: no query per saved / deleted row
+    person_id = profile_ids.person_id(instance.user_id)
+    if person_id is not None:
+        return person_id
+
+    return (
+        UserProfile.objects.filter(pk=instance.user_id)
+        .values_list("person_id", flat=True)
+        .first()
+    )
+
+
+# ------------------------------------------------------------------
+# Read Cache Invalidation
+# ------------------------------------------------------------------
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_profile_cache(sender, instance, using, **kwargs):
+    profile_cache.invalidate(instance.person_id, using=using)
+
+
+@receiver(post_delete, sender=UserProfile)
+def forget_profile_id(sender, instance, **kwargs):
+    profile_ids.forget(instance.person_id)
+
+
+@receiver([post_save, post_delete], sender=Address)
+@receiver([post_save, post_delete], sender=Card)
+def invalidate_owner_cache(sender, instance, using, **kwargs):
+    person_id = person_id_for(instance)
+    if person_id is not None:
+        profile_cache.invalidate(person_id, using=using)
+
+
+# ------------------------------------------------------------------
+# Denormalized Card Counter
+# ------------------------------------------------------------------
+@receiver(post_delete, sender=Card)
+def release_card_slot(sender, instance, using, **kwargs):
+    # Fires for queryset / bulk / cascade deletes too, unlike Model.delete
+    UserProfile.objects.db_manager(using).release_card_slots(instance.user_id)
+
+
+# ------------------------------------------------------------------
+# Request Timing (query count and time per request)
+# ------------------------------------------------------------------
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    # Fired on every (re)connect, pooled or not: install the wrapper once
+    if settings.REQUEST_TIMING_ENABLED and record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# ------------------------------------------------------------------
+# Query Budgets (sampled production checks)
+# ------------------------------------------------------------------
+@receiver(connection_created)
+def track_budgeted_queries(sender, connection, **kwargs):
+    if settings.QUERY_BUDGET_SAMPLE_RATE > 0:
+        install_query_tracking(connection)
+
+
+# ------------------------------------------------------------------
+# Shards (ids unique across shards)
+# ------------------------------------------------------------------
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    if sender.name == "apps.profiles" and using in shards.aliases:
+        reserve_id_range(using)
@@ -1,3 +1,1740 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import hashlib
+import io
+import os
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from decimal import Decimal
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import jwt
+import orjson
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from . import async_views, urls, views
+from .auth_client import AuthClient, AuthServiceUnavailable, InvalidTokenError
+from .bulk import AddressBulkOperation, CardBulkOperation
+from .circuit_breaker import CircuitBreaker
+from .exceptions import BulkValidationError
+from .export import csv_chunks, export_records, ndjson_chunks
+from .fast_serializers import ValuesSerializer, address_values, card_values, field_converter
+from .identity import profile_ids
+from .importer import MASKED_CARD_MESSAGE, load_batch, read_records
+from .metrics import RequestMetrics
+from .models import MAX_CARDS_PER_USER, Address, Card, CardLimitExceeded, EmailInUse, UserProfile
+from .query_budget import QUERY_BUDGETS, budget_violation, track_queries
+from .read_cache import ProfileReadCache
+from .renderers import ORJSONRenderer, encode, pre_encoded
+from .routers import RequestRouting, WriteStickiness, current_routing
+from .search import DEFAULT_PAGE_SIZE, decode_cursor, parse_search_request, search_profiles
+from .serializers import AddressSerializer, CardSerializer, UserProfileSerializer
+from .sharding import HashRing, ShardMap, move_profile, reserve_id_range, shards
+from .timing import RequestTimings
+from .token_cache import INVALID, TokenCache
+from .token_verifier import (
+    LocalTokenVerifier,
+    SigningKeySet,
+    TokenVerificationError,
+    VerificationUnavailable,
+)
+
+PERSON_ID = 424242
+NEW_PERSON_ID = 424243
+SERVICE_TOKEN = "query-budget-tests"
+BUDGETED_METHODS = ("get", "post", "put", "delete")
+# Routes for staff sessions, and the query strings some scenarios need
+STAFF_ROUTES = ("profile-export", "profile-search")
+QUERY_STRINGS = {"profile-search": "q=budget"}
+
+
+def caller(person_id):
+    return {"person_id": person_id, "email": f"{person_id}@budget.test", "username": str(person_id)}
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Every endpoint and method stays within its QUERY_BUDGETS entry, from cold
+    caches; a failure lists each statement with the code that issued it.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        cls.home = Address.objects.create(user=cls.profile, address_type="home", line1="1 Main St", is_default=True)
+        cls.work = Address.objects.create(user=cls.profile, address_type="work", line1="2 Main St")
+        cls.visa = Card.objects.create(user=cls.profile, is_default=True, **cls.card_body("4111111111111111"))
+        cls.amex = Card.objects.create(user=cls.profile, **cls.card_body("371449635398431", "amex"))
+        cls.staff = get_user_model().objects.create_user("budget-staff", password="x", is_staff=True)
+
+    @staticmethod
+    def card_body(number, brand="visa"):
+        return {
+            "card_type": "credit",
+            "card_brand": brand,
+            "card_number": number,
+            "card_holder_name": "Budget Test",
+            "expiry_month": 12,
+            "expiry_year": 2035,
+        }
+
+    def setUp(self):
+        auth = mock.patch.object(views.auth_client, "get_user", side_effect=self.authenticate)
+        auth.start()
+        self.addCleanup(auth.stop)
+        self.person_id = PERSON_ID
+
+    def cold_start(self):
+        # Worst case: nothing resolved or cached by earlier requests of the worker
+        caches[views.profile_cache.alias].clear()
+        profile_ids.cache.clear()
+        profile_ids.person_ids.clear()
+
+    def authenticate(self, token):
+        return caller(self.person_id)
+
+    def scenarios(self):
+        """(url name, method, url kwargs, JSON body), deletes last."""
+        home, work, visa, amex = self.home.pk, self.work.pk, self.visa.pk, self.amex.pk
+        batch = {"person_ids": [PERSON_ID, NEW_PERSON_ID], "include": ["default_address", "default_card"]}
+
+        return [
+            ("health-check", "get", {}, None),
+            ("health-auth", "get", {}, None),
+            ("health-db", "get", {}, None),
+            ("health-cache", "get", {}, None),
+            ("metrics", "get", {}, None),
+            ("test-auth", "get", {}, None),
+            ("user-profile", "get", {}, None),
+            ("user-profile", "put", {}, {"first_name": "Budget"}),
+            ("profile-bundle", "get", {}, None),
+            ("address-list-create", "get", {}, None),
+            ("address-list-create", "post", {}, {"address_type": "friend", "line1": "3 Main St"}),
+            ("address-detail", "get", {"pk": home}, None),
+            ("address-detail", "put", {"pk": home}, {"line2": "Flat 1"}),
+            ("address-default", "get", {}, None),
+            ("address-set-default", "put", {"pk": work}, None),
+            ("address-bulk", "post", {}, {"items": [
+                {"address_type": "friend", "line1": "3 Main St"},
+                {"address_type": "other", "line1": "4 Main St"},
+            ]}),
+            ("address-bulk", "put", {}, {"items": [{"id": home, "line2": "A"}, {"id": work, "is_default": True}]}),
+            ("card-list-create", "get", {}, None),
+            ("card-list-create", "post", {}, self.card_body("5555555555554444", "mastercard")),
+            ("card-detail", "get", {"pk": visa}, None),
+            ("card-detail", "put", {"pk": visa}, {"card_holder_name": "Budget Renamed"}),
+            ("card-default", "get", {}, None),
+            ("card-set-default", "put", {"pk": amex}, None),
+            ("card-bulk", "post", {}, {"items": [
+                self.card_body("5555555555554444", "mastercard"),
+                self.card_body("6011111111111117", "discover"),
+            ]}),
+            ("card-bulk", "put", {}, {"items": [
+                {"id": visa, "card_holder_name": "A"},
+                {"id": amex, "is_default": True},
+            ]}),
+            ("internal-profile-batch", "post", {}, batch),
+            ("profile-export", "get", {}, None),
+            ("profile-search", "get", {}, None),
+            ("address-detail", "delete", {"pk": home}, None),
+            ("address-bulk", "delete", {}, {"ids": [home, work]}),
+            ("card-detail", "delete", {"pk": visa}, None),
+            ("card-bulk", "delete", {}, {"ids": [visa, amex]}),
+        ]
+
+    def call(self, url_name, method, kwargs, body):
+        headers = {"HTTP_AUTHORIZATION": "Bearer budget-token", "HTTP_X_SERVICE_TOKEN": SERVICE_TOKEN}
+        if url_name in STAFF_ROUTES:
+            self.client.force_login(self.staff)
+
+        path = reverse(url_name, kwargs=kwargs)
+        if url_name in QUERY_STRINGS:
+            path = f"{path}?{QUERY_STRINGS[url_name]}"
+
+        with track_queries() as log:
+            response = self.client.generic(
+                method.upper(),
+                path,
+                orjson.dumps(body) if body is not None else "",
+                content_type="application/json",
+                **headers,
+            )
+            # Streamed bodies run their queries while being consumed
+            content = b"".join(response.streaming_content) if response.streaming else response.content
+
+        return response, content, log
+
+    def assertWithinBudget(self, url_name, method, log):
+        violation = budget_violation(url_name, method.upper(), log)
+        if violation:
+            self.fail(violation)
+
+    @override_settings(INTERNAL_SERVICE_TOKENS=[SERVICE_TOKEN])
+    def test_endpoints_stay_within_budget(self):
+        for url_name, method, kwargs, body in self.scenarios():
+            with self.subTest(url_name=url_name, method=method), transaction.atomic():
+                self.cold_start()
+                response, content, log = self.call(url_name, method, kwargs, body)
+
+                self.assertLess(response.status_code, 400, content)
+                self.assertWithinBudget(url_name, method, log)
+                transaction.set_rollback(True)
+
+    def test_new_caller_stays_within_budget(self):
+        # First request of a caller provisions the profile
+        self.person_id = NEW_PERSON_ID
+        for url_name in ("user-profile", "profile-bundle", "address-list-create", "card-list-create"):
+            with self.subTest(url_name=url_name), transaction.atomic():
+                self.cold_start()
+                response, content, log = self.call(url_name, "get", {}, None)
+
+                self.assertEqual(response.status_code, 200, content)
+                self.assertWithinBudget(url_name, "get", log)
+                transaction.set_rollback(True)
+
+    def test_every_route_has_a_budget(self):
+        for pattern in urls.urlpatterns:
+            view_class = pattern.callback.view_class
+            methods = {method.upper() for method in BUDGETED_METHODS if hasattr(view_class, method)}
+
+            with self.subTest(url_name=pattern.name):
+                self.assertEqual(set(QUERY_BUDGETS.get(pattern.name, {})), methods)
+
+    def test_address_str_does_not_load_profile(self):
+        address = Address.objects.get(pk=self.home.pk)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(str(address), f"profile {self.profile.pk} - home")
+
+
+class HashRingTests(SimpleTestCase):
+    """
+    Adding a shard only moves person_ids to the new shard, about 1/N of them.
+    """
+
+    PERSON_IDS = range(1, 20001)
+
+    def test_adding_a_shard_moves_only_its_share(self):
+        before = HashRing(["default", "shard1"])
+        after = HashRing(["default", "shard1", "shard2"])
+
+        moved = [pid for pid in self.PERSON_IDS if before.node(pid) != after.node(pid)]
+
+        self.assertEqual({after.node(pid) for pid in moved}, {"shard2"})
+        self.assertAlmostEqual(len(moved) / len(self.PERSON_IDS), 1 / 3, delta=0.05)
+
+    def test_users_mid_move_have_two_candidates(self):
+        shards = ShardMap(["default", "shard1", "shard2"], previous=2)
+
+        for pid in self.PERSON_IDS[:1000]:
+            candidates = shards.candidates(pid)
+            self.assertEqual(candidates[-1], shards.shard_for(pid))
+            if len(candidates) == 2:
+                self.assertEqual(candidates[-1], "shard2")
+
+
+class ProfileSearchTests(TestCase):
+    """
+    Prefix matching on email / names / phones, and keyset pages that cover
+    every match exactly once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            UserProfile.objects.create(
+                person_id=900 + index,
+                email=f"ada{index}@search.test",
+                first_name="Ada",
+                last_name=f"Lovelace{index}",
+                primary_phone=f"98765{index:05d}",
+            )
+        UserProfile.objects.create(person_id=999, email="grace@search.test", first_name="Grace", last_name="Hopper")
+
+    def person_ids(self, query, limit=DEFAULT_PAGE_SIZE):
+        return [profile.person_id for profile in search_profiles(query, limit)[0]]
+
+    def test_prefix_matches(self):
+        self.assertEqual(self.person_ids("grace@"), [999])
+        self.assertEqual(self.person_ids("ada love"), [900, 901, 902, 903, 904])
+        self.assertEqual(self.person_ids("hop"), [999])
+        self.assertEqual(self.person_ids("+91 98765 00003"), [903])
+
+    def test_cursor_pages_cover_every_match(self):
+        seen, after = [], None
+        while True:
+            profiles, next_cursor, total = search_profiles("ada", limit=2, after=after)
+            seen += [profile.person_id for profile in profiles]
+            if next_cursor is None:
+                break
+            after = decode_cursor(next_cursor)
+
+        self.assertEqual(seen, [900, 901, 902, 903, 904])
+        self.assertEqual(total, 5)
+
+    def test_short_query_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            parse_search_request({"q": "ad"})
+
+
+class ProvisioningTests(TestCase):
+    """
+    First sight of a person_id: the conflict-free INSERT covers both unique
+    columns, a clashing email answers 409 instead of an IntegrityError.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stale = UserProfile.objects.create(person_id=700, email="moved@provision.test")
+
+    def setUp(self):
+        auth = mock.patch.object(views.auth_client, "get_user", side_effect=lambda token: self.caller)
+        auth.start()
+        self.addCleanup(auth.stop)
+        profile_ids.cache.clear()
+        profile_ids.person_ids.clear()
+
+    def test_person_id_conflict_inserts_nothing(self):
+        self.assertIsNone(UserProfile.objects._insert_if_absent(700, "other@provision.test"))
+        self.assertEqual(UserProfile.objects.get(person_id=700).email, "moved@provision.test")
+
+    def test_email_conflict_inserts_nothing(self):
+        self.assertIsNone(UserProfile.objects._insert_if_absent(701, "moved@provision.test"))
+        self.assertFalse(UserProfile.objects.filter(person_id=701).exists())
+
+    def test_new_person_gets_a_profile(self):
+        profile, created = UserProfile.objects.resolve(702, "new@provision.test")
+
+        self.assertTrue(created)
+        self.assertEqual(profile.person_id, 702)
+
+    def test_email_on_another_profile_is_a_conflict(self):
+        with self.assertRaises(EmailInUse):
+            UserProfile.objects.resolve(701, "moved@provision.test")
+
+        self.caller = {"person_id": 701, "email": "moved@provision.test", "username": "701"}
+        response = self.client.get(reverse("user-profile"), HTTP_AUTHORIZATION="Bearer provision")
+
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertFalse(UserProfile.objects.filter(person_id=701).exists())
+
+
+class ProfileReadCacheTests(SimpleTestCase):
+    """
+    The read cache only runs on a cache every worker shares, and a worker
+    that lost the fill lock leaves it to its holder.
+    """
+
+    LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    REDIS = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}}
+
+    @override_settings(CACHES=LOCMEM)
+    def test_local_memory_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ProfileReadCache(alias="default", ttl=300)
+
+        # Disabled, nothing to share
+        ProfileReadCache(alias="default", ttl=0)
+
+    @override_settings(CACHES=REDIS)
+    def test_shared_cache_is_accepted(self):
+        self.assertTrue(ProfileReadCache(alias="default", ttl=300).enabled)
+
+    def fill_cache(self):
+        # Local memory stands in for the shared cache here
+        with mock.patch("apps.profiles.read_cache.is_worker_local", return_value=False):
+            cache = ProfileReadCache(alias="default", ttl=300)
+        cache.LOCK_WAIT = cache.LOCK_POLL = 0.01
+        cache.cache.clear()
+        self.addCleanup(cache.cache.clear)
+        return cache
+
+    def test_waiter_does_not_release_the_holders_lock(self):
+        cache = self.fill_cache()
+        cache.cache.add("key:lock", "holder", timeout=60)
+
+        self.assertEqual(cache._fill("key", lambda: {"payload": 1}), {"payload": 1})
+        self.assertEqual(cache.cache.get("key:lock"), "holder")
+        self.assertEqual(cache.lock_waits, 1)
+
+    def test_holder_releases_its_lock(self):
+        cache = self.fill_cache()
+
+        cache._fill("key", lambda: {"payload": 1})
+        self.assertIsNone(cache.cache.get("key:lock"))
+        self.assertEqual(cache.cache.get("key"), {"payload": 1})
+
+    def test_async_waiter_does_not_release_the_holders_lock(self):
+        cache = self.fill_cache()
+        cache.cache.add("key:lock", "holder", timeout=60)
+
+        async def compute():
+            return {"payload": 1}
+
+        self.assertEqual(asyncio.run(cache._afill("key", compute)), {"payload": 1})
+        self.assertEqual(cache.cache.get("key:lock"), "holder")
+
+
+
+class ReplicaStickinessTests(SimpleTestCase):
+    """
+    With read replicas, a local-memory stickiness cache fails at startup
+    instead of silently breaking read-your-writes across workers.
+    """
+
+    @override_settings(CACHES=ProfileReadCacheTests.LOCMEM)
+    def test_local_memory_cache_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            WriteStickiness(alias="default", required=True)
+
+        # No replicas, nothing to stick to
+        WriteStickiness(alias="default")
+
+    @override_settings(CACHES=ProfileReadCacheTests.REDIS)
+    def test_shared_cache_is_accepted(self):
+        WriteStickiness(alias="default", required=True)
+
+    @override_settings(CACHES=ProfileReadCacheTests.LOCMEM)
+    def test_writes_are_not_marked_without_replicas(self):
+        stickiness = WriteStickiness(alias="default")
+
+        with mock.patch.object(caches["default"], "set") as cache_set:
+            stickiness.mark(PERSON_ID)
+
+        cache_set.assert_not_called()
+        self.assertFalse(stickiness.is_sticky(PERSON_ID))
+
+
+class TokenVerifierTests(SimpleTestCase):
+    """
+    Local verification rejects every token AUTH_MS would reject, refreshes
+    the JWKS on an unknown kid, and leaves undecidable tokens to AUTH_MS.
+    """
+
+    KEY = "token-verifier-tests-signing-key-" + "0123456789abcdef" * 2
+
+    def setUp(self):
+        self.verifier = LocalTokenVerifier(
+            SigningKeySet(signing_key=self.KEY), algorithms=["HS256"], audience="profile-ms"
+        )
+
+    def token(self, key=KEY, algorithm="HS256", headers=None, **claims):
+        claims = {
+            "person_id": 7, "email": "7@verifier.test", "aud": "profile-ms",
+            "exp": int(time.time()) + 60, **claims,
+        }
+        return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+    def assertRejected(self, token):
+        with self.assertRaises(TokenVerificationError):
+            self.verifier.verify(token)
+
+    def test_valid_token(self):
+        self.assertEqual(self.verifier.verify(self.token(username="seven")), {
+            "person_id": 7, "email": "7@verifier.test", "username": "seven",
+        })
+
+    def test_bad_signature(self):
+        self.assertRejected(self.token(key="another-signing-key-" + "0123456789abcdef" * 3))
+
+    def test_expired(self):
+        self.assertRejected(self.token(exp=int(time.time()) - 5))
+
+    def test_wrong_audience(self):
+        self.assertRejected(self.token(aud="another-service"))
+
+    def test_disallowed_algorithm(self):
+        self.assertRejected(self.token(algorithm="HS512"))
+        self.assertRejected(jwt.encode({"person_id": 7}, None, algorithm="none"))
+
+    def test_refresh_token(self):
+        self.assertRejected(self.token(token_type="refresh"))
+
+    def test_missing_identity_claims_are_left_to_auth_ms(self):
+        with self.assertRaises(VerificationUnavailable):
+            self.verifier.verify(self.token(email=None))
+
+    # -------------------------------
+    # JWKS
+    # -------------------------------
+    def jwks_verifier(self, *kids):
+        keys = [
+            {"kty": "oct", "kid": kid, "alg": "HS256", "k": jwt.utils.base64url_encode(self.KEY.encode()).decode()}
+            for kid in kids
+        ]
+        response = mock.Mock(json=mock.Mock(return_value={"keys": keys}))
+        fetch = mock.patch("apps.profiles.token_verifier.requests.get", return_value=response)
+        self.fetch = fetch.start()
+        self.addCleanup(fetch.stop)
+
+        key_set = SigningKeySet(jwks_url="https://auth.test/jwks")
+        # No background refresher thread in tests
+        key_set._ensure_refresher = lambda: None
+        return LocalTokenVerifier(key_set, algorithms=["HS256"])
+
+    def test_unknown_kid_refreshes_the_keys(self):
+        verifier = self.jwks_verifier("rotated")
+
+        self.assertEqual(verifier.verify(self.token(headers={"kid": "rotated"}))["person_id"], 7)
+        self.assertEqual(self.fetch.call_count, 1)
+
+        # Still unknown after the refresh: AUTH_MS decides, no refetch within the gap
+        for _ in range(2):
+            with self.assertRaises(VerificationUnavailable):
+                verifier.verify(self.token(headers={"kid": "unknown"}))
+        self.assertEqual(self.fetch.call_count, 1)
+
+    def test_async_refresh_runs_off_the_event_loop(self):
+        verifier = self.jwks_verifier("rotated")
+        threads = []
+        self.fetch.side_effect = lambda *args, **kwargs: threads.append(threading.get_ident()) or mock.DEFAULT
+
+        async def verify():
+            return await verifier.averify(self.token(headers={"kid": "rotated"})), threading.get_ident()
+
+        user, loop_thread = asyncio.run(verify())
+
+        self.assertEqual(user["person_id"], 7)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+
+
+class LocalVerificationFallbackTests(TestCase):
+    """A token the local verifier cannot decide is checked by AUTH_MS."""
+
+    def test_undecidable_token_goes_to_auth_ms(self):
+        verifier = LocalTokenVerifier(SigningKeySet(signing_key=TokenVerifierTests.KEY), algorithms=["HS256"])
+        token = jwt.encode(
+            {"sub": "7", "exp": int(time.time()) + 60}, TokenVerifierTests.KEY, algorithm="HS256"
+        )
+
+        with mock.patch.object(views, "token_verifier", verifier), \
+                mock.patch.object(views.auth_client, "get_user", return_value=caller(PERSON_ID)) as get_user:
+            response = self.client.get(reverse("test-auth"), HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        get_user.assert_called_once_with(token)
+
+    def test_invalid_token_is_not_sent_to_auth_ms(self):
+        verifier = LocalTokenVerifier(SigningKeySet(signing_key=TokenVerifierTests.KEY), algorithms=["HS256"])
+        token = jwt.encode(
+            {"person_id": 7, "email": "7@verifier.test", "exp": int(time.time()) - 5},
+            TokenVerifierTests.KEY, algorithm="HS256",
+        )
+
+        with mock.patch.object(views, "token_verifier", verifier), \
+                mock.patch.object(views.auth_client, "get_user") as get_user:
+            response = self.client.get(reverse("test-auth"), HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(response.status_code, 401)
+        get_user.assert_not_called()
+
+
+class AsyncViewParityTests(TestCase):
+    """The async views accept, reject and shape errors like the sync views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+
+    def setUp(self):
+        self.factory = RequestFactory(HTTP_AUTHORIZATION="Bearer parity")
+        for name, mocked in (
+            ("get_user", mock.Mock(return_value=caller(PERSON_ID))),
+            ("aget_user", mock.AsyncMock(return_value=caller(PERSON_ID))),
+        ):
+            auth = mock.patch.object(views.auth_client, name, mocked, create=True)
+            auth.start()
+            self.addCleanup(auth.stop)
+
+    def test_unsupported_method_is_the_sync_405(self):
+        sync = views.UserProfileView.as_view()(self.factory.patch("/profiles/"))
+        sync.render()
+        response = async_to_sync(async_views.UserProfileView.as_view())(self.factory.patch("/profiles/"))
+
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(orjson.loads(response.content), orjson.loads(sync.content))
+        self.assertEqual(response["Allow"], sync["Allow"])
+
+    def test_form_and_multipart_bodies_are_accepted(self):
+        bodies = {
+            "form": ("first_name=Form", "application/x-www-form-urlencoded"),
+            "multipart": (encode_multipart(BOUNDARY, {"first_name": "Multipart"}), MULTIPART_CONTENT),
+        }
+        for name, (body, content_type) in bodies.items():
+            with self.subTest(name):
+                request = self.factory.put("/profiles/", body, content_type=content_type)
+                response = async_to_sync(async_views.UserProfileView.as_view())(request)
+
+                self.assertEqual(response.status_code, 200, response.content)
+                self.profile.refresh_from_db()
+                self.assertEqual(self.profile.first_name, name.capitalize())
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Breaker transitions, and how AuthClient lookups drive them."""
+
+    USER = {"person_id": 7, "email": "7@breaker.test"}
+
+    def client_with(self, responses, failure_threshold=2):
+        client = AuthClient(
+            base_url="http://auth.test",
+            breaker=CircuitBreaker(failure_threshold=failure_threshold, recovery_timeout=0.05),
+        )
+        client.max_retries = 2
+        client._backoff = lambda attempt: 0
+        client.session.get = mock.Mock(side_effect=responses)
+        return client
+
+    def test_closed_open_half_open_closed(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertGreater(breaker.retry_after(), 0)
+
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        # One probe at a time
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(breaker.snapshot()["rejected"], 2)
+
+    def test_failed_probe_opens_again(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.trips, 2)
+
+    def test_retries_of_one_lookup_count_as_one_failure(self):
+        client = self.client_with(requests.exceptions.ConnectionError("down"))
+
+        with self.assertRaises(AuthServiceUnavailable):
+            client.get_user("token")
+
+        self.assertEqual(client.session.get.call_count, 3)
+        self.assertEqual(client.breaker.snapshot()["consecutive_failures"], 1)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_lookups_open_the_circuit(self):
+        client = self.client_with(requests.exceptions.ConnectionError("down"))
+
+        for _ in range(2):
+            with self.assertRaises(AuthServiceUnavailable):
+                client.get_user("token")
+        client.session.get.reset_mock()
+
+        with self.assertRaisesMessage(AuthServiceUnavailable, "circuit is open"):
+            client.get_user("token")
+        client.session.get.assert_not_called()
+
+    def test_retry_that_succeeds_closes_the_count(self):
+        answer = mock.Mock(status_code=200, json=lambda: {"data": self.USER})
+        client = self.client_with([requests.exceptions.Timeout(), answer])
+
+        self.assertEqual(client.get_user("token"), self.USER)
+        self.assertEqual(client.breaker.snapshot()["consecutive_failures"], 0)
+
+    def test_deadline_bounds_attempts_and_timeouts(self):
+        client = self.client_with(requests.exceptions.Timeout())
+        client.deadline = 0.05
+        client._backoff = lambda attempt: 0.1
+
+        with self.assertRaises(AuthServiceUnavailable):
+            client.get_user("token")
+
+        # The backoff would overrun the deadline, so no retry
+        self.assertEqual(client.session.get.call_count, 1)
+        self.assertLessEqual(client.session.get.call_args.kwargs["timeout"], 0.05)
+
+    def test_unavailable_message_comes_from_the_view(self):
+        with mock.patch.object(views.auth_client, "get_user", side_effect=AuthServiceUnavailable("down")):
+            response = self.client.get(reverse("test-auth"), HTTP_AUTHORIZATION="Bearer breaker")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()["message"], views.AUTH_UNAVAILABLE_MESSAGE)
+
+
+CARD_NUMBERS = (
+    "4111111111111111", "4012888888881881", "4222222222222", "4000056655665556",
+    "4242424242424242", "4917610000000000",
+)
+
+
+def add_cards(profile, count):
+    return [
+        Card.objects.create(user=profile, **QueryBudgetTests.card_body(number))
+        for number in CARD_NUMBERS[:count]
+    ]
+
+
+class CardLimitTests(TestCase):
+    """card_count stays equal to the number of cards and never passes the limit."""
+
+    def setUp(self):
+        self.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        auth = mock.patch.object(views.auth_client, "get_user", return_value=caller(PERSON_ID))
+        auth.start()
+        self.addCleanup(auth.stop)
+        self.addCleanup(profile_ids.person_ids.clear)
+        self.addCleanup(profile_ids.cache.clear)
+
+    def request(self, method, name, body=None, **kwargs):
+        return getattr(self.client, method)(
+            reverse(name, kwargs=kwargs), body and orjson.dumps(body),
+            content_type="application/json", HTTP_AUTHORIZATION="Bearer cards",
+        )
+
+    def assertCardCount(self, count):
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.card_count, count)
+        self.assertEqual(Card.objects.filter(user=self.profile).count(), count)
+
+    def test_fifth_card_is_rejected(self):
+        add_cards(self.profile, MAX_CARDS_PER_USER)
+
+        response = self.request("post", "card-list-create", QueryBudgetTests.card_body(CARD_NUMBERS[4]))
+
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertCardCount(MAX_CARDS_PER_USER)
+
+    def test_delete_releases_the_slot(self):
+        cards = add_cards(self.profile, MAX_CARDS_PER_USER)
+
+        self.assertEqual(self.request("delete", "card-detail", pk=cards[0].pk).status_code, 204)
+        self.assertCardCount(MAX_CARDS_PER_USER - 1)
+
+        response = self.request("post", "card-list-create", QueryBudgetTests.card_body(CARD_NUMBERS[4]))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertCardCount(MAX_CARDS_PER_USER)
+
+    def test_bulk_create_over_the_limit_writes_nothing(self):
+        add_cards(self.profile, MAX_CARDS_PER_USER - 1)
+
+        response = self.request("post", "card-bulk", {"items": [
+            QueryBudgetTests.card_body(number) for number in CARD_NUMBERS[3:5]
+        ]})
+
+        self.assertEqual(response.status_code, 400, response.content)
+        # Only the card that does not fit is flagged
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [1])
+        self.assertCardCount(MAX_CARDS_PER_USER - 1)
+
+    def test_bulk_delete_releases_every_slot(self):
+        cards = add_cards(self.profile, MAX_CARDS_PER_USER)
+
+        response = self.request("delete", "card-bulk", {"ids": [cards[0].pk, cards[1].pk]})
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertCardCount(MAX_CARDS_PER_USER - 2)
+
+    def test_two_creates_validated_at_three_cards(self):
+        add_cards(self.profile, MAX_CARDS_PER_USER - 1)
+        # Both requests are past validation before either one writes
+        first, second = (Card(user=self.profile, **QueryBudgetTests.card_body(number)) for number in CARD_NUMBERS[3:5])
+
+        first.save()
+        with self.assertRaises(CardLimitExceeded):
+            second.save()
+
+        self.assertCardCount(MAX_CARDS_PER_USER)
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class CardLimitRaceTests(TransactionTestCase):
+    """Two truly concurrent creates at 3 of 4 cards: exactly one is written."""
+
+    def test_concurrent_creates_at_three_cards(self):
+        profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        add_cards(profile, MAX_CARDS_PER_USER - 1)
+        barrier = threading.Barrier(2)
+        outcomes = []
+
+        def create(number):
+            try:
+                card = Card(user_id=profile.pk, **QueryBudgetTests.card_body(number))
+                barrier.wait()
+                card.save()
+                outcomes.append("created")
+            except CardLimitExceeded:
+                outcomes.append("rejected")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create, args=(number,)) for number in CARD_NUMBERS[3:5]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(outcomes), ["created", "rejected"])
+        profile.refresh_from_db()
+        self.assertEqual(profile.card_count, MAX_CARDS_PER_USER)
+        self.assertEqual(Card.objects.filter(user=profile).count(), MAX_CARDS_PER_USER)
+
+
+class BulkOperationErrorTests(TestCase):
+    """A failing batch writes nothing and names every failing item by index."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        cls.home = Address.objects.create(user=cls.profile, address_type="home", line1="1 Main St", is_default=True)
+        cls.work = Address.objects.create(user=cls.profile, address_type="work", line1="2 Main St")
+        other = UserProfile.objects.create(person_id=NEW_PERSON_ID, email=caller(NEW_PERSON_ID)["email"])
+        cls.foreign = Address.objects.create(user=other, address_type="home", line1="9 Other St")
+
+    def addresses(self):
+        return AddressBulkOperation(self.profile.pk, PERSON_ID)
+
+    def errors(self, write, *args):
+        with self.assertRaises(BulkValidationError) as raised:
+            write(*args)
+        return {error["index"]: error["errors"] for error in raised.exception.errors}
+
+    def test_duplicate_id(self):
+        errors = self.errors(self.addresses().update, [
+            {"id": self.home.pk, "line2": "A"}, {"id": self.home.pk, "line2": "B"},
+        ])
+        self.assertEqual(errors, {1: {"id": ["Duplicate id."]}})
+
+        errors = self.errors(self.addresses().delete, [self.work.pk, self.work.pk])
+        self.assertEqual(errors, {1: {"id": ["Duplicate id."]}})
+        self.assertTrue(Address.objects.filter(pk=self.work.pk).exists())
+
+    def test_foreign_id_is_not_found(self):
+        errors = self.errors(self.addresses().update, [
+            {"id": self.home.pk, "line2": "A"}, {"id": self.foreign.pk, "line2": "B"},
+        ])
+        self.assertEqual(errors, {1: {"id": ["Address not found."]}})
+
+        errors = self.errors(self.addresses().delete, [self.foreign.pk])
+        self.assertEqual(errors, {0: {"id": ["Address not found."]}})
+        self.assertTrue(Address.objects.filter(pk=self.foreign.pk).exists())
+
+    def test_address_type_taken_by_an_existing_row(self):
+        errors = self.errors(self.addresses().create, [
+            {"address_type": "friend", "line1": "3 Main St"},
+            {"address_type": "work", "line1": "4 Main St"},
+        ])
+
+        self.assertEqual(errors, {1: {"address_type": ["Address of this type already exists."]}})
+        self.assertEqual(Address.objects.filter(user=self.profile).count(), 2)
+
+    def test_address_type_repeated_in_the_batch(self):
+        errors = self.errors(self.addresses().create, [
+            {"address_type": "friend", "line1": "3 Main St"},
+            {"address_type": "friend", "line1": "4 Main St"},
+        ])
+
+        self.assertEqual(set(errors), {0, 1})
+
+    def test_two_default_claims(self):
+        errors = self.errors(self.addresses().create, [
+            {"address_type": "friend", "line1": "3 Main St", "is_default": True},
+            {"address_type": "other", "line1": "4 Main St", "is_default": True},
+        ])
+
+        self.assertEqual(set(errors), {0, 1})
+        self.assertEqual(errors[0], {"is_default": ["Only one item per request can be the default."]})
+        self.home.refresh_from_db()
+        self.assertTrue(self.home.is_default)
+
+    def test_cards_past_the_limit_are_flagged(self):
+        add_cards(self.profile, MAX_CARDS_PER_USER - 2)
+        items = [QueryBudgetTests.card_body(number) for number in CARD_NUMBERS[2:6]]
+
+        errors = self.errors(CardBulkOperation(self.profile.pk, PERSON_ID).create, items)
+
+        self.assertEqual(set(errors), {2, 3})
+        self.assertEqual(errors[2], {"non_field_errors": [f"Maximum {MAX_CARDS_PER_USER} cards allowed per user."]})
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.card_count, MAX_CARDS_PER_USER - 2)
+
+    def test_conflicting_update_is_reported_per_item(self):
+        items = [{"id": self.home.pk, "line2": "A"}, {"id": self.work.pk, "line2": "B"}]
+
+        with mock.patch.object(Address.objects, "bulk_update", side_effect=IntegrityError("unique")):
+            errors = self.errors(self.addresses().update, items)
+
+        self.assertEqual(set(errors), {0, 1})
+        self.assertIn("send it separately", errors[0]["non_field_errors"][0])
+        self.home.refresh_from_db()
+        self.assertEqual(self.home.line2, "")
+
+
+class ExportImportRoundTripTests(TransactionTestCase):
+    """What export_profiles writes, import_profiles reads back (cards need their number)."""
+
+    FIELDS = ("person_id", "email", "first_name", "primary_phone", "date_of_birth", "gender")
+
+    def setUp(self):
+        self.profile = UserProfile.objects.create(
+            person_id=PERSON_ID, email=caller(PERSON_ID)["email"], first_name="Round",
+            primary_phone="9876543210", date_of_birth="1990-01-31", gender="F",
+        )
+        Address.objects.create(user=self.profile, address_type="home", line1="1 Main St", is_default=True)
+
+    def export(self):
+        records = list(export_records())
+        UserProfile.objects.all().delete()
+        return records
+
+    def load(self, records, fmt="ndjson"):
+        text = "".join((csv_chunks if fmt == "csv" else ndjson_chunks)(records))
+        return load_batch(list(read_records(io.StringIO(text, newline=""), fmt)))
+
+    def test_profiles_and_addresses_read_back(self):
+        profile = UserProfile.objects.values(*self.FIELDS).get()
+        addresses = list(Address.objects.values("address_type", "line1", "is_default"))
+        records = self.export()
+
+        for fmt in ("ndjson", "csv"):
+            with self.subTest(fmt):
+                counts, rejects = self.load(records, fmt)
+
+                self.assertEqual(rejects, [])
+                self.assertEqual(counts, {"profiles": 1, "addresses": 1, "cards": 0})
+                self.assertEqual(UserProfile.objects.values(*self.FIELDS).get(), profile)
+                self.assertEqual(list(Address.objects.values("address_type", "line1", "is_default")), addresses)
+                UserProfile.objects.all().delete()
+
+    def test_exported_cards_need_their_number(self):
+        Card.objects.create(user=self.profile, **QueryBudgetTests.card_body(CARD_NUMBERS[0]))
+        records = self.export()
+
+        counts, rejects = self.load(records)
+        self.assertEqual(counts["profiles"], 0)
+        self.assertEqual(rejects[0]["errors"], {"cards": {0: {"card_number": [MASKED_CARD_MESSAGE]}}})
+
+        records[0]["cards"][0]["card_number"] = CARD_NUMBERS[0]
+        counts, rejects = self.load(records)
+
+        self.assertEqual(rejects, [])
+        self.assertEqual(counts["cards"], 1)
+        self.assertEqual(UserProfile.objects.get().card_count, 1)
+        self.assertEqual(Card.objects.get().card_number, CARD_NUMBERS[0])
+
+
+class RequestMetricsTests(SimpleTestCase):
+    """With METRICS_DIR, whichever worker is scraped reports every worker's requests."""
+
+    ROUTE = "profiles/"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def worker(self, pid, requests):
+        metrics = RequestMetrics(directory=self.directory, flush_interval=60)
+        with mock.patch("apps.profiles.metrics.os.getpid", return_value=pid):
+            for _ in range(requests):
+                metrics.observe(self.ROUTE, "GET", 200, RequestTimings(), 0.01)
+            metrics.flush()
+        return metrics
+
+    def samples(self, metrics, pid):
+        with mock.patch("apps.profiles.metrics.os.getpid", return_value=pid):
+            text = metrics.exposition()
+        return dict(line.rsplit(" ", 1) for line in text.splitlines() if not line.startswith("#"))
+
+    def test_scrape_sums_all_workers(self):
+        first = self.worker(101, 2)
+        second = self.worker(102, 1)
+
+        for metrics, pid in ((first, 101), (second, 102)):
+            samples = self.samples(metrics, pid)
+            self.assertEqual(samples[f'profile_ms_requests_total{{route="{self.ROUTE}",method="GET",status="200"}}'], "3")
+            self.assertEqual(samples[f'profile_ms_request_db_queries_count{{route="{self.ROUTE}",method="GET"}}'], "3")
+
+    def test_exited_workers_stay_counted(self):
+        self.worker(101, 2)
+        replacement = self.worker(103, 1)
+
+        samples = self.samples(replacement, 103)
+        self.assertEqual(samples[f'profile_ms_requests_total{{route="{self.ROUTE}",method="GET",status="200"}}'], "3")
+
+    def test_without_directory_only_this_worker(self):
+        metrics = RequestMetrics()
+        metrics.observe(self.ROUTE, "GET", 200, RequestTimings(), 0.01)
+
+        samples = self.samples(metrics, 101)
+        self.assertEqual(samples[f'profile_ms_requests_total{{route="{self.ROUTE}",method="GET",status="200"}}'], "1")
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """ORJSONRenderer writes the bytes DRF's JSONRenderer would."""
+
+    PAYLOAD = {
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "created_at": datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        "local": datetime.datetime(2024, 1, 2, 3, 4, 5),
+        "date_of_birth": datetime.date(1990, 1, 31),
+        "opens_at": datetime.time(9, 30),
+        "balance": Decimal("12.50"),
+        "ratio": 0.1,
+        "count": 2 ** 40,
+        "label": gettext_lazy("Card number"),
+        "name": "Zoë \u2028 \"quoted\" \\ </script>",
+        "flags": [True, False, None],
+        "pair": (1, "two"),
+        "by_id": {7: "seven"},
+        "empty": {"list": [], "dict": {}},
+    }
+
+    def test_same_bytes_as_drf(self):
+        self.assertEqual(ORJSONRenderer().render(self.PAYLOAD), JSONRenderer().render(self.PAYLOAD))
+        self.assertEqual(
+            ORJSONRenderer().render({"success": True, "data": self.PAYLOAD}),
+            JSONRenderer().render({"success": True, "data": self.PAYLOAD}),
+        )
+
+    def test_response_data_is_a_plain_dict(self):
+        with mock.patch.object(views.auth_client, "get_user", return_value=caller(PERSON_ID)):
+            for name in ("health-check", "test-auth"):
+                with self.subTest(name):
+                    response = self.client.get(reverse(name), headers={"Authorization": "Bearer renderer"})
+
+                    self.assertIs(type(response.data), dict)
+                    self.assertIs(response.data["success"], True)
+                    self.assertEqual(orjson.loads(response.content), response.data)
+
+    def test_pre_encoded_body_is_reused_for_the_same_dict_only(self):
+        constant = pre_encoded({"success": True, "data": {"status": "up"}})
+        renderer = ORJSONRenderer()
+
+        with mock.patch("apps.profiles.renderers.encode") as encode_again:
+            self.assertEqual(renderer.render(constant), b'{"success":true,"data":{"status":"up"}}')
+        encode_again.assert_not_called()
+
+        # An equal dict built per request is encoded as usual
+        self.assertEqual(renderer.render(dict(constant)), encode(constant))
+
+    def test_non_finite_numbers_are_refused_like_drf(self):
+        for value in (float("nan"), float("inf"), Decimal("-Infinity")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({"data": [value]})
+                with self.assertRaises(ValueError):
+                    ORJSONRenderer().render({"data": [value]})
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    """The connection modes of profile_ms/settings.py."""
+
+    def load_settings(self, **env):
+        environ = {"SECRET_KEY": "settings-tests", "AUTH_MS_BASE_URL": "http://auth.test", **env}
+        with mock.patch.dict(os.environ, environ):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, "profile_ms", "settings.py"))
+
+    def test_pool_checks_connections_on_checkout(self):
+        from psycopg_pool import ConnectionPool
+
+        database = self.load_settings(DB_CONN_MODE="pool")["DATABASES"]["default"]
+
+        self.assertIs(database["OPTIONS"]["pool"]["check"], ConnectionPool.check_connection)
+        # Ignored by Django with a pool
+        self.assertNotIn("CONN_HEALTH_CHECKS", database)
+
+    def test_persistent_connections_are_health_checked(self):
+        database = self.load_settings(DB_CONN_MODE="persistent")["DATABASES"]["default"]
+
+        self.assertNotIn("pool", database["OPTIONS"])
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+
+
+class LeanRuntimeTests(SimpleTestCase):
+    """
+    LEAN_RUNTIME=True serves the JSON API without the admin, sessions,
+    messages, static files, templates, translations or browsable API.
+    Settings are read once per process, so it is checked in a fresh one.
+    """
+
+    PROBE = """
+import json, sys
+import django
+django.setup()
+from django.conf import settings
+from django.test import Client
+from rest_framework.settings import api_settings
+
+client = Client()
+profile = client.get("/profiles/profile/")
+export = client.get("/profiles/admin/export/")
+print(json.dumps({
+    "apps": settings.INSTALLED_APPS,
+    "middleware": settings.MIDDLEWARE,
+    "templates": settings.TEMPLATES,
+    "i18n": settings.USE_I18N,
+    "renderers": settings.REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"],
+    "profile": [profile.status_code, profile["Content-Type"]],
+    "export": export.status_code,
+    "authenticators": [cls.__name__ for cls in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    "admin": client.get("/admin/").status_code,
+    "modules": sorted(
+        name for name in ("jwt", "django.contrib.sessions.middleware", "django.contrib.messages.middleware")
+        if name in sys.modules
+    ),
+}))
+"""
+
+    def probe(self, lean):
+        environ = {**os.environ, "LEAN_RUNTIME": str(lean)}
+        result = subprocess.run(
+            [sys.executable, "-c", self.PROBE], env=environ, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return orjson.loads(result.stdout.splitlines()[-1])
+
+    def test_lean_runtime_serves_only_the_json_api(self):
+        lean = self.probe(True)
+
+        self.assertFalse({
+            "django.contrib.admin", "django.contrib.sessions", "django.contrib.messages", "django.contrib.staticfiles",
+        } & set(lean["apps"]))
+        self.assertNotIn("django.contrib.sessions.middleware.SessionMiddleware", lean["middleware"])
+        self.assertEqual((lean["templates"], lean["i18n"]), ([], False))
+        self.assertEqual(lean["renderers"], ["apps.profiles.renderers.ORJSONRenderer"])
+
+        # JSON errors, staff endpoints behind HTTP Basic, no admin site
+        self.assertEqual(lean["profile"], [401, "application/json"])
+        self.assertEqual(lean["export"], 401)
+        self.assertEqual(lean["authenticators"], ["BasicAuthentication"])
+        self.assertEqual(lean["admin"], 404)
+        # PyJWT only once a token is verified locally
+        self.assertEqual(lean["modules"], [])
+
+    def test_full_runtime_keeps_the_admin(self):
+        full = self.probe(False)
+
+        self.assertIn("django.contrib.admin", full["apps"])
+        self.assertIn("rest_framework.renderers.BrowsableAPIRenderer", full["renderers"])
+        self.assertIn("SessionAuthentication", full["authenticators"])
+        self.assertEqual(full["admin"], 302)
+
+
+class ConditionalRequestTests(TestCase):
+    """ETag / Last-Modified validators: 304 on reads, 412 on stale writes."""
+
+    def setUp(self):
+        self.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        self.home = Address.objects.create(user=self.profile, address_type="home", line1="1 Main St")
+        auth = mock.patch.object(views.auth_client, "get_user", return_value=caller(PERSON_ID))
+        auth.start()
+        self.addCleanup(auth.stop)
+        self.addCleanup(profile_ids.person_ids.clear)
+        self.addCleanup(profile_ids.cache.clear)
+
+    def request(self, method, name, body=None, headers=None, **kwargs):
+        return getattr(self.client, method)(
+            reverse(name, kwargs=kwargs), body and orjson.dumps(body), content_type="application/json",
+            headers={"Authorization": "Bearer conditional", **(headers or {})},
+        )
+
+    def test_if_none_match_is_not_modified(self):
+        etag = self.request("get", "user-profile")["ETag"]
+
+        response = self.request("get", "user-profile", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.request("get", "user-profile")["Last-Modified"]
+        earlier = http_date(int(self.profile.updated_at.timestamp()) - 3600)
+
+        self.assertEqual(
+            self.request("get", "user-profile", headers={"If-Modified-Since": last_modified}).status_code, 304
+        )
+        self.assertEqual(
+            self.request("get", "user-profile", headers={"If-Modified-Since": earlier}).status_code, 200
+        )
+
+    def test_stale_if_match_is_refused(self):
+        stale = {"If-Match": '"stale"'}
+
+        response = self.request("put", "user-profile", {"first_name": "Late"}, headers=stale)
+        self.assertEqual(response.status_code, 412, response.content)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.first_name, "")
+
+        response = self.request("delete", "address-detail", headers=stale, pk=self.home.pk)
+        self.assertEqual(response.status_code, 412, response.content)
+        self.assertTrue(Address.objects.filter(pk=self.home.pk).exists())
+
+        current = {"If-Match": self.request("get", "address-detail", pk=self.home.pk)["ETag"]}
+        response = self.request("delete", "address-detail", headers=current, pk=self.home.pk)
+        self.assertEqual(response.status_code, 204, response.content)
+
+    def test_collection_etag_follows_creates_and_deletes(self):
+        initial = self.request("get", "address-list-create")["ETag"]
+
+        response = self.request("post", "address-list-create", {"address_type": "work", "line1": "2 Main St"})
+        self.assertEqual(response.status_code, 201, response.content)
+        created = self.request("get", "address-list-create")["ETag"]
+
+        self.assertEqual(self.request("delete", "address-detail", pk=self.home.pk).status_code, 204)
+        deleted = self.request("get", "address-list-create")["ETag"]
+
+        self.assertEqual(len({initial, created, deleted}), 3)
+        response = self.request("get", "address-list-create", headers={"If-None-Match": initial})
+        self.assertEqual(response.status_code, 200)
+
+
+class TokenCacheTests(SimpleTestCase):
+    """AUTH_MS lookups cached per token hash, bounded by `exp`, one call per token at a time."""
+
+    USER = {"person_id": 7, "email": "7@token-cache.test"}
+
+    def token(self, expires_in):
+        return jwt.encode({"sub": "7", "exp": int(time.time() + expires_in)}, TokenVerifierTests.KEY, algorithm="HS256")
+
+    def client_with(self, cache, response=None):
+        client = AuthClient(base_url="http://auth.test", cache=cache, breaker=CircuitBreaker())
+        response = response or mock.Mock(status_code=200, json=lambda: {"data": self.USER})
+        client.session.get = mock.Mock(return_value=response)
+        return client
+
+    def expires_in(self, cache, token):
+        expires_at, _ = cache.local._data[cache.key(token)]
+        return expires_at - time.monotonic()
+
+    def test_ttl_is_capped_at_exp(self):
+        cache = TokenCache(ttl=60)
+        short, long = self.token(5), self.token(3600)
+
+        cache.set(short, self.USER)
+        cache.set(long, self.USER)
+
+        self.assertLessEqual(self.expires_in(cache, short), 5)
+        self.assertGreater(self.expires_in(cache, long), 55)
+
+        expired = self.token(-5)
+        cache.set(expired, self.USER)
+        self.assertIsNone(cache.get(expired))
+
+    def test_rejected_token_is_cached_for_negative_ttl(self):
+        cache = TokenCache(negative_ttl=0.05)
+        client = self.client_with(cache, mock.Mock(status_code=401))
+        token = self.token(3600)
+
+        for _ in range(2):
+            with self.assertRaises(InvalidTokenError):
+                client.get_user(token)
+        self.assertEqual(client.session.get.call_count, 1)
+        self.assertEqual(cache.get(token), INVALID)
+
+        time.sleep(0.06)
+        self.assertIsNone(cache.get(token))
+        with self.assertRaises(InvalidTokenError):
+            client.get_user(token)
+        self.assertEqual(client.session.get.call_count, 2)
+
+    def test_concurrent_lookups_share_one_call(self):
+        client = self.client_with(TokenCache())
+        answer = client.session.get.return_value
+        barrier = threading.Barrier(5)
+
+        def slow_get(*args, **kwargs):
+            time.sleep(0.05)
+            return answer
+
+        client.session.get.side_effect = slow_get
+        results = []
+
+        def lookup():
+            barrier.wait()
+            results.append(client.get_user("shared-token"))
+
+        threads = [threading.Thread(target=lookup) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [self.USER] * 5)
+        self.assertEqual(client.session.get.call_count, 1)
+
+    def test_stats_count_hits_and_misses(self):
+        client = self.client_with(TokenCache())
+
+        client.get_user("counted-token")
+        client.get_user("counted-token")
+
+        stats = client.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertGreaterEqual(stats["misses"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_entries_are_keyed_by_sha256(self):
+        cache = TokenCache(shared_alias="default")
+        self.addCleanup(caches["default"].clear)
+        token = self.token(3600)
+        digest = hashlib.sha256(token.encode()).hexdigest()
+
+        cache.set(token, self.USER)
+
+        self.assertEqual(list(cache.local._data), [digest])
+        self.assertIsNotNone(caches["default"].get(TokenCache.KEY_PREFIX + digest))
+        self.assertIsNone(caches["default"].get(TokenCache.KEY_PREFIX + token))
+
+
+@override_settings(INTERNAL_SERVICE_TOKENS=["other-service", SERVICE_TOKEN], INTERNAL_BATCH_MAX_IDS=5, INTERNAL_BATCH_CHUNK_SIZE=2)
+class InternalProfileBatchTests(TestCase):
+    """POST /internal/profiles/batch/: service token, one NDJSON line per requested id."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for person_id in (11, 12, 13):
+            profile = UserProfile.objects.create(person_id=person_id, email=f"{person_id}@batch.test")
+            Address.objects.create(user=profile, address_type="home", line1=f"{person_id} Main St", is_default=True)
+
+    def batch(self, body, token=SERVICE_TOKEN):
+        headers = {"X-Service-Token": token} if token else {}
+        return self.client.post(
+            reverse("internal-profile-batch"), orjson.dumps(body), content_type="application/json", headers=headers
+        )
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [orjson.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+
+    def test_service_token_is_required(self):
+        body = {"person_ids": [11]}
+
+        self.assertEqual(self.batch(body, token=None).status_code, 401)
+        self.assertEqual(self.batch(body, token="wrong").status_code, 403)
+
+    def test_lines_follow_the_request_order_across_chunks(self):
+        person_ids = [13, 99, 11, 12]
+
+        lines = self.lines(self.batch({"person_ids": person_ids, "include": ["default_address"]}))
+
+        self.assertEqual([line["person_id"] for line in lines], person_ids)
+        self.assertEqual([line["profile"]["email"] for line in lines if line["profile"]], [
+            "13@batch.test", "11@batch.test", "12@batch.test",
+        ])
+        self.assertEqual(lines[0]["default_address"]["line1"], "13 Main St")
+
+    def test_unknown_person_ids_are_null(self):
+        lines = self.lines(self.batch({"person_ids": [98, 11], "include": ["default_card"]}))
+
+        self.assertEqual(lines[0], {"person_id": 98, "profile": None, "default_card": None})
+        self.assertIsNotNone(lines[1]["profile"])
+        self.assertIsNone(lines[1]["default_card"])
+
+    def test_too_many_ids_are_rejected(self):
+        response = self.batch({"person_ids": list(range(1, 7))})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()["success"])
+
+
+class ValuesSerializerTests(TestCase):
+    """The .values_list() path renders the bytes of the ModelSerializer path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        full = UserProfile.objects.create(
+            person_id=31, email="31@values.test", alternate_email="alt@values.test", primary_phone="9876543210",
+            first_name="Zoë", date_of_birth=datetime.date(1990, 1, 31), gender="F",
+        )
+        # Nullable columns left null
+        bare = UserProfile.objects.create(person_id=32, email="32@values.test")
+        for profile in (full, bare):
+            Address.objects.create(user=profile, address_type="home", line1="1 Main St", is_default=True)
+            Address.objects.create(user=profile, address_type="work", line1="2 Main St", line2="Floor 3")
+        add_cards(full, 2)
+
+    def assertSameBytes(self, values_serializer, serializer_class, queryset):
+        fast = values_serializer.data(queryset)
+        model = serializer_class(queryset, many=True).data
+
+        self.assertEqual(encode(fast), encode(model))
+
+    def test_profiles(self):
+        self.assertSameBytes(
+            ValuesSerializer(UserProfileSerializer), UserProfileSerializer, UserProfile.objects.order_by("person_id")
+        )
+
+    def test_addresses(self):
+        self.assertSameBytes(address_values, AddressSerializer, Address.objects.all())
+
+    def test_cards(self):
+        self.assertSameBytes(card_values, CardSerializer, Card.objects.all())
+
+    def test_decimal_fields_go_through_drf(self):
+        # No model column is a decimal today, a future one keeps DRF's formatting
+        field = serializers.DecimalField(max_digits=6, decimal_places=2)
+
+        self.assertEqual(field_converter(field)(Decimal("12.5")), field.to_representation(Decimal("12.5")))
+        self.assertEqual(field_converter(field)(Decimal("12.5")), "12.50")
+
+
+class DefaultFlagTests(TestCase):
+    """At most one default address / card per profile, moved atomically."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        cls.home = Address.objects.create(user=cls.profile, address_type="home", line1="1 Main St", is_default=True)
+        cls.work = Address.objects.create(user=cls.profile, address_type="work", line1="2 Main St")
+
+    def defaults(self):
+        return list(Address.objects.filter(user=self.profile, is_default=True).values_list("pk", flat=True))
+
+    def test_set_default_moves_the_flag(self):
+        Address.objects.set_default(self.work)
+
+        self.assertEqual(self.defaults(), [self.work.pk])
+
+    def test_set_default_of_a_deleted_row_changes_nothing(self):
+        Address.objects.filter(pk=self.work.pk).delete()
+
+        with self.assertRaises(Address.DoesNotExist):
+            Address.objects.set_default(self.work)
+
+        # The old default was cleared in the same, rolled back, transaction
+        self.assertEqual(self.defaults(), [self.home.pk])
+
+    def test_saving_a_new_default_clears_the_old_one(self):
+        friend = Address.objects.create(user=self.profile, address_type="friend", line1="3 Main St", is_default=True)
+
+        self.assertEqual(self.defaults(), [friend.pk])
+
+    def test_constraint_rejects_a_second_default(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            # update() bypasses save(), only the partial unique index is left
+            Address.objects.filter(pk=self.work.pk).update(is_default=True)
+
+        card, other = add_cards(self.profile, 2)
+        Card.objects.filter(pk=card.pk).update(is_default=True)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Card.objects.filter(pk=other.pk).update(is_default=True)
+
+        self.assertEqual(self.defaults(), [self.home.pk])
+
+    def test_bulk_update_claims_the_default(self):
+        AddressBulkOperation(self.profile.pk, PERSON_ID).update([{"id": self.work.pk, "is_default": True}])
+
+        self.assertEqual(self.defaults(), [self.work.pk])
+
+    def test_bulk_create_claims_the_default(self):
+        created = AddressBulkOperation(self.profile.pk, PERSON_ID).create([
+            {"address_type": "friend", "line1": "3 Main St", "is_default": True},
+            {"address_type": "other", "line1": "4 Main St"},
+        ])
+
+        self.assertEqual(self.defaults(), [created[0]["data"]["id"]])
+
+
+
+SHARD_ALIASES = ("default", "shard1", "shard2")
+
+
+@skipUnless(
+    set(SHARD_ALIASES) <= set(settings.DATABASES) and shards.aliases == SHARD_ALIASES,
+    "needs the default, shard1 and shard2 databases in PROFILE_SHARDS",
+)
+class ShardingTests(TestCase):
+    """
+    A person_id's rows live on the shard ShardMap gives it, are found on the
+    old shard until a reshard moves them, and keep ids unique across shards.
+    """
+
+    databases = {alias for alias in SHARD_ALIASES if alias in settings.DATABASES}
+
+    def setUp(self):
+        profile_ids.cache.clear()
+        profile_ids.person_ids.clear()
+        self.addCleanup(profile_ids.person_ids.clear)
+        self.addCleanup(profile_ids.cache.clear)
+
+    @staticmethod
+    def person_on(shard_map, *candidates):
+        return next(pid for pid in range(1, 10000) if shard_map.candidates(pid) == candidates)
+
+    def create_user(self, person_id, alias):
+        profile = UserProfile.objects.using(alias).create(person_id=person_id, email=caller(person_id)["email"])
+        Address.objects.using(alias).create(user=profile, address_type="home", line1="1 Main St", is_default=True)
+        for number in CARD_NUMBERS[:2]:
+            Card.objects.using(alias).create(user=profile, **QueryBudgetTests.card_body(number))
+        return profile
+
+    def rows(self, alias, person_id):
+        return (
+            UserProfile.objects.using(alias).filter(person_id=person_id).count(),
+            Address.objects.using(alias).filter(user__person_id=person_id).count(),
+            Card.objects.using(alias).filter(user__person_id=person_id).count(),
+        )
+
+    def test_requests_use_the_shard_of_the_person_id(self):
+        person_id = next(pid for pid in range(1, 10000) if shards.shard_for(pid) == "shard1")
+        headers = {"Authorization": "Bearer shard"}
+
+        with mock.patch.object(views.auth_client, "get_user", return_value=caller(person_id)):
+            # Provisioned (written) on its shard, then read and updated there
+            self.assertEqual(self.client.get(reverse("user-profile"), headers=headers).status_code, 200)
+            response = self.client.put(
+                reverse("user-profile"), orjson.dumps({"first_name": "Sharded"}),
+                content_type="application/json", headers=headers,
+            )
+            self.assertEqual(response.status_code, 200, response.content)
+            response = self.client.post(
+                reverse("address-list-create"), orjson.dumps({"address_type": "home", "line1": "1 Main St"}),
+                content_type="application/json", headers=headers,
+            )
+            self.assertEqual(response.status_code, 201, response.content)
+            response = self.client.get(reverse("address-list-create"), headers=headers)
+
+        self.assertEqual([row["line1"] for row in orjson.loads(response.content)["data"]], ["1 Main St"])
+        self.assertEqual(UserProfile.objects.using("shard1").get(person_id=person_id).first_name, "Sharded")
+        self.assertEqual(self.rows("shard1", person_id), (1, 1, 0))
+        self.assertEqual(self.rows("default", person_id), (0, 0, 0))
+
+    def test_orm_follows_the_bound_person_id(self):
+        person_id = next(pid for pid in range(1, 10000) if shards.shard_for(pid) == "shard1")
+        routing = RequestRouting(replica_reads=False)
+        routing.person_id = person_id
+        token = current_routing.set(routing)
+        self.addCleanup(current_routing.reset, token)
+
+        profile = UserProfile.objects.create(person_id=person_id, email=caller(person_id)["email"])
+
+        self.assertEqual(profile._state.db, "shard1")
+        self.assertEqual(UserProfile.objects.get(person_id=person_id)._state.db, "shard1")
+        self.assertFalse(UserProfile.objects.using("default").filter(person_id=person_id).exists())
+
+    def test_locate_falls_back_to_the_old_shard_mid_reshard(self):
+        resharding = ShardMap(SHARD_ALIASES, active=3, previous=2)
+        person_id = self.person_on(resharding, "shard1", "shard2")
+        unknown = self.person_on(resharding, "default", "shard2")
+
+        # Not moved yet: still served by its old shard, new users go to the new one
+        self.create_user(person_id, "shard1")
+        self.assertEqual(resharding.locate(person_id), "shard1")
+        self.assertEqual(resharding.locate(unknown), "shard2")
+
+        move_profile(person_id, "shard1", "shard2")
+        self.assertEqual(resharding.locate(person_id), "shard2")
+
+    def test_move_profile_copies_the_user_and_drops_the_source(self):
+        profile = self.create_user(PERSON_ID, "shard1")
+        address_ids = set(Address.objects.using("shard1").values_list("pk", flat=True))
+        card_ids = set(Card.objects.using("shard1").values_list("pk", flat=True))
+
+        self.assertTrue(move_profile(PERSON_ID, "shard1", "shard2"))
+
+        self.assertEqual(self.rows("shard1", PERSON_ID), (0, 0, 0))
+        self.assertEqual(self.rows("shard2", PERSON_ID), (1, 1, 2))
+        # Same ids, clients keep their address / card ids
+        self.assertEqual(UserProfile.objects.using("shard2").get(person_id=PERSON_ID).pk, profile.pk)
+        self.assertEqual(set(Address.objects.using("shard2").values_list("pk", flat=True)), address_ids)
+        self.assertEqual(set(Card.objects.using("shard2").values_list("pk", flat=True)), card_ids)
+
+        # Nothing left to move
+        self.assertFalse(move_profile(PERSON_ID, "shard1", "shard2"))
+
+    def test_reserved_id_ranges_do_not_overlap(self):
+        span = settings.DB_SHARD_ID_SPAN
+        for index, alias in enumerate(SHARD_ALIASES):
+            # Run after every migrate, so repeating it must not move the sequences back
+            reserve_id_range(alias)
+            self.create_user(PERSON_ID + index, alias)
+
+            for model in (UserProfile, Address, Card):
+                with self.subTest(alias=alias, model=model.__name__):
+                    ids = list(model.objects.using(alias).values_list("pk", flat=True))
+                    self.assertTrue(ids)
+                    self.assertTrue(all(index * span <= pk < (index + 1) * span for pk in ids), ids)
+
+
+class ProfileIdentityMapTests(TransactionTestCase):
+    """
+    The address / card views resolve the caller's profile pk through the
+    per-worker map: provisioned on first sight, then without a query, and
+    re-resolved when another worker deleted the profile.
+    """
+
+    ADDRESS = {"address_type": "home", "line1": "1 Main St"}
+    databases = "__all__"
+
+    def setUp(self):
+        for name, mocked in (
+            ("get_user", mock.Mock(return_value=caller(PERSON_ID))),
+            ("aget_user", mock.AsyncMock(return_value=caller(PERSON_ID))),
+        ):
+            auth = mock.patch.object(views.auth_client, name, mocked, create=True)
+            auth.start()
+            self.addCleanup(auth.stop)
+        profile_ids.cache.clear()
+        profile_ids.person_ids.clear()
+        self.addCleanup(profile_ids.person_ids.clear)
+        self.addCleanup(profile_ids.cache.clear)
+
+    def request(self, method, name, body=None):
+        return getattr(self.client, method)(
+            reverse(name), body and orjson.dumps(body),
+            content_type="application/json", headers={"Authorization": "Bearer identity"},
+        )
+
+    def delete_elsewhere(self):
+        """Deletes the caller's profile the way another worker would: this map is not told."""
+        with mock.patch.object(profile_ids, "forget"):
+            UserProfile.objects.filter(person_id=PERSON_ID).delete()
+
+    def test_caller_without_profile_gets_one(self):
+        response = self.request("get", "address-list-create")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        profile = UserProfile.objects.get(person_id=PERSON_ID)
+        self.assertEqual(profile.email, caller(PERSON_ID)["email"])
+        self.assertEqual(profile_ids.profile_id(PERSON_ID), profile.pk)
+
+    def test_second_request_is_served_from_the_map(self):
+        self.request("get", "address-list-create")
+
+        with CaptureQueriesContext(connection) as log:
+            response = self.request("get", "card-list-create")
+
+        self.assertEqual(response.status_code, 200, response.content)
+        # Children are filtered on user_id, or joined for the ETag, the profile is never selected alone
+        profile_table = f"FROM {connection.ops.quote_name(UserProfile._meta.db_table)}"
+        self.assertEqual([query["sql"] for query in log if profile_table in query["sql"]], [])
+
+    def test_write_after_a_delete_by_another_worker_reprovisions(self):
+        self.request("get", "address-list-create")
+        stale = profile_ids.profile_id(PERSON_ID)
+        self.delete_elsewhere()
+
+        # Address foreign key, then the card slot reservation
+        address = self.request("post", "address-list-create", self.ADDRESS)
+        card = self.request("post", "card-list-create", QueryBudgetTests.card_body(CARD_NUMBERS[0]))
+
+        self.assertEqual(address.status_code, 201, address.content)
+        self.assertEqual(card.status_code, 201, card.content)
+        profile = UserProfile.objects.get(person_id=PERSON_ID)
+        self.assertNotEqual(profile.pk, stale)
+        self.assertEqual(profile_ids.profile_id(PERSON_ID), profile.pk)
+        self.assertEqual(Address.objects.get().user_id, profile.pk)
+        self.assertEqual((Card.objects.get().user_id, profile.card_count), (profile.pk, 1))
+
+    def test_async_write_after_a_delete_by_another_worker_reprovisions(self):
+        self.request("get", "address-list-create")
+        self.delete_elsewhere()
+
+        request = RequestFactory(HTTP_AUTHORIZATION="Bearer identity").post(
+            "/profiles/addresses/", orjson.dumps(self.ADDRESS), content_type="application/json"
+        )
+        response = async_to_sync(async_views.AddressListCreateView.as_view())(request)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Address.objects.get().user_id, UserProfile.objects.get(person_id=PERSON_ID).pk)
+
+    def test_refresh_keeps_a_profile_that_still_exists(self):
+        self.request("get", "address-list-create")
+
+        with mock.patch.object(profile_ids, "profile_id", wraps=profile_ids.profile_id) as resolve:
+            self.assertIsNone(profile_ids.refresh(PERSON_ID, UserProfile.objects.get().pk))
+
+        resolve.assert_not_called()
+
+
+class ProfileBundleSectionsTests(TestCase):
+    """?sections= picks the parts of the bundle, each subset within the bundle's query budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = UserProfile.objects.create(person_id=PERSON_ID, email=caller(PERSON_ID)["email"])
+        Address.objects.create(user=cls.profile, address_type="home", line1="1 Main St", is_default=True)
+        add_cards(cls.profile, 2)
+
+    def setUp(self):
+        auth = mock.patch.object(views.auth_client, "get_user", return_value=caller(PERSON_ID))
+        auth.start()
+        self.addCleanup(auth.stop)
+        caches[views.profile_cache.alias].clear()
+        profile_ids.cache.clear()
+
+    def bundle(self, sections):
+        with track_queries() as log:
+            response = self.client.get(
+                reverse("profile-bundle"), {"sections": sections}, headers={"Authorization": "Bearer bundle"}
+            )
+        return response, log
+
+    def test_only_the_requested_sections_are_returned(self):
+        for sections, expected in (
+            ("profile", {"profile"}),
+            ("cards", {"cards"}),
+            (" addresses , cards,", {"addresses", "cards"}),
+            ("", {"profile", "addresses", "cards"}),
+        ):
+            with self.subTest(sections=sections):
+                response, log = self.bundle(sections)
+
+                self.assertEqual(response.status_code, 200, response.content)
+                data = orjson.loads(response.content)["data"]
+                self.assertEqual(set(data), expected)
+                if "cards" in expected:
+                    self.assertEqual(len(data["cards"]), 2)
+
+                violation = budget_violation("profile-bundle", "GET", log)
+                if violation:
+                    self.fail(violation)
+
+    def test_fewer_sections_take_fewer_queries(self):
+        _, full = self.bundle("profile,addresses,cards")
+        _, profile_only = self.bundle("profile")
+
+        # No prefetch of the sections left out
+        self.assertLess(len(profile_only.queries), len(full.queries))
+        self.assertEqual([sql for sql, _ in profile_only.queries if Card._meta.db_table in sql], [])
+
+    def test_unknown_section_is_rejected(self):
+        response, _ = self.bundle("profile,orders")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(orjson.loads(response.content)["success"])
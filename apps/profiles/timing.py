@@ -0,0 +1,85 @@
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+
+PHASES = ("auth", "db", "serialize", "render")
+
+# Shared no-op context manager: what timed() costs when timing is off
+NOT_TIMED = nullcontext()
+
+
+class RequestTimings:
+    """
+    Phase durations (seconds) and query count of the current request.
+    """
+
+    __slots__ = ("started", "durations", "queries")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total) -> str:
+        """Server-Timing header value (milliseconds), phases that took no time are left out."""
+        metrics = []
+        for phase, seconds in self.durations.items():
+            if not seconds:
+                continue
+            metric = f"{phase};dur={seconds * 1000:.2f}"
+            if phase == "db":
+                metric += f';desc="{self.queries} queries"'
+            metrics.append(metric)
+
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+# Set by ServerTimingMiddleware; copied into sync_to_async threads with the context
+current_timings = ContextVar("current_timings", default=None)
+
+
+class PhaseTimer:
+    __slots__ = ("timings", "phase", "started")
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.timings.durations[self.phase] += time.perf_counter() - self.started
+        return False
+
+
+def timed(phase):
+    """
+    Context manager adding the time spent in the block to `phase` of the
+    current request (a shared no-op outside timed requests).
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return NOT_TIMED
+    return PhaseTimer(timings, phase)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper: counts queries and their time in the "db" phase.
+    """
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.durations["db"] += time.perf_counter() - started
+        timings.queries += 1
@@ -0,0 +1,156 @@
+import base64
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .ttl_cache import MISSING, TTLCache
+
+
+# Marker stored for tokens AUTH_MS rejected with 401
+INVALID = "__invalid__"
+
+
+class TokenCache:
+    """
+    Caches AUTH_MS user lookups per access token.
+    Responsible for:
+    - Keying entries by a hash of the token (raw tokens are never stored)
+    - Never keeping an entry past the token's `exp`
+    - Remembering rejected tokens for a short negative TTL
+    - Optionally sharing entries across workers through a Django cache alias
+    """
+
+    KEY_PREFIX = "authms:user:"
+
+    def __init__(self, maxsize=10000, ttl=60, negative_ttl=10, shared_alias=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = TTLCache(maxsize=maxsize)
+        self.shared = caches[shared_alias] if shared_alias else None
+
+        self.shared_hits = 0
+        self.negative_hits = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str):
+        """
+        Returns cached user data, INVALID for known-bad tokens, or None on a miss.
+        """
+        key = self.key(token)
+
+        value = self.local.get(key)
+        if value is MISSING and self.shared is not None:
+            value = self._from_shared(key, self.shared.get(self.KEY_PREFIX + key))
+
+        return self._result(value)
+
+    async def aget(self, token: str):
+        key = self.key(token)
+
+        value = self.local.get(key)
+        if value is MISSING and self.shared is not None:
+            value = self._from_shared(key, await self.shared.aget(self.KEY_PREFIX + key))
+
+        return self._result(value)
+
+    def set(self, token: str, data: dict):
+        self._store(token, data, self._ttl_for(token, self.ttl))
+
+    def set_invalid(self, token: str):
+        # A rejected token stays rejected, no need to cap by `exp`
+        self._store(token, INVALID, self.negative_ttl)
+
+    async def aset(self, token: str, data: dict):
+        await self._astore(token, data, self._ttl_for(token, self.ttl))
+
+    async def aset_invalid(self, token: str):
+        await self._astore(token, INVALID, self.negative_ttl)
+
+    def stats(self) -> dict:
+        return {
+            **self.local.stats(),
+            "shared_hits": self.shared_hits,
+            "negative_hits": self.negative_hits,
+        }
+
+    def _from_shared(self, key, entry):
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        # Shared entries carry wall-clock expiry, re-arm the local copy
+        self.local.set(key, value, expires_at - time.time())
+        self.shared_hits += 1
+        return value
+
+    def _result(self, value):
+        if value is MISSING:
+            return None
+
+        if value == INVALID:
+            self.negative_hits += 1
+
+        return value
+
+    def _store(self, token, value, ttl):
+        if ttl <= 0:
+            return
+
+        key = self.key(token)
+        self.local.set(key, value, ttl)
+
+        if self.shared is not None:
+            self.shared.set(self.KEY_PREFIX + key, (time.time() + ttl, value), timeout=ttl)
+
+    async def _astore(self, token, value, ttl):
+        if ttl <= 0:
+            return
+
+        key = self.key(token)
+        self.local.set(key, value, ttl)
+
+        if self.shared is not None:
+            await self.shared.aset(
+                self.KEY_PREFIX + key, (time.time() + ttl, value), timeout=ttl
+            )
+
+    @staticmethod
+    def _ttl_for(token, ttl):
+        # Signature is checked by AUTH_MS (or the local verifier), here we only
+        # need `exp` so the entry never outlives the token itself. Read without
+        # PyJWT, which remote verification then never imports (cold start).
+        try:
+            payload = token.split(".")[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (IndexError, ValueError):
+            return ttl
+
+        exp = claims.get("exp") if isinstance(claims, dict) else None
+        if not isinstance(exp, (int, float)):
+            return ttl
+
+        return min(ttl, exp - time.time())
+
+
+def build_token_cache():
+    """
+    Builds the token cache from AUTH_CACHE_* settings.
+
+    Returns:
+        TokenCache | None: None when caching is disabled (TTL of 0)
+    """
+    if settings.AUTH_CACHE_TTL <= 0:
+        return None
+
+    return TokenCache(
+        maxsize=settings.AUTH_CACHE_MAX_ENTRIES,
+        ttl=settings.AUTH_CACHE_TTL,
+        negative_ttl=settings.AUTH_CACHE_NEGATIVE_TTL,
+        shared_alias=settings.AUTH_CACHE_ALIAS or None,
+    )
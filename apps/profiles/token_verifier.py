@@ -0,0 +1,262 @@
+import threading
+import time
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .auth_client import InvalidTokenError
+
+
+class TokenVerificationError(InvalidTokenError):
+    """Raised when a token is definitively invalid (bad signature, expired, wrong audience)"""
+    pass
+
+
+class VerificationUnavailable(Exception):
+    """Raised when a token cannot be verified locally and AUTH_MS has to decide"""
+    pass
+
+
+class SigningKeySet:
+    """
+    Cached signing keys used to verify AUTH_MS tokens.
+    Responsible for:
+    - Serving a static key (shared secret or PEM public key)
+    - Fetching a JWKS document and refreshing it in the background
+    """
+
+    # Minimum gap between on-demand refreshes triggered by unknown `kid`s
+    MIN_REFRESH_GAP = 30
+
+    def __init__(self, signing_key=None, jwks_url=None, refresh_interval=300):
+        self.signing_key = signing_key
+        self.jwks_url = jwks_url
+        self.refresh_interval = refresh_interval
+
+        self._keys = {}
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    def get_key(self, kid=None):
+        """
+        Returns the key to verify a token signed with `kid`.
+
+        Raises:
+            VerificationUnavailable: When no matching key is known
+        """
+        if not self.jwks_url:
+            return self.signing_key
+
+        self._ensure_refresher()
+
+        key = self._lookup(kid)
+        if key is None and self._claim_refresh():
+            self.refresh()
+            key = self._lookup(kid)
+
+        return self._found(key, kid)
+
+    async def aget_key(self, kid=None):
+        """Async version of get_key, the JWKS fetch runs in a worker thread."""
+        if not self.jwks_url:
+            return self.signing_key
+
+        self._ensure_refresher()
+
+        key = self._lookup(kid)
+        if key is None and self._claim_refresh():
+            await sync_to_async(self.refresh, thread_sensitive=False)()
+            key = self._lookup(kid)
+
+        return self._found(key, kid)
+
+    def refresh(self):
+        """
+        Fetches the JWKS document, keeping the previous keys on failure.
+        The fetch runs without the lock, only the swap of the keys takes it.
+        """
+        import jwt
+
+        try:
+            response = requests.get(self.jwks_url, timeout=5)
+            response.raise_for_status()
+            jwk_set = jwt.PyJWKSet.from_dict(response.json())
+        except (requests.exceptions.RequestException, ValueError, jwt.PyJWKSetError):
+            return False
+        finally:
+            self._last_refresh = time.monotonic()
+
+        keys = {jwk.key_id: jwk.key for jwk in jwk_set.keys}
+        with self._lock:
+            self._keys = keys
+        return True
+
+    def _claim_refresh(self) -> bool:
+        # Unknown kid usually means AUTH_MS rotated its keys: one caller per
+        # MIN_REFRESH_GAP refreshes, the others fall back to AUTH_MS meanwhile
+        with self._lock:
+            if time.monotonic() - self._last_refresh < self.MIN_REFRESH_GAP:
+                return False
+            self._last_refresh = time.monotonic()
+            return True
+
+    @staticmethod
+    def _found(key, kid):
+        if key is None:
+            raise VerificationUnavailable(f"No signing key available for kid={kid!r}.")
+        return key
+
+    def _lookup(self, kid):
+        keys = self._keys
+        if kid is None and len(keys) == 1:
+            return next(iter(keys.values()))
+        return keys.get(kid)
+
+    def _ensure_refresher(self):
+        # Started lazily so every gunicorn worker gets its own thread after fork
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(
+                target=self._refresh_forever, name="jwks-refresher", daemon=True
+            )
+            self._refresher.start()
+
+    def _refresh_forever(self):
+        while True:
+            self.refresh()
+            time.sleep(self.refresh_interval)
+
+
+class LocalTokenVerifier:
+    """
+    Verifies AUTH_MS access tokens in-process.
+    Responsible for:
+    - Checking signature, expiry, audience and issuer
+    - Reading person_id / email from the token claims
+    """
+
+    def __init__(self, key_set, algorithms, audience=None, issuer=None,
+                 leeway=0, person_id_claim="person_id", email_claim="email"):
+        self.key_set = key_set
+        self.algorithms = algorithms
+        self.audience = audience
+        self.issuer = issuer
+        self.leeway = leeway
+        self.person_id_claim = person_id_claim
+        self.email_claim = email_claim
+
+    def verify(self, token: str) -> dict:
+        """
+        Verifies `token` and returns the same user data shape as AUTH_MS `/me/`.
+
+        Args:
+            token (str): JWT access token
+
+        Returns:
+            dict: Authenticated user data
+
+        Raises:
+            TokenVerificationError: For invalid or expired tokens
+            VerificationUnavailable: When AUTH_MS has to be asked instead
+        """
+        header = self._header(token)
+        return self._decode(token, self.key_set.get_key(header.get("kid")))
+
+    async def averify(self, token: str) -> dict:
+        """Async version of verify: a JWKS refresh never blocks the event loop."""
+        header = self._header(token)
+        return self._decode(token, await self.key_set.aget_key(header.get("kid")))
+
+    def _header(self, token):
+        # Imported on first use: remote mode (the default) never loads PyJWT
+        import jwt
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except jwt.InvalidTokenError:
+            raise TokenVerificationError("Malformed token.")
+
+        if header.get("alg") not in self.algorithms:
+            raise TokenVerificationError("Token signed with an unexpected algorithm.")
+        return header
+
+    def _decode(self, token, key):
+        import jwt
+
+        try:
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.leeway,
+                options={"require": ["exp"], "verify_aud": bool(self.audience)},
+            )
+        except jwt.ExpiredSignatureError:
+            raise TokenVerificationError("Invalid or expired token.")
+        except jwt.InvalidTokenError as e:
+            raise TokenVerificationError(f"Invalid token: {e}")
+
+        # simplejwt issues refresh tokens with the same key
+        if claims.get("token_type", "access") != "access":
+            raise TokenVerificationError("Not an access token.")
+
+        person_id = claims.get(self.person_id_claim)
+        email = claims.get(self.email_claim)
+
+        # Valid token without identity claims: let AUTH_MS fill them in
+        if not person_id or not email:
+            raise VerificationUnavailable("Token does not carry person_id/email claims.")
+
+        return {
+            "person_id": person_id,
+            "email": email,
+            "username": claims.get("username"),
+        }
+
+
+def build_token_verifier():
+    """
+    Builds the verifier selected by AUTH_VERIFICATION_MODE.
+
+    Returns:
+        LocalTokenVerifier | None: None when every token goes to AUTH_MS
+    """
+    mode = settings.AUTH_VERIFICATION_MODE
+
+    if mode == "remote":
+        return None
+
+    if mode != "local":
+        raise ImproperlyConfigured(
+            f"AUTH_VERIFICATION_MODE must be 'remote' or 'local', got {mode!r}."
+        )
+
+    if not settings.AUTH_JWT_SIGNING_KEY and not settings.AUTH_JWT_JWKS_URL:
+        raise ImproperlyConfigured(
+            "Local token verification needs AUTH_JWT_SIGNING_KEY or AUTH_JWT_JWKS_URL."
+        )
+
+    key_set = SigningKeySet(
+        signing_key=settings.AUTH_JWT_SIGNING_KEY,
+        jwks_url=settings.AUTH_JWT_JWKS_URL,
+        refresh_interval=settings.AUTH_JWT_JWKS_REFRESH_INTERVAL,
+    )
+
+    return LocalTokenVerifier(
+        key_set,
+        algorithms=settings.AUTH_JWT_ALGORITHMS,
+        audience=settings.AUTH_JWT_AUDIENCE,
+        issuer=settings.AUTH_JWT_ISSUER,
+        leeway=settings.AUTH_JWT_LEEWAY,
+        person_id_claim=settings.AUTH_JWT_PERSON_ID_CLAIM,
+        email_claim=settings.AUTH_JWT_EMAIL_CLAIM,
+    )
@@ -1,35 +1,91 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     HealthCheckView,
+    AuthStatusView,
+    CacheStatusView,
+    DatabaseStatusView,
+    MetricsView,
     TestAuthView,
     UserProfileView,
+    ProfileBundleView,
     AddressListCreateView,
     AddressDetailView,
+    AddressBulkView,
+    AddressDefaultView,
+    SetDefaultAddressView,
     CardListCreateView,
-    CardDetailView
+    CardDetailView,
+    CardBulkView,
+    CardDefaultView,
+    SetDefaultCardView,
+    InternalProfileBatchView,
+    ProfileExportView,
+    ProfileSearchView
 )
 
+# ASGI deployments serve the I/O-bound views as coroutines
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        TestAuthView,
+        UserProfileView,
+        ProfileBundleView,
+        AddressListCreateView,
+        AddressDetailView,
+        AddressBulkView,
+        AddressDefaultView,
+        SetDefaultAddressView,
+        CardListCreateView,
+        CardDetailView,
+        CardBulkView,
+        CardDefaultView,
+        SetDefaultCardView,
+        InternalProfileBatchView
+    )
+
 urlpatterns = [
     # ----------------------
     # Health & Test
     # ----------------------
     path("health/", HealthCheckView.as_view(), name="health-check"),
+    path("health/auth/", AuthStatusView.as_view(), name="health-auth"),
+    path("health/db/", DatabaseStatusView.as_view(), name="health-db"),
+    path("health/cache/", CacheStatusView.as_view(), name="health-cache"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
     path("test-auth/", TestAuthView.as_view(), name="test-auth"),
 
     # ----------------------
     # UserProfile
     # ----------------------
     path("profile/", UserProfileView.as_view(), name="user-profile"),
+    path("profile/bundle/", ProfileBundleView.as_view(), name="profile-bundle"),
 
     # ----------------------
     # Address CRUD
     # ----------------------
     path("addresses/", AddressListCreateView.as_view(), name="address-list-create"),
+    path("addresses/bulk/", AddressBulkView.as_view(), name="address-bulk"),
+    path("addresses/default/", AddressDefaultView.as_view(), name="address-default"),
     path("addresses/<int:pk>/", AddressDetailView.as_view(), name="address-detail"),
+    path("addresses/<int:pk>/default/", SetDefaultAddressView.as_view(), name="address-set-default"),
 
     # ----------------------
     # Card CRUD
     # ----------------------
     path("cards/", CardListCreateView.as_view(), name="card-list-create"),
+    path("cards/bulk/", CardBulkView.as_view(), name="card-bulk"),
+    path("cards/default/", CardDefaultView.as_view(), name="card-default"),
     path("cards/<int:pk>/", CardDetailView.as_view(), name="card-detail"),
+    path("cards/<int:pk>/default/", SetDefaultCardView.as_view(), name="card-set-default"),
+
+    # ----------------------
+    # Internal (service-to-service)
+    # ----------------------
+    path("internal/profiles/batch/", InternalProfileBatchView.as_view(), name="internal-profile-batch"),
+
+    # ----------------------
+    # Admin
+    # ----------------------
+    path("admin/export/", ProfileExportView.as_view(), name="profile-export"),
+    path("admin/search/", ProfileSearchView.as_view(), name="profile-search"),
 ]
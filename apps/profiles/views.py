@@ -1,36 +1,83 @@
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import NotAuthenticated, ValidationError
-
-from .auth_client import AuthClient, AuthClientError
-from .models import UserProfile, Address, Card
+from rest_framework.permissions import IsAdminUser
+
+from .auth_client import AuthClient, AuthClientError, AuthServiceUnavailable
+from .bulk import AddressBulkOperation, CardBulkOperation, payload_list
+from .conditional import (
+    collection_validators,
+    combine_validators,
+    evaluate_preconditions,
+    object_validators,
+    profile_validators,
+    with_validators,
+)
+from .exceptions import ServiceUnavailable
+from .export import EXPORT_FORMATS, aiterate, export_chunks
+from .fast_serializers import address_values, card_values
+from .identity import STALE_PROFILE_ERRORS, profile_ids
+from .internal import (
+    NDJSON_CONTENT_TYPE,
+    authenticate_service,
+    batch_chunks,
+    batch_lines,
+    parse_batch_request,
+)
+from .metrics import PROMETHEUS_CONTENT_TYPE, request_metrics
+from .models import UserProfile, Address, Card, CardLimitExceeded
+from .read_cache import profile_cache
+from .renderers import pre_encoded
+from .routers import bind_person, replicas
+from .search import parse_search_request, search_profiles
 from .serializers import (
     UserProfileSerializer,
     AddressSerializer,
     CardSerializer
 )
+from .sharding import shards
+from .timing import timed
+from .token_cache import build_token_cache
+from .token_verifier import (
+    build_token_verifier,
+    TokenVerificationError,
+    VerificationUnavailable,
+)
 
-auth_client = AuthClient()
+# One client per worker, shared with the async views when they are enabled
+if settings.ASYNC_VIEWS:
+    from .async_auth_client import AsyncAuthClient
+    auth_client = AsyncAuthClient(cache=build_token_cache())
+else:
+    auth_client = AuthClient(cache=build_token_cache())
+token_verifier = build_token_verifier()
 
 
 # ------------------------------------------------------------------
 # Success Response Helper (MANDATORY FORMAT)
 # ------------------------------------------------------------------
 def success_response(data, status_code=status.HTTP_200_OK):
-    return Response(
-        {
-            "success": True,
-            "data": data
-        },
-        status=status_code
-    )
+    return Response({"success": True, "data": data}, status=status_code)
 
 
 # ------------------------------------------------------------------
 # Authentication Helper
 # ------------------------------------------------------------------
+AUTH_UNAVAILABLE_MESSAGE = "Authentication service is temporarily unavailable. Please try again shortly."
+
+
 def get_authenticated_user(request):
+    user_data = verify_bearer_token(request)
+    # Replica reads of a person that just wrote go to the primary instead
+    bind_person(user_data.get("person_id") or user_data.get("id"))
+    return user_data
+
+
+def verify_bearer_token(request):
     auth_header = request.headers.get("Authorization")
 
     if not auth_header or not auth_header.startswith("Bearer "):
@@ -38,21 +85,117 @@ def get_authenticated_user(request):
 
     token = auth_header.split(" ")[1]
 
-    try:
-        return auth_client.get_user(token)
-    except AuthClientError:
-        raise NotAuthenticated("Invalid or expired token.")
+    with timed("auth"):
+        # Local mode: verify in-process, only ask AUTH_MS when undecidable
+        if token_verifier is not None:
+            try:
+                return token_verifier.verify(token)
+            except TokenVerificationError:
+                raise NotAuthenticated("Invalid or expired token.")
+            except VerificationUnavailable:
+                pass
+
+        try:
+            return auth_client.get_user(token)
+        except AuthServiceUnavailable:
+            raise ServiceUnavailable(
+                AUTH_UNAVAILABLE_MESSAGE, retry_after=auth_client.breaker.retry_after()
+            )
+        except AuthClientError:
+            raise NotAuthenticated("Invalid or expired token.")
 
 
 # ------------------------------------------------------------------
 # Health Check
 # ------------------------------------------------------------------
+HEALTH_RESPONSE = pre_encoded({"success": True, "data": {"status": "Profile_MS is running"}})
+
+
 class HealthCheckView(APIView):
 
     def get(self, request):
-        return success_response(
-            {"status": "Profile_MS is running"}
-        )
+        return Response(HEALTH_RESPONSE)
+
+
+class AuthStatusView(APIView):
+    """
+    Monitoring view for the AUTH_MS client (circuit breaker, token cache counters).
+    """
+
+    def get(self, request):
+        cache = auth_client.cache
+
+        return success_response({
+            "verification_mode": "local" if token_verifier else "remote",
+            "circuit_breaker": auth_client.breaker.snapshot(),
+            "token_cache": {
+                **cache.stats(),
+                "coalesced": auth_client.coalesced,
+            } if cache else None,
+        })
+
+
+class CacheStatusView(APIView):
+    """
+    Monitoring view for the profile read cache (hit ratio, invalidations).
+    """
+
+    def get(self, request):
+        return success_response({
+            **profile_cache.stats(),
+            "profile_ids": profile_ids.stats(),
+        })
+
+
+class DatabaseStatusView(APIView):
+    """
+    Monitoring view for database connection reuse (pool statistics), the
+    replication lag of the read replicas and the shard ring.
+    """
+
+    def get(self, request):
+        pool = getattr(connection, "pool", None)
+        topology = {
+            "replicas": replicas.stats() if replicas.aliases else None,
+            "shards": shards.stats() if shards.sharded else None,
+        }
+
+        if pool is None:
+            return success_response({"mode": settings.DB_CONN_MODE, "pool": None, **topology})
+
+        stats = pool.get_stats()
+        checkouts = stats.get("requests_num", 0)
+        wait_ms = stats.get("requests_wait_ms", 0)
+
+        return success_response({
+            "mode": settings.DB_CONN_MODE,
+            "pool": {
+                "min_size": pool.min_size,
+                "max_size": pool.max_size,
+                "size": stats.get("pool_size", 0),
+                "available": stats.get("pool_available", 0),
+                "waiting": stats.get("requests_waiting", 0),
+                "checkouts": checkouts,
+                "queued_checkouts": stats.get("requests_queued", 0),
+                "wait_ms_total": wait_ms,
+                "wait_ms_avg": round(wait_ms / checkouts, 3) if checkouts else 0.0,
+                "checkout_errors": stats.get("requests_errors", 0),
+                "bad_returns": stats.get("returns_bad", 0),
+                "connections_opened": stats.get("connections_num", 0),
+                "connections_lost": stats.get("connections_lost", 0),
+            },
+            **topology,
+        })
+
+
+class MetricsView(APIView):
+    """
+    Prometheus scrape endpoint: per-route phase histograms of this worker
+    (empty unless REQUEST_TIMING_ENABLED).
+    """
+
+    def get(self, request):
+        return HttpResponse(request_metrics.exposition(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 
 # ------------------------------------------------------------------
@@ -84,14 +227,21 @@ class UserProfileView(APIView):
         if not person_id:
             raise ValidationError("person_id missing from Auth MS response.")
 
-        profile, _ = UserProfile.objects.get_or_create(
-            person_id=person_id,
-            defaults={"email": email}
-        )
+        validators = section_validators(person_id, "profile")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
 
-        return success_response(
-            UserProfileSerializer(profile).data
-        )
+        def load():
+            profile, _ = UserProfile.objects.resolve(person_id, email)
+            return UserProfileSerializer(profile).data
+
+        payload = profile_cache.get_or_set(person_id, "profile", load)
+        if validators is None:
+            # Profile was provisioned by this request
+            validators = section_validators(person_id, "profile")
+
+        return with_validators(success_response(payload), validators)
 
     def put(self, request):
         user_data = get_authenticated_user(request)
@@ -102,10 +252,8 @@ class UserProfileView(APIView):
         if not person_id:
             raise ValidationError("person_id missing from Auth MS response.")
 
-        profile, _ = UserProfile.objects.get_or_create(
-            person_id=person_id,
-            defaults={"email": email}
-        )
+        profile, _ = UserProfile.objects.resolve(person_id, email)
+        evaluate_preconditions(request, object_validators(profile))
 
         data = request.data.copy()
         data.pop("email", None)
@@ -115,29 +263,202 @@ class UserProfileView(APIView):
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return success_response(serializer.data)
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(profile)
+        )
 
 
 # ------------------------------------------------------------------
-# Address Management
+# Profile Bundle (profile + addresses + cards in one round trip)
 # ------------------------------------------------------------------
-class AddressListCreateView(APIView):
+BUNDLE_SECTIONS = ("profile", "addresses", "cards")
+
+
+def parse_bundle_sections(raw):
+    if not raw:
+        return BUNDLE_SECTIONS
+
+    sections = [section.strip() for section in raw.split(",") if section.strip()]
+    unknown = sorted(set(sections) - set(BUNDLE_SECTIONS))
+
+    if unknown:
+        raise ValidationError(f"Unknown section(s): {', '.join(unknown)}.")
+
+    return tuple(section for section in BUNDLE_SECTIONS if section in sections)
+
+
+def bundle_queryset(person_id, sections):
+    # One query for the profile plus one per requested child section
+    related = [section for section in ("addresses", "cards") if section in sections]
+    return UserProfile.objects.filter(person_id=person_id).prefetch_related(*related)
+
+
+def serialize_bundle(profile, sections, created=False):
+    data = {}
+
+    if "profile" in sections:
+        data["profile"] = UserProfileSerializer(profile).data
+
+    # A profile provisioned by this request cannot have children yet
+    if "addresses" in sections:
+        data["addresses"] = [] if created else AddressSerializer(
+            profile.addresses.all(), many=True
+        ).data
+
+    if "cards" in sections:
+        data["cards"] = [] if created else CardSerializer(
+            profile.cards.all(), many=True
+        ).data
+
+    return data
+
+
+def section_queryset(person_id, section):
+    model = {"addresses": Address, "cards": Card}[section]
+    return model.objects.filter(user__person_id=person_id)
+
+
+def section_validators(person_id, section):
+    """
+    ETag / Last-Modified of one section, cached next to its payload.
+    """
+    def compute():
+        if section == "profile":
+            return profile_validators(person_id)
+        return collection_validators(section_queryset(person_id, section))
+
+    return profile_cache.get_or_set(person_id, f"{section}:validators", compute)
+
+
+class ProfileBundleView(APIView):
 
     def get(self, request):
         user_data = get_authenticated_user(request)
 
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        serializer = AddressSerializer(profile.addresses.all(), many=True)
+        person_id = user_data.get("person_id") or user_data.get("id")
+        email = user_data.get("email")
 
-        return success_response(serializer.data)
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        sections = parse_bundle_sections(request.query_params.get("sections"))
+
+        validators = combine_validators(
+            *(section_validators(person_id, section) for section in sections)
+        )
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        def load():
+            profile = bundle_queryset(person_id, sections).first()
+            created = False
+
+            if profile is None:
+                profile, created = UserProfile.objects.resolve(person_id, email)
+            else:
+                profile = UserProfile.objects.follow_email(profile, email)
+
+            return serialize_bundle(profile, sections, created=created)
+
+        return with_validators(
+            success_response(
+                profile_cache.get_or_set(person_id, "bundle:" + ",".join(sections), load)
+            ),
+            validators
+        )
+
+
+# ------------------------------------------------------------------
+# Caller Resolution (address / card views)
+# ------------------------------------------------------------------
+class ProfileScopedAPIView(APIView):
+    """
+    Base view of the address / card endpoints.
+    Authenticates the caller once per request and attaches:
+    - request.user_data: identity returned by AUTH_MS / the local verifier
+    - request.person_id, request.profile_id: the caller's profile, provisioned
+      on first sight and cached per worker, so children are filtered on
+      user_id without loading the profile
+    A write that fails because another worker deleted the cached profile runs
+    once more against the re-resolved one.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
 
-    def post(self, request):
         user_data = get_authenticated_user(request)
+        person_id = user_data.get("person_id") or user_data.get("id")
+
+        if not person_id:
+            raise ValidationError("person_id missing from Auth MS response.")
+
+        request.user_data = user_data
+        request.person_id = person_id
+        request.profile_id = profile_ids.profile_id(person_id, user_data.get("email"))
+
+    def handle_exception(self, exc):
+        request = self.request
+        if isinstance(exc, STALE_PROFILE_ERRORS) and hasattr(request, "profile_id"):
+            profile_id = profile_ids.refresh(
+                request.person_id, request.profile_id, request.user_data.get("email")
+            )
+            if profile_id is not None:
+                request.profile_id = profile_id
+                handler = getattr(self, request.method.lower())
+                try:
+                    return handler(request, *self.args, **self.kwargs)
+                except Exception as retry_exc:
+                    exc = retry_exc
+
+        return super().handle_exception(exc)
+
+
+# ------------------------------------------------------------------
+# Default Address / Card
+# ------------------------------------------------------------------
+def default_queryset(model, profile_id):
+    # At most one row, read from the partial unique index (no ORDER BY)
+    return model.objects.filter(user_id=profile_id, is_default=True).order_by()
+
+
+def set_default(obj, person_id):
+    """Makes `obj` the only default of the caller's addresses / cards."""
+    model = type(obj)
+    try:
+        model.objects.set_default(obj)
+    except model.DoesNotExist:
+        raise ValidationError(f"{model.__name__} not found.")
+
+    # update() sends no post_save, the cached sections are dropped here
+    profile_cache.invalidate(person_id)
+    return obj
+
+
+# ------------------------------------------------------------------
+# Address Management
+# ------------------------------------------------------------------
+class AddressListCreateView(ProfileScopedAPIView):
+
+    def get(self, request):
+        validators = section_validators(request.person_id, "addresses")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
+
+        def load():
+            return address_values.data(Address.objects.filter(user_id=request.profile_id))
 
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
+        return with_validators(
+            success_response(profile_cache.get_or_set(request.person_id, "addresses", load)),
+            validators
+        )
+
+    def post(self, request):
         serializer = AddressSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=profile)
+        serializer.save(user_id=request.profile_id)
 
         return success_response(
             serializer.data,
@@ -145,70 +466,110 @@ class AddressListCreateView(APIView):
         )
 
 
-class AddressDetailView(APIView):
+class AddressDetailView(ProfileScopedAPIView):
 
-    def get_object(self, pk, profile):
+    def get_object(self, request, pk):
         try:
-            return profile.addresses.get(pk=pk)
+            return Address.objects.get(pk=pk, user_id=request.profile_id)
         except Address.DoesNotExist:
             raise ValidationError("Address not found.")
 
     def get(self, request, pk):
-        user_data = get_authenticated_user(request)
+        address = self.get_object(request, pk)
 
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        address = self.get_object(pk, profile)
+        validators = object_validators(address)
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
 
-        return success_response(
-            AddressSerializer(address).data
+        return with_validators(
+            success_response(AddressSerializer(address).data),
+            validators
         )
 
     def put(self, request, pk):
-        user_data = get_authenticated_user(request)
-
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        address = self.get_object(pk, profile)
+        address = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
 
         serializer = AddressSerializer(address, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return success_response(serializer.data)
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(address)
+        )
 
     def delete(self, request, pk):
-        user_data = get_authenticated_user(request)
-
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        address = self.get_object(pk, profile)
+        address = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
         address.delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class AddressDefaultView(ProfileScopedAPIView):
+    """
+    GET the caller's default address, null when none is set.
+    """
+
+    def get(self, request):
+        def load():
+            return address_values.data(default_queryset(Address, request.profile_id))
+
+        rows = profile_cache.get_or_set(request.person_id, "default_address", load)
+        return success_response(rows[0] if rows else None)
+
+
+class SetDefaultAddressView(ProfileScopedAPIView):
+    """
+    PUT makes the address the caller's default (the previous one is unset).
+    """
+
+    def get_object(self, request, pk):
+        try:
+            return Address.objects.get(pk=pk, user_id=request.profile_id)
+        except Address.DoesNotExist:
+            raise ValidationError("Address not found.")
+
+    def put(self, request, pk):
+        address = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(address))
+        set_default(address, request.person_id)
+
+        return with_validators(
+            success_response(AddressSerializer(address).data),
+            object_validators(address)
+        )
+
+
 # ------------------------------------------------------------------
 # Card Management
 # ------------------------------------------------------------------
-class CardListCreateView(APIView):
+class CardListCreateView(ProfileScopedAPIView):
 
     def get(self, request):
-        user_data = get_authenticated_user(request)
+        validators = section_validators(request.person_id, "cards")
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
 
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        serializer = CardSerializer(profile.cards.all(), many=True)
+        def load():
+            return card_values.data(Card.objects.filter(user_id=request.profile_id))
 
-        return success_response(serializer.data)
+        return with_validators(
+            success_response(profile_cache.get_or_set(request.person_id, "cards", load)),
+            validators
+        )
 
     def post(self, request):
-        user_data = get_authenticated_user(request)
-
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-
-        if profile.cards.count() >= 4:
-            raise ValidationError("Maximum 4 cards allowed.")
-
         serializer = CardSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save(user=profile)
+
+        try:
+            serializer.save(user_id=request.profile_id)
+        except CardLimitExceeded:
+            raise ValidationError("Maximum 4 cards allowed.")
 
         return success_response(
             serializer.data,
@@ -216,41 +577,202 @@ class CardListCreateView(APIView):
         )
 
 
-class CardDetailView(APIView):
+class CardDetailView(ProfileScopedAPIView):
 
-    def get_object(self, pk, profile):
+    def get_object(self, request, pk):
         try:
-            return profile.cards.get(pk=pk)
+            return Card.objects.get(pk=pk, user_id=request.profile_id)
         except Card.DoesNotExist:
             raise ValidationError("Card not found.")
 
     def get(self, request, pk):
-        user_data = get_authenticated_user(request)
+        card = self.get_object(request, pk)
 
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        card = self.get_object(pk, profile)
+        validators = object_validators(card)
+        not_modified = evaluate_preconditions(request, validators)
+        if not_modified:
+            return not_modified
 
-        return success_response(
-            CardSerializer(card).data
+        return with_validators(
+            success_response(CardSerializer(card).data),
+            validators
         )
 
     def put(self, request, pk):
-        user_data = get_authenticated_user(request)
-
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        card = self.get_object(pk, profile)
+        card = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
 
         serializer = CardSerializer(card, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
 
-        return success_response(serializer.data)
+        return with_validators(
+            success_response(serializer.data),
+            object_validators(card)
+        )
 
     def delete(self, request, pk):
-        user_data = get_authenticated_user(request)
-
-        profile = UserProfile.objects.get(person_id=user_data["person_id"])
-        card = self.get_object(pk, profile)
+        card = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
         card.delete()
 
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CardDefaultView(ProfileScopedAPIView):
+    """
+    GET the caller's default card, null when none is set.
+    """
+
+    def get(self, request):
+        def load():
+            return card_values.data(default_queryset(Card, request.profile_id))
+
+        rows = profile_cache.get_or_set(request.person_id, "default_card", load)
+        return success_response(rows[0] if rows else None)
+
+
+class SetDefaultCardView(ProfileScopedAPIView):
+    """
+    PUT makes the card the caller's default (the previous one is unset).
+    """
+
+    def get_object(self, request, pk):
+        try:
+            return Card.objects.get(pk=pk, user_id=request.profile_id)
+        except Card.DoesNotExist:
+            raise ValidationError("Card not found.")
+
+    def put(self, request, pk):
+        card = self.get_object(request, pk)
+        evaluate_preconditions(request, object_validators(card))
+        set_default(card, request.person_id)
+
+        return with_validators(
+            success_response(CardSerializer(card).data),
+            object_validators(card)
+        )
+
+
+# ------------------------------------------------------------------
+# Bulk Address / Card Operations (one transaction per request)
+# ------------------------------------------------------------------
+class BulkView(ProfileScopedAPIView):
+    """
+    POST {"items": [...]} creates, PUT {"items": [{"id": ..., ...}]} updates
+    and DELETE {"ids": [...]} deletes; either every item is written or none.
+    """
+    operation_class = None
+
+    def get_operation(self, request):
+        return self.operation_class(request.profile_id, request.person_id)
+
+    def post(self, request):
+        operation = self.get_operation(request)
+
+        return success_response(
+            operation.create(payload_list(request.data, "items")),
+            status_code=status.HTTP_201_CREATED
+        )
+
+    def put(self, request):
+        operation = self.get_operation(request)
+
+        return success_response(
+            operation.update(payload_list(request.data, "items"))
+        )
+
+    def delete(self, request):
+        operation = self.get_operation(request)
+
+        return success_response(
+            operation.delete(payload_list(request.data, "ids"))
+        )
+
+
+class AddressBulkView(BulkView):
+    operation_class = AddressBulkOperation
+
+
+class CardBulkView(BulkView):
+    operation_class = CardBulkOperation
+
+
+# ------------------------------------------------------------------
+# Internal Service-to-Service API
+# ------------------------------------------------------------------
+class InternalProfileBatchView(APIView):
+    """
+    POST {"person_ids": [...], "include": ["default_address", "default_card"]}
+    Streams one NDJSON line per person_id, chunk by chunk (X-Service-Token auth).
+    """
+
+    def post(self, request):
+        authenticate_service(request)
+        person_ids, include = parse_batch_request(request.data)
+
+        return StreamingHttpResponse(
+            (batch_lines(chunk, include) for chunk in batch_chunks(person_ids)),
+            content_type=NDJSON_CONTENT_TYPE
+        )
+
+
+# ------------------------------------------------------------------
+# Admin Export (analytics)
+# ------------------------------------------------------------------
+class ProfileExportView(APIView):
+    """
+    Streams every profile with its addresses and cards, staff users only.
+    Query params: output=ndjson|csv, after=<person_id watermark>, gzip=1
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        fmt = request.query_params.get("output", "ndjson")
+        if fmt not in EXPORT_FORMATS:
+            raise ValidationError(f"output must be one of: {', '.join(EXPORT_FORMATS)}.")
+
+        after = request.query_params.get("after")
+        if after is not None:
+            try:
+                after = int(after)
+            except ValueError:
+                raise ValidationError("after must be a person_id.")
+
+        compress = request.query_params.get("gzip") in ("1", "true")
+        chunks = export_chunks(fmt, after=after, compress=compress)
+
+        # Under ASGI a sync iterator would be buffered whole before sending
+        if settings.ASYNC_VIEWS:
+            chunks = aiterate(chunks)
+
+        filename = f"profiles.{fmt}" + (".gz" if compress else "")
+        response = StreamingHttpResponse(
+            chunks,
+            content_type="application/gzip" if compress else EXPORT_FORMATS[fmt]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+# ------------------------------------------------------------------
+# Admin Search (support)
+# ------------------------------------------------------------------
+class ProfileSearchView(APIView):
+    """
+    Finds profiles by email, name or phone prefix (plus trigram similarity
+    on PostgreSQL), staff users only.
+    Query params: q, limit (default 20, max 100), cursor (next_cursor of the previous page)
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        query, limit, after = parse_search_request(request.query_params)
+        profiles, next_cursor, estimated_count = search_profiles(query, limit=limit, after=after)
+
+        return success_response({
+            "results": UserProfileSerializer(profiles, many=True).data,
+            "next_cursor": next_cursor,
+            # Planner estimate of all matches, not an exact COUNT(*)
+            "estimated_count": estimated_count,
+        })
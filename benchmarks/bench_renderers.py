@@ -0,0 +1,111 @@
+"""
+Response rendering benchmark: DRF JSONRenderer on {"success": true, "data": ...}
+vs ORJSONRenderer on the same dict, for realistic profile bundles.
+
+Bundles (profile + 4 addresses + 4 cards) are built with the real serializers
+from in-memory instances, so no database is needed. Both renderers must
+produce byte-identical output before anything is timed.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_renderers.py [--bundles 1000] [--repeat 5]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "profile_ms.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from apps.profiles.models import UserProfile, Address, Card  # noqa: E402
+from apps.profiles.renderers import ORJSONRenderer  # noqa: E402
+from apps.profiles.serializers import (  # noqa: E402
+    UserProfileSerializer,
+    AddressSerializer,
+    CardSerializer,
+)
+
+
+def build_bundle(i):
+    now = timezone.now()
+    profile = UserProfile(
+        pk=i, person_id=i, email=f"user{i}@example.com", alternate_email=f"alt{i}@example.com",
+        primary_phone="9876543210", first_name="Aarav", last_name="Sharma — ü",
+        date_of_birth=datetime.date(1990, 1, 2), gender="M",
+    )
+
+    addresses = []
+    for n, (address_type, _) in enumerate(Address.ADDRESS_TYPE_CHOICES):
+        addresses.append(Address(
+            pk=i * 10 + n, user=profile, address_type=address_type, line1="221B Baker Street",
+            line2="Near the station", zip_code="400001", phone_number="9876543210",
+            is_default=n == 0, created_at=now, updated_at=now,
+        ))
+
+    cards = []
+    for n, brand in enumerate(("visa", "mastercard", "amex", "discover")):
+        cards.append(Card(
+            pk=i * 10 + n, user=profile, card_type="credit", card_brand=brand,
+            card_number="4111111111111111", card_holder_name="Aarav Sharma",
+            expiry_month=12, expiry_year=2030, is_default=n == 0,
+            created_at=now, updated_at=now,
+        ))
+
+    return {
+        "profile": UserProfileSerializer(profile).data,
+        "addresses": AddressSerializer(addresses, many=True).data,
+        "cards": CardSerializer(cards, many=True).data,
+    }
+
+
+def timed(render, bundles, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for bundle in bundles:
+            render(bundle)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bundles", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    bundles = [build_bundle(i) for i in range(1, args.bundles + 1)]
+
+    drf = JSONRenderer()
+    fast = ORJSONRenderer()
+
+    def drf_render(bundle):
+        return drf.render({"success": True, "data": bundle})
+
+    def fast_render(bundle):
+        return fast.render({"success": True, "data": bundle})
+
+    for bundle in bundles:
+        if drf_render(bundle) != fast_render(bundle):
+            sys.exit("Rendered bundles differ.")
+
+    size = len(fast_render(bundles[0]))
+    baseline = timed(drf_render, bundles, args.repeat)
+    optimized = timed(fast_render, bundles, args.repeat)
+
+    print(f"{args.bundles} bundles of {size} bytes, best of {args.repeat}, per render:")
+    print(f"  JSONRenderer   {baseline / args.bundles * 1e6:8.1f} us")
+    print(f"  ORJSONRenderer {optimized / args.bundles * 1e6:8.1f} us   x{baseline / optimized:.2f}")
+
+
+if __name__ == "__main__":
+    main()
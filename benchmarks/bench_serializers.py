@@ -0,0 +1,122 @@
+"""
+Read-path serialization benchmark: ModelSerializer(many=True) vs ValuesSerializer.
+
+Seeds profiles with 4 addresses and 4 cards each inside a transaction that is
+rolled back at the end, checks that both paths render byte-identical JSON, then
+times the list GET load (query + serialization) of each.
+
+Usage (from the repository root, against the configured database):
+
+    python benchmarks/bench_serializers.py [--profiles 200] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "profile_ms.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import transaction  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from apps.profiles.fast_serializers import address_values, card_values  # noqa: E402
+from apps.profiles.models import UserProfile, Address, Card  # noqa: E402
+from apps.profiles.serializers import AddressSerializer, CardSerializer  # noqa: E402
+
+BENCH_PERSON_ID_BASE = 900_000_000
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed(count):
+    profiles = UserProfile.objects.bulk_create([
+        UserProfile(
+            person_id=BENCH_PERSON_ID_BASE + i,
+            email=f"bench{i}@example.com",
+            first_name="Bench",
+            card_count=4,
+        )
+        for i in range(count)
+    ])
+
+    addresses, cards = [], []
+    for profile in profiles:
+        for address_type, _ in Address.ADDRESS_TYPE_CHOICES:
+            addresses.append(Address(
+                user=profile, address_type=address_type, line1="221B Baker Street",
+                zip_code="400001", phone_number="9876543210",
+                is_default=address_type == "home",
+            ))
+        for brand in ("visa", "mastercard", "amex", "discover"):
+            cards.append(Card(
+                user=profile, card_type="credit", card_brand=brand,
+                card_number="4111111111111111", card_holder_name="Bench User",
+                expiry_month=12, expiry_year=2030, is_default=brand == "visa",
+            ))
+
+    Address.objects.bulk_create(addresses)
+    Card.objects.bulk_create(cards)
+    return [profile.pk for profile in profiles]
+
+
+def timed(load, profile_ids, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for profile_id in profile_ids:
+            load(profile_id)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profiles", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    renderer = JSONRenderer()
+    cases = (
+        ("addresses", Address, AddressSerializer, address_values),
+        ("cards", Card, CardSerializer, card_values),
+    )
+
+    try:
+        with transaction.atomic():
+            profile_ids = seed(args.profiles)
+
+            print(f"{args.profiles} profiles, best of {args.repeat}, per list GET load:")
+            for name, model, serializer_class, values_serializer in cases:
+                def model_path(profile_id):
+                    return serializer_class(model.objects.filter(user_id=profile_id), many=True).data
+
+                def values_path(profile_id):
+                    return values_serializer.data(model.objects.filter(user_id=profile_id))
+
+                for profile_id in profile_ids:
+                    expected = renderer.render(model_path(profile_id))
+                    if renderer.render(values_path(profile_id)) != expected:
+                        sys.exit(f"{name}: output differs for profile {profile_id}.")
+
+                baseline = timed(model_path, profile_ids, args.repeat)
+                fast = timed(values_path, profile_ids, args.repeat)
+                print(
+                    f"  {name:<10} ModelSerializer {baseline / len(profile_ids) * 1e6:8.1f} us"
+                    f"   ValuesSerializer {fast / len(profile_ids) * 1e6:8.1f} us"
+                    f"   x{baseline / fast:.2f}"
+                )
+
+            raise Rollback
+    except Rollback:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Cold start benchmark: the default settings vs the lean runtime (LEAN_RUNTIME=True).
+
+Every run is a fresh interpreter that builds the WSGI / ASGI application and
+serves one request in-process (no server, no socket), timing:
+- boot: interpreter start until the script runs
+- setup: settings, app registry and middleware (get_wsgi_application)
+- first: the first request, which imports the URLconf, the views and their clients
+- warm: the same request again
+- ttfr: process start to the first response
+
+The request must not need the database or AUTH_MS (default: the health
+check). --importtime also lists the packages that take longest to import.
+
+Usage (from the repository root, with the service's environment / .env):
+
+    python benchmarks/bench_startup.py [--runs 10] [--server wsgi|asgi] [--path /profiles/health/]
+    python benchmarks/bench_startup.py --profiles lean --importtime 15
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROFILES = {
+    "default": {"LEAN_RUNTIME": "False"},
+    "lean": {"LEAN_RUNTIME": "True"},
+}
+PHASES = ("boot", "setup", "first", "warm", "ttfr")
+
+
+# ------------------------------------------------------------------
+# Child: one cold start
+# ------------------------------------------------------------------
+def request_host():
+    from django.conf import settings
+
+    return next((host for host in settings.ALLOWED_HOSTS if host and "*" not in host), "localhost")
+
+
+def wsgi_request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "wsgi.input": io.BytesIO()}
+    setup_testing_defaults(environ)
+    environ["HTTP_HOST"] = request_host()
+
+    status = []
+    body = b"".join(application(environ, lambda code, headers, exc_info=None: status.append(code)))
+    return int(status[0].split()[0]), body
+
+
+def asgi_request(application, path):
+    async def run():
+        messages = []
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "root_path": "", "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 80), "headers": [(b"host", request_host().encode())],
+        }
+
+        pending = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            if pending:
+                return pending.pop()
+            # The client never disconnects, Django cancels this once it responded
+            await asyncio.Future()
+
+        async def send(message):
+            messages.append(message)
+
+        await application(scope, receive, send)
+        start = next(message for message in messages if message["type"] == "http.response.start")
+        body = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body")
+        return start["status"], body
+
+    return asyncio.run(run())
+
+
+def child(server, path, started_at):
+    boot_end = time.perf_counter()
+    boot = time.time() - started_at
+
+    sys.path.insert(0, ROOT_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "profile_ms.settings")
+
+    if server == "asgi":
+        from django.core.asgi import get_asgi_application
+        application, send_request = get_asgi_application(), asgi_request
+    else:
+        from django.core.wsgi import get_wsgi_application
+        application, send_request = get_wsgi_application(), wsgi_request
+    setup_end = time.perf_counter()
+
+    status, body = send_request(application, path)
+    first_end = time.perf_counter()
+    ttfr = time.time() - started_at
+
+    send_request(application, path)
+    warm_end = time.perf_counter()
+
+    print(json.dumps({
+        "status": status,
+        "body": body[:200].decode(errors="replace"),
+        "modules": len(sys.modules),
+        "boot": boot,
+        "setup": setup_end - boot_end,
+        "first": first_end - setup_end,
+        "warm": warm_end - first_end,
+        "ttfr": ttfr,
+    }))
+
+
+# ------------------------------------------------------------------
+# Parent
+# ------------------------------------------------------------------
+def cold_start(profile, args, importtime=False):
+    env = {**os.environ, **PROFILES[profile]}
+    if args.server == "asgi":
+        # As asgi.py does for deployments
+        env.setdefault("ASYNC_VIEWS", "True")
+
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        os.path.abspath(__file__), "--child", "--server", args.server, "--path", args.path,
+        "--started-at", repr(time.time()),
+    ]
+    result = subprocess.run(command, env=env, cwd=ROOT_DIR, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"{profile} run failed:\n{result.stderr[-2000:]}")
+
+    run = json.loads(result.stdout.strip().splitlines()[-1])
+    if run["status"] >= 400:
+        sys.exit(f"{profile}: GET {args.path} answered {run['status']}: {run['body']}")
+    return run, result.stderr
+
+
+def slowest_packages(stderr, top):
+    """Self import time per top-level package, from -X importtime output."""
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--path", default="/profiles/health/")
+    parser.add_argument("--profiles", default=",".join(PROFILES), help="comma separated: default,lean")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="also list the N slowest packages to import, per profile")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--started-at", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.server, args.path, args.started_at)
+
+    profiles = [profile.strip() for profile in args.profiles.split(",") if profile.strip()]
+    unknown = set(profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"unknown profiles: {', '.join(sorted(unknown))}")
+
+    # Interleaved, so both profiles see the same machine noise (and disk cache)
+    runs = {profile: [] for profile in profiles}
+    cold_start(profiles[0], args)
+    for _ in range(args.runs):
+        for profile in profiles:
+            runs[profile].append(cold_start(profile, args)[0])
+
+    print(f"Cold start, {args.server.upper()}, GET {args.path}, {args.runs} runs (median ms, min in brackets)\n")
+    print(f"{'profile':<10}" + "".join(f"{phase:>16}" for phase in PHASES) + f"{'modules':>10}")
+    for profile in profiles:
+        cells = "".join(
+            f"{statistics.median(run[phase] for run in runs[profile]) * 1000:>9.1f} "
+            f"({min(run[phase] for run in runs[profile]) * 1000:>4.0f})"
+            for phase in PHASES
+        )
+        print(f"{profile:<10}{cells}{runs[profile][0]['modules']:>10}")
+
+    for profile in profiles if args.importtime else ():
+        _, stderr = cold_start(profile, args, importtime=True)
+        print(f"\nSlowest packages to import, {profile} (self time, ms)")
+        for package, micros in slowest_packages(stderr, args.importtime):
+            print(f"  {package:<30}{micros / 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
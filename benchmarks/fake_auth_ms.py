@@ -0,0 +1,154 @@
+"""
+Local AUTH_MS stand-in for benchmarks and load tests.
+
+Serves GET .../me/ for bearer tokens of the form "bench-<person_id>[-<nonce>]"
+(a nonce makes every token unique, so Profile_MS's token cache never hits),
+answers 401 for any other token, and can add latency and inject failures.
+
+Usage:
+
+    python benchmarks/fake_auth_ms.py --port 8765 --auth-latency-ms 20 --auth-error-rate 0.01
+
+then run Profile_MS with AUTH_MS_BASE_URL=http://127.0.0.1:8765/api/auth
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_PREFIX = "bench-"
+
+
+def bench_token(person_id, nonce=None) -> str:
+    token = f"{TOKEN_PREFIX}{person_id}"
+    return f"{token}-{nonce}" if nonce is not None else token
+
+
+def bench_email(person_id) -> str:
+    return f"bench{person_id}@example.com"
+
+
+class FakeAuthServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering AUTH_MS `/me/` lookups.
+    Responsible for:
+    - Resolving bench tokens to {"data": {"person_id", "email", "username"}}
+    - Simulated latency (fixed + uniform jitter)
+    - Error injection (5xx answers or stalled requests)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, stall_rate=0.0, stall_seconds=30.0):
+        super().__init__(address, FakeAuthHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "stalls": 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+
+class FakeAuthHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+
+        delay = server.latency + random.uniform(0, server.jitter)
+        if server.stall_rate and random.random() < server.stall_rate:
+            # Longer than the client timeout: exercises retries and the breaker
+            server.count("stalls")
+            delay = server.stall_seconds
+        if delay:
+            time.sleep(delay)
+
+        if not self.path.rstrip("/").endswith("/me"):
+            return self.reply(404, {"detail": "Not found."})
+
+        if server.error_rate and random.random() < server.error_rate:
+            server.count("errors")
+            return self.reply(server.error_status, {"detail": "Injected failure."})
+
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not token.startswith(TOKEN_PREFIX):
+            return self.reply(401, {"detail": "Invalid token."})
+
+        try:
+            person_id = int(token[len(TOKEN_PREFIX):].split("-")[0])
+        except ValueError:
+            return self.reply(401, {"detail": "Invalid token."})
+
+        return self.reply(200, {"data": {
+            "person_id": person_id,
+            "email": bench_email(person_id),
+            "username": f"bench{person_id}",
+        }})
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start(port=8765, host="127.0.0.1", **options) -> FakeAuthServer:
+    """Starts the server on a daemon thread and returns it (server.shutdown() stops it)."""
+    server = FakeAuthServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser):
+    parser.add_argument("--auth-latency-ms", type=float, default=0, help="Fixed /me/ latency")
+    parser.add_argument("--auth-jitter-ms", type=float, default=0, help="Extra uniform random latency")
+    parser.add_argument("--auth-error-rate", type=float, default=0, help="Fraction of 5xx answers")
+    parser.add_argument("--auth-error-status", type=int, default=503)
+    parser.add_argument("--auth-stall-rate", type=float, default=0,
+                        help="Fraction of requests stalled past the client timeout")
+
+
+def server_options(args) -> dict:
+    return {
+        "latency": args.auth_latency_ms / 1000,
+        "jitter": args.auth_jitter_ms / 1000,
+        "error_rate": args.auth_error_rate,
+        "error_status": args.auth_error_status,
+        "stall_rate": args.auth_stall_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeAuthServer((args.host, args.port), **server_options(args))
+    print(f"Fake AUTH_MS on http://{args.host}:{args.port}/api/auth/me/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.counters))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+"""
+Endpoint load test for Profile_MS.
+
+`run` starts a local fake AUTH_MS (benchmarks/fake_auth_ms.py), seeds a
+synthetic dataset into the configured database, starts the service
+(gunicorn / uvicorn, or uses --target), then drives every route of
+apps/profiles/urls.py at each concurrency level. It reports throughput,
+p50 / p95 / p99 latency and DB queries per request (measured in-process on
+a warm worker), and writes everything to a JSON file.
+
+`compare` prints the differences between two result files and exits with
+status 1 when a scenario regressed beyond --threshold.
+
+Usage (from the repository root):
+
+    python benchmarks/loadtest.py run --users 1000 --server asgi --workers 4 \\
+        --concurrency 1,16,64 --requests 500 --auth-latency-ms 20 -o after.json
+    python benchmarks/loadtest.py compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path[:0] = [ROOT_DIR, BENCHMARKS_DIR]
+
+import fake_auth_ms  # noqa: E402
+
+BENCH_PERSON_ID_BASE = 900_000_000
+BENCH_ADMIN = ("bench-admin", "bench-admin-password")
+BENCH_SERVICE_TOKEN = "bench-service-token"
+
+BATCH_LOOKUP_SIZE = 100
+EXPORT_PROFILES = 100
+
+
+# ------------------------------------------------------------------
+# Dataset
+# ------------------------------------------------------------------
+def seed(users):
+    """
+    Profiles with a home and a work address and two cards each (room is left
+    for creates), plus a staff user for the admin routes. Reused when present.
+
+    Returns:
+        list: (person_id, address ids, card ids) per seeded profile
+    """
+    from django.contrib.auth.models import User
+    from apps.profiles.models import UserProfile, Address, Card
+
+    person_ids = range(BENCH_PERSON_ID_BASE + 1, BENCH_PERSON_ID_BASE + users + 1)
+    existing = set(
+        UserProfile.objects.filter(person_id__in=person_ids).values_list("person_id", flat=True)
+    )
+
+    missing = [person_id for person_id in person_ids if person_id not in existing]
+    for start in range(0, len(missing), 1000):
+        profiles = UserProfile.objects.bulk_create([
+            UserProfile(
+                person_id=person_id, email=fake_auth_ms.bench_email(person_id),
+                first_name="Bench", last_name=str(person_id), primary_phone="9876543210",
+                card_count=2,
+            )
+            for person_id in missing[start:start + 1000]
+        ])
+        profile_ids = [profile.pk for profile in profiles]
+        Address.objects.bulk_create([
+            Address(user_id=profile_id, address_type=address_type, line1="221B Baker Street",
+                    zip_code="400001", is_default=address_type == "home")
+            for profile_id in profile_ids for address_type in ("home", "work")
+        ])
+        Card.objects.bulk_create([
+            Card(user_id=profile_id, card_type="credit", card_brand=brand,
+                 card_number="4111111111111111", card_holder_name="Bench User",
+                 expiry_month=12, expiry_year=2030, is_default=brand == "visa")
+            for profile_id in profile_ids for brand in ("visa", "mastercard")
+        ])
+
+    admin, _ = User.objects.get_or_create(username=BENCH_ADMIN[0], defaults={"is_staff": True})
+    admin.is_staff = True
+    admin.set_password(BENCH_ADMIN[1])
+    admin.save()
+
+    children = {}
+    for model, index in ((Address, 0), (Card, 1)):
+        for person_id, pk in model.objects.filter(
+            user__person_id__in=person_ids
+        ).values_list("user__person_id", "pk"):
+            children.setdefault(person_id, ([], []))[index].append(pk)
+
+    return [(person_id, *children.get(person_id, ([], []))) for person_id in person_ids]
+
+
+def cleanup():
+    from django.contrib.auth.models import User
+    from apps.profiles.models import UserProfile
+
+    UserProfile.objects.filter(person_id__gt=BENCH_PERSON_ID_BASE).delete()
+    User.objects.filter(username=BENCH_ADMIN[0]).delete()
+
+
+# ------------------------------------------------------------------
+# Scenarios (one or more per route)
+# ------------------------------------------------------------------
+class Context:
+    def __init__(self, dataset, cold_auth):
+        self.dataset = dataset
+        self.cold_auth = cold_auth
+        self.rng = random.Random(42)
+
+    def user(self):
+        return self.rng.choice(self.dataset)
+
+    def auth(self, person_id):
+        nonce = self.rng.getrandbits(32) if self.cold_auth else None
+        return {"Authorization": f"Bearer {fake_auth_ms.bench_token(person_id, nonce)}"}
+
+
+def user_request(method, path, body=None):
+    def build(ctx):
+        person_id, _, _ = ctx.user()
+        return method, path, ctx.auth(person_id), body
+    return build
+
+
+def child_request(method, kind, body=None, suffix=""):
+    def build(ctx):
+        person_id, addresses, cards = ctx.user()
+        pk = ctx.rng.choice(addresses if kind == "addresses" else cards)
+        return method, f"{kind}/{pk}/{suffix}", ctx.auth(person_id), body
+    return build
+
+
+def bulk_request(kind, changes):
+    def build(ctx):
+        person_id, addresses, cards = ctx.user()
+        ids = addresses if kind == "addresses" else cards
+        return "PUT", f"{kind}/bulk/", ctx.auth(person_id), {"items": [{"id": pk, **changes} for pk in ids]}
+    return build
+
+
+def batch_request(ctx):
+    person_ids = [person_id for person_id, _, _ in ctx.rng.sample(
+        ctx.dataset, min(BATCH_LOOKUP_SIZE, len(ctx.dataset))
+    )]
+    body = {"person_ids": person_ids, "include": ["default_address", "default_card"]}
+    return "POST", "internal/profiles/batch/", {"X-Service-Token": BENCH_SERVICE_TOKEN}, body
+
+
+def admin_auth():
+    import base64
+
+    credentials = base64.b64encode(":".join(BENCH_ADMIN).encode()).decode()
+    return {"Authorization": f"Basic {credentials}"}
+
+
+def export_request(ctx):
+    after = ctx.dataset[-1][0] - EXPORT_PROFILES
+    return "GET", f"admin/export/?after={after}", admin_auth(), None
+
+
+def search_request(ctx):
+    # First name and last name prefix: "Bench" and part of the person_id
+    person_id, _, _ = ctx.user()
+    return "GET", f"admin/search/?q=bench+{str(person_id)[:-1]}", admin_auth(), None
+
+
+def anonymous(path):
+    def build(ctx):
+        return "GET", path, {}, None
+    return build
+
+
+# (scenario name, url name, request builder)
+SCENARIOS = [
+    ("health GET", "health-check", anonymous("health/")),
+    ("health/auth GET", "health-auth", anonymous("health/auth/")),
+    ("health/db GET", "health-db", anonymous("health/db/")),
+    ("health/cache GET", "health-cache", anonymous("health/cache/")),
+    ("metrics GET", "metrics", anonymous("metrics/")),
+    ("test-auth GET", "test-auth", user_request("GET", "test-auth/")),
+    ("profile GET", "user-profile", user_request("GET", "profile/")),
+    ("profile PUT", "user-profile", user_request("PUT", "profile/", {"first_name": "Bench"})),
+    ("profile/bundle GET", "profile-bundle", user_request("GET", "profile/bundle/")),
+    ("addresses GET", "address-list-create", user_request("GET", "addresses/")),
+    ("addresses/bulk PUT", "address-bulk", bulk_request("addresses", {"line2": "Bench"})),
+    ("addresses/<pk> GET", "address-detail", child_request("GET", "addresses")),
+    ("addresses/<pk> PUT", "address-detail", child_request("PUT", "addresses", {"line2": "Bench"})),
+    ("addresses/default GET", "address-default", user_request("GET", "addresses/default/")),
+    ("addresses/<pk>/default PUT", "address-set-default", child_request("PUT", "addresses", suffix="default/")),
+    ("cards GET", "card-list-create", user_request("GET", "cards/")),
+    ("cards/bulk PUT", "card-bulk", bulk_request("cards", {"card_holder_name": "Bench User"})),
+    ("cards/<pk> GET", "card-detail", child_request("GET", "cards")),
+    ("cards/<pk> PUT", "card-detail", child_request("PUT", "cards", {"card_holder_name": "Bench User"})),
+    ("cards/default GET", "card-default", user_request("GET", "cards/default/")),
+    ("cards/<pk>/default PUT", "card-set-default", child_request("PUT", "cards", suffix="default/")),
+    ("internal/profiles/batch POST", "internal-profile-batch", batch_request),
+    ("admin/export GET", "profile-export", export_request),
+    ("admin/search GET", "profile-search", search_request),
+]
+
+
+def uncovered_routes():
+    from apps.profiles.urls import urlpatterns
+
+    covered = {route for _, route, _ in SCENARIOS}
+    return sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
+
+
+# ------------------------------------------------------------------
+# Measurements
+# ------------------------------------------------------------------
+def percentile(values, p):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def count_queries(ctx, build):
+    """DB queries of one request on a warm in-process worker."""
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client(HTTP_HOST="127.0.0.1")
+
+    def send():
+        method, path, headers, body = build(ctx)
+        kwargs = {"headers": headers}
+        if body is not None:
+            kwargs.update(data=json.dumps(body), content_type="application/json")
+        response = getattr(client, method.lower())(f"/profiles/{path}", **kwargs)
+        # Consume streaming bodies, their queries run while iterating
+        if response.streaming:
+            b"".join(response.streaming_content)
+
+    send()
+    with CaptureQueriesContext(connection) as queries:
+        send()
+    return len(queries)
+
+
+async def drive(base_url, ctx, build, concurrency, requests, timeout):
+    import httpx
+
+    latencies, statuses = [], {}
+
+    async def worker(client, budget):
+        while budget[0] > 0:
+            budget[0] -= 1
+            method, path, headers, body = build(ctx)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, headers=headers, json=body)
+                await response.aread()
+                key = str(response.status_code)
+            except httpx.HTTPError as exc:
+                key = type(exc).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    async def burst(client, count):
+        budget = [count]
+        await asyncio.gather(*(worker(client, budget) for _ in range(concurrency)))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"{base_url}/profiles/", limits=limits, timeout=timeout) as client:
+        # Warm-up: open the connections, fill the per-worker caches
+        await burst(client, concurrency)
+        latencies.clear()
+        statuses.clear()
+
+        started = time.perf_counter()
+        await burst(client, requests)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+# ------------------------------------------------------------------
+# Service Process
+# ------------------------------------------------------------------
+def start_service(args, env):
+    bind = f"127.0.0.1:{args.port}"
+    if args.server == "asgi":
+        command = [sys.executable, "-m", "uvicorn", "profile_ms.asgi:application",
+                   "--host", "127.0.0.1", "--port", str(args.port),
+                   "--workers", str(args.workers), "--log-level", "warning"]
+    else:
+        command = [sys.executable, "-m", "gunicorn", "profile_ms.wsgi:application",
+                   "--bind", bind, "--workers", str(args.workers),
+                   "--threads", str(args.threads), "--log-level", "warning"]
+
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    base_url = f"http://{bind}"
+
+    import httpx
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Service exited with status {process.returncode}.")
+        try:
+            if httpx.get(f"{base_url}/profiles/health/", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    sys.exit("Service did not become healthy within 30s.")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ------------------------------------------------------------------
+# Commands
+# ------------------------------------------------------------------
+def run(args):
+    auth_url = args.auth_url
+    auth_server = None
+    if not auth_url:
+        auth_server = fake_auth_ms.start(port=args.auth_port, **fake_auth_ms.server_options(args))
+        auth_url = f"http://127.0.0.1:{args.auth_port}/api/auth"
+
+    # The in-process query counting and the service share this configuration
+    os.environ["AUTH_MS_BASE_URL"] = auth_url
+    os.environ["INTERNAL_SERVICE_TOKENS"] = BENCH_SERVICE_TOKEN
+    os.environ["ASYNC_VIEWS"] = str(args.server == "asgi")
+    os.environ.setdefault("ALLOWED_HOSTS", "127.0.0.1,localhost")
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "profile_ms.settings")
+
+    import django
+    django.setup()
+    from django.db import connection
+
+    missing = uncovered_routes()
+    if missing:
+        sys.exit(f"No load-test scenario for route(s): {', '.join(missing)}.")
+
+    selected = [s for s in SCENARIOS if not args.scenarios or any(f in s[0] for f in args.scenarios)]
+    concurrency_levels = [int(level) for level in args.concurrency.split(",")]
+
+    print(f"Seeding {args.users} profiles...", file=sys.stderr)
+    dataset = seed(args.users)
+    ctx = Context(dataset, args.cold_auth)
+
+    process = None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        process, base_url = start_service(args, dict(os.environ))
+
+    results = []
+    try:
+        for name, route, build in selected:
+            queries = count_queries(ctx, build)
+            levels = []
+            for concurrency in concurrency_levels:
+                level = asyncio.run(drive(base_url, ctx, build, concurrency, args.requests, args.timeout))
+                levels.append(level)
+                print(
+                    f"{name:<30} c={concurrency:<4} {level['throughput_rps']:>9.1f} rps  "
+                    f"p50 {level['p50_ms']:>8.2f}  p95 {level['p95_ms']:>8.2f}  p99 {level['p99_ms']:>8.2f} ms  "
+                    f"{queries:>3} queries  {level['errors']} errors",
+                    file=sys.stderr,
+                )
+            results.append({"scenario": name, "route": route, "queries": queries, "levels": levels})
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if auth_server is not None:
+            auth_server.shutdown()
+        if not args.keep_data:
+            cleanup()
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "server": "external" if args.target else args.server,
+            "workers": args.workers,
+            "threads": args.threads,
+            "users": args.users,
+            "requests_per_level": args.requests,
+            "concurrency": concurrency_levels,
+            "cold_auth": args.cold_auth,
+            "auth": fake_auth_ms.server_options(args) if auth_server else {"url": auth_url},
+        },
+        "results": results,
+    }
+
+    output = args.output or f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, "w", encoding="utf-8") as stream:
+        json.dump(report, stream, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+
+def compare(args):
+    with open(args.baseline, encoding="utf-8") as stream:
+        baseline = json.load(stream)
+    with open(args.candidate, encoding="utf-8") as stream:
+        candidate = json.load(stream)
+
+    before = {
+        (result["scenario"], level["concurrency"]): (result, level)
+        for result in baseline["results"] for level in result["levels"]
+    }
+
+    regressions = 0
+    print(f"{'scenario':<30} {'c':>4} {'rps':>16} {'p50 ms':>18} {'p99 ms':>18} {'queries':>9}")
+    for result in candidate["results"]:
+        for level in result["levels"]:
+            old = before.get((result["scenario"], level["concurrency"]))
+            if old is None:
+                continue
+            old_result, old_level = old
+
+            rps = change(old_level["throughput_rps"], level["throughput_rps"])
+            p50 = change(old_level["p50_ms"], level["p50_ms"])
+            p99 = change(old_level["p99_ms"], level["p99_ms"])
+
+            regressed = (
+                -rps > args.threshold or p50 > args.threshold or p99 > args.threshold
+                or result["queries"] > old_result["queries"]
+            )
+            regressions += regressed
+
+            print(
+                f"{result['scenario']:<30} {level['concurrency']:>4} "
+                f"{level['throughput_rps']:>9.1f} {rps:>+6.1f}% "
+                f"{level['p50_ms']:>10.2f} {p50:>+6.1f}% "
+                f"{level['p99_ms']:>10.2f} {p99:>+6.1f}% "
+                f"{old_result['queries']:>4}->{result['queries']:<3}"
+                + ("  REGRESSION" if regressed else "")
+            )
+
+    if regressions:
+        sys.exit(f"{regressions} scenario level(s) regressed by more than {args.threshold}%.")
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Load-test every route")
+    run_parser.add_argument("--users", type=int, default=1000, help="Synthetic profiles to seed")
+    run_parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi")
+    run_parser.add_argument("--workers", type=int, default=2)
+    run_parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    run_parser.add_argument("--port", type=int, default=8800)
+    run_parser.add_argument("--target", help="Base URL of an already running service instead")
+    run_parser.add_argument("--concurrency", default="1,8,32", help="Comma separated levels")
+    run_parser.add_argument("--requests", type=int, default=200, help="Requests per scenario and level")
+    run_parser.add_argument("--timeout", type=float, default=30, help="Client timeout (s)")
+    run_parser.add_argument("--scenarios", nargs="*", help="Only scenarios whose name contains one of these")
+    run_parser.add_argument("--cold-auth", action="store_true",
+                            help="Unique token per request, so every request calls AUTH_MS")
+    run_parser.add_argument("--auth-url", help="Use this AUTH_MS instead of starting the fake one")
+    run_parser.add_argument("--auth-port", type=int, default=8765)
+    run_parser.add_argument("--keep-data", action="store_true", help="Keep the seeded profiles")
+    run_parser.add_argument("--output", "-o", help="Result file (default: loadtest-<timestamp>.json)")
+    fake_auth_ms.add_arguments(run_parser)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10, help="Allowed regression (%%)")
+
+    args = parser.parse_args()
+    (run if args.command == "run" else compare)(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,10 @@ ASGI config for profile_ms project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through ASGI switches the profile, address and card endpoints to
+their async implementations (apps/profiles/async_views.py) unless
+ASYNC_VIEWS=False is set explicitly.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -12,5 +16,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'profile_ms.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
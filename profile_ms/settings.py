@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/6.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
+import copy
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -33,6 +34,11 @@ if not SECRET_KEY:
 
 DEBUG = os.getenv("DEBUG", "False") == "True"
 
+# Lean runtime for cold starts: only what the JSON API needs (no admin site,
+# sessions, messages, static files, templates, translations or browsable
+# API). Staff endpoints then take HTTP Basic auth only.
+LEAN_RUNTIME = os.getenv("LEAN_RUNTIME", "False") == "True"
+
 
 # Application definition
 
@@ -54,6 +60,12 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    # Outermost, so "total" covers the whole stack (removed itself when disabled)
+    'apps.profiles.middleware.ServerTimingMiddleware',
+    # Samples requests against their query budgets (removed itself when disabled)
+    'apps.profiles.middleware.QueryBudgetMiddleware',
+    # Per-request shard / replica routing (removed itself without shards and replicas)
+    'apps.profiles.middleware.DatabaseRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -64,15 +76,104 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Apps and middleware only the browser-facing parts (admin site) use
+LEAN_EXCLUDED_APPS = {
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+}
+LEAN_EXCLUDED_MIDDLEWARE = {
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+if LEAN_RUNTIME:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in LEAN_EXCLUDED_APPS]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in LEAN_EXCLUDED_MIDDLEWARE]
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     "EXCEPTION_HANDLER": "apps.profiles.exceptions.custom_exception_handler",
+    # orjson-backed JSON, same output as DRF's JSONRenderer / JSONParser
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.profiles.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "apps.profiles.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
+if LEAN_RUNTIME:
+    # No sessions to read, and no HTML rendering
+    REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"] = [
+        "rest_framework.authentication.BasicAuthentication",
+    ]
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = ["apps.profiles.renderers.ORJSONRenderer"]
+
 AUTH_MS_BASE_URL = os.getenv("AUTH_MS_BASE_URL")
 
+# Serve profile/address/card views as async views (set by asgi.py by default)
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
+# Per-request phase timing: Server-Timing header and histograms on /profiles/metrics/
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "False") == "True"
+# Directory shared by the workers of a host: /profiles/metrics/ then sums all of
+# them (wipe it when the server starts). Empty: each worker reports only itself
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+# Seconds between two writes of a worker's counts to METRICS_DIR
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+# Send the Server-Timing header to clients (turn off on public edges)
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "True") == "True"
+# Share of requests (0-1) checked against their query budget, violations are logged
+QUERY_BUDGET_SAMPLE_RATE = float(os.getenv("QUERY_BUDGET_SAMPLE_RATE", "0"))
+
+# Keep-alive pool size of the async AUTH_MS client
+AUTH_MS_MAX_CONNECTIONS = int(os.getenv("AUTH_MS_MAX_CONNECTIONS", "100"))
+
+# Time budget for one `/me/` lookup, shared by all of its retries (seconds)
+AUTH_MS_DEADLINE = float(os.getenv("AUTH_MS_DEADLINE", "10"))
+AUTH_MS_TIMEOUT = float(os.getenv("AUTH_MS_TIMEOUT", "5"))
+AUTH_MS_MAX_RETRIES = int(os.getenv("AUTH_MS_MAX_RETRIES", "2"))
+AUTH_MS_BACKOFF_BASE = float(os.getenv("AUTH_MS_BACKOFF_BASE", "0.1"))
+AUTH_MS_BACKOFF_MAX = float(os.getenv("AUTH_MS_BACKOFF_MAX", "1"))
+
+# Circuit breaker: fail fast with 503 while AUTH_MS is down
+AUTH_MS_BREAKER_FAILURE_THRESHOLD = int(os.getenv("AUTH_MS_BREAKER_FAILURE_THRESHOLD", "5"))
+AUTH_MS_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("AUTH_MS_BREAKER_RECOVERY_TIMEOUT", "30"))
+AUTH_MS_BREAKER_HALF_OPEN_CALLS = int(os.getenv("AUTH_MS_BREAKER_HALF_OPEN_CALLS", "1"))
+
+
+# ======================
+# Token Verification
+# ======================
+# "remote": every token is checked by AUTH_MS `/me/`
+# "local": tokens are verified in-process, `/me/` is only a fallback
+AUTH_VERIFICATION_MODE = os.getenv("AUTH_VERIFICATION_MODE", "remote")
+
+AUTH_JWT_ALGORITHMS = os.getenv("AUTH_JWT_ALGORITHMS", "HS256").split(",")
+AUTH_JWT_SIGNING_KEY = os.getenv("AUTH_JWT_SIGNING_KEY")
+AUTH_JWT_JWKS_URL = os.getenv("AUTH_JWT_JWKS_URL")
+AUTH_JWT_JWKS_REFRESH_INTERVAL = int(os.getenv("AUTH_JWT_JWKS_REFRESH_INTERVAL", "300"))
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE")
+AUTH_JWT_ISSUER = os.getenv("AUTH_JWT_ISSUER")
+AUTH_JWT_LEEWAY = int(os.getenv("AUTH_JWT_LEEWAY", "0"))
+AUTH_JWT_PERSON_ID_CLAIM = os.getenv("AUTH_JWT_PERSON_ID_CLAIM", "person_id")
+AUTH_JWT_EMAIL_CLAIM = os.getenv("AUTH_JWT_EMAIL_CLAIM", "email")
+
+# Token -> user cache in front of AUTH_MS `/me/` (TTL of 0 disables it)
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_NEGATIVE_TTL = int(os.getenv("AUTH_CACHE_NEGATIVE_TTL", "10"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+# Name of a CACHES alias shared by all workers (e.g. "default" backed by Redis)
+AUTH_CACHE_ALIAS = os.getenv("AUTH_CACHE_ALIAS", "")
+
 
 
 ROOT_URLCONF = 'profile_ms.urls'
@@ -92,6 +193,10 @@ TEMPLATES = [
     },
 ]
 
+# Only the admin site and the browsable API render templates
+if LEAN_RUNTIME:
+    TEMPLATES = []
+
 WSGI_APPLICATION = 'profile_ms.wsgi.application'
 
 
@@ -113,6 +218,120 @@ DATABASES = {
     }
 }
 
+# Connection reuse, so requests don't pay a TCP + TLS + auth handshake:
+# "pool": per-worker psycopg pool (production)
+# "persistent": one connection per thread kept for DB_CONN_MAX_AGE seconds
+# "none": new connection per request
+DB_CONN_MODE = os.getenv('DB_CONN_MODE', 'pool')
+
+if DB_CONN_MODE == 'pool':
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        # Recycle connections before Neon / proxies drop them
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),
+        # Exhausted pool: wait up to DB_POOL_TIMEOUT seconds for a connection,
+        # and reject at once when DB_POOL_MAX_WAITING requests already queue (0 = no limit)
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '5')),
+        'max_waiting': int(os.getenv('DB_POOL_MAX_WAITING', '0')),
+        # Health check on every checkout: Django skips CONN_HEALTH_CHECKS with
+        # a pool, so a connection dropped while idle is replaced here
+        'check': ConnectionPool.check_connection,
+    }
+elif DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Server-side cursors (used by the export) do not survive transaction-mode
+# poolers such as PgBouncer / Neon's pooled endpoint
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = (
+    os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True'
+)
+
+# Read replicas (comma separated hosts, same name / credentials / pool as the
+# primary): the reads of GET requests go to one that is healthy
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+# Replicas lagging more than this many seconds are skipped until they catch up
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '5'))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '5'))
+# A person_id reads from the primary for this many seconds after writing
+# (never less than DB_REPLICA_MAX_LAG)
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '10'))
+
+DB_REPLICA_ALIASES = []
+for index, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[alias]['HOST'] = host
+    # Tests read the test database through the primary alias
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DB_REPLICA_ALIASES.append(alias)
+
+# Profile shards (comma separated hosts, appended to the primary which is shard 0):
+# person_ids are spread over the first DB_SHARD_ACTIVE shards by consistent hashing.
+# Only ever append hosts, a shard's position fixes the range of its ids.
+DB_SHARD_HOSTS = [host.strip() for host in os.getenv('DB_SHARD_HOSTS', '').split(',') if host.strip()]
+DB_SHARD_ACTIVE = int(os.getenv('DB_SHARD_ACTIVE', '0')) or None
+# Shard count before a resharding, set while `manage.py reshard` moves users
+DB_SHARD_PREVIOUS_ACTIVE = int(os.getenv('DB_SHARD_PREVIOUS_ACTIVE', '0')) or None
+DB_SHARD_VNODES = int(os.getenv('DB_SHARD_VNODES', '128'))
+# Ids of shard k start at k * DB_SHARD_ID_SPAN, unique across shards
+DB_SHARD_ID_SPAN = int(os.getenv('DB_SHARD_ID_SPAN', str(10 ** 12)))
+
+PROFILE_SHARDS = ['default']
+for index, host in enumerate(DB_SHARD_HOSTS, start=1):
+    alias = f'shard{index}'
+    DATABASES[alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[alias]['HOST'] = host
+    PROFILE_SHARDS.append(alias)
+
+# Shards first: they route the profile tables, replicas serve the primary
+DATABASE_ROUTERS = (
+    (['apps.profiles.routers.ShardRouter'] if len(PROFILE_SHARDS) > 1 else [])
+    + (['apps.profiles.routers.ReplicaRouter'] if DB_REPLICA_ALIASES else [])
+)
+
+
+# ======================
+# Cache
+# ======================
+# Local memory per worker unless a Redis URL is given
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Read-through cache of profile / address / card payloads (TTL of 0 disables it).
+# It needs a cache shared by all workers, so it is off by default without Redis
+PROFILE_CACHE_ALIAS = os.getenv("PROFILE_CACHE_ALIAS", "default")
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", "300" if CACHE_REDIS_URL else "0"))
+
+# Per-worker person_id -> profile pk map used by the address / card views
+PROFILE_ID_CACHE_TTL = int(os.getenv("PROFILE_ID_CACHE_TTL", "300"))
+PROFILE_ID_CACHE_MAX_ENTRIES = int(os.getenv("PROFILE_ID_CACHE_MAX_ENTRIES", "10000"))
+
+# Upper bound of items in one bulk address / card request
+PROFILE_BULK_MAX_ITEMS = int(os.getenv("PROFILE_BULK_MAX_ITEMS", "50"))
+
+# Internal service-to-service API (comma separated shared tokens, empty disables it)
+INTERNAL_SERVICE_TOKENS = [
+    token for token in os.getenv("INTERNAL_SERVICE_TOKENS", "").split(",") if token
+]
+INTERNAL_BATCH_MAX_IDS = int(os.getenv("INTERNAL_BATCH_MAX_IDS", "5000"))
+# person_ids per IN query, every chunk is flushed to the client as it is produced
+INTERNAL_BATCH_CHUNK_SIZE = int(os.getenv("INTERNAL_BATCH_CHUNK_SIZE", "500"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -140,7 +359,8 @@ LANGUAGE_CODE = 'en-us'
 
 TIME_ZONE = 'UTC'
 
-USE_I18N = True
+# Responses are English only: the lean runtime loads no translation catalogs
+USE_I18N = not LEAN_RUNTIME
 
 USE_TZ = True
 
@@ -1,7 +1,12 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('profiles/', include('apps.profiles.urls')),
-]
\ No newline at end of file
+]
+
+# Not installed in the lean runtime (LEAN_RUNTIME)
+if 'django.contrib.admin' in settings.INSTALLED_APPS:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
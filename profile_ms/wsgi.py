@@ -3,14 +3,23 @@ WSGI config for profile_ms project.
 
 It exposes the WSGI callable as a module-level variable named ``application``.
 
+The async views (ASYNC_VIEWS=True) are refused here: a WSGI server runs each
+of them on a fresh event loop, so their pooled AUTH_MS client could never be
+reused and one would be left behind per request. Serve them through asgi.py.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/wsgi/
 """
 
 import os
 
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'profile_ms.settings')
 
 application = get_wsgi_application()
+
+if settings.ASYNC_VIEWS:
+    raise ImproperlyConfigured("ASYNC_VIEWS=True requires an ASGI server (profile_ms.asgi).")